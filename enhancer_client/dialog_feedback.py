@@ -7,7 +7,8 @@ import tkinter as tk
 from tkinter import messagebox
 import threading
 import pyperclip
-from enhancer_client.enhancer.api_client import enhance_prompt_from_api, send_feedback_to_api
+from enhancer_client.enhancer.api_client import enhance_prompt_from_api
+from enhancer_client.enhancer.feedback_queue import enqueue_feedback
 from enhancer_client.enhancer.config import settings
 from enhancer_client.enhancer.state import set_last_session_id, set_last_prompts
 from enhancer_client.enhancer.notifier import show_notification
@@ -103,7 +104,7 @@ def show_dialog_on_main_thread(enhanced_text: str, session_id: uuid.UUID, origin
         print("\n" + "="*60)
         print("✅ User ACCEPTED via dialog button")
         print("="*60)
-        send_feedback_to_api(session_id, "accepted")
+        enqueue_feedback(session_id, "accepted")
         show_notification("✅ Accepted!", "Enhancement accepted")
         _current_enhancement['dialog_open'] = False
         dialog.destroy()
@@ -115,7 +116,7 @@ def show_dialog_on_main_thread(enhanced_text: str, session_id: uuid.UUID, origin
         print("🔄 User REJECTED via dialog button - Getting different version")
         print("="*60)
         
-        send_feedback_to_api(session_id, "rejected")
+        enqueue_feedback(session_id, "rejected")
         
         # Close current dialog
         dialog.destroy()
@@ -163,7 +164,7 @@ def show_dialog_on_main_thread(enhanced_text: str, session_id: uuid.UUID, origin
         print("\n" + "="*60)
         print("✅ User closed dialog (treating as Accept)")
         print("="*60)
-        send_feedback_to_api(session_id, "accepted")
+        enqueue_feedback(session_id, "accepted")
         _current_enhancement['dialog_open'] = False
         dialog.destroy()
         root.quit()
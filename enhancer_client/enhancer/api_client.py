@@ -1,10 +1,24 @@
 import httpx
 from .config import settings
 import logging
+import threading
+import time
 import uuid
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# How long we wait for /enhance. The server is told a slightly shorter deadline
+# (X-Request-Deadline) so it stops retrying/falling back before we give up on it.
+ENHANCE_TIMEOUT_SECONDS = 60.0
+DEADLINE_MARGIN_SECONDS = 3.0
+
+# warmup_api() polls /ready for up to READY_TIMEOUT_SECONDS (a scaled-to-zero machine has
+# to boot and warm up); the first enhancement waits for it instead of hitting a cold server.
+READY_TIMEOUT_SECONDS = 90.0
+READY_POLL_SECONDS = 2.0
+_warmup_started = False
+_server_ready = threading.Event()
+
 def enhance_prompt_from_api(
     prompt_text: str,
     user_id: uuid.UUID,
@@ -13,8 +27,12 @@ def enhance_prompt_from_api(
     original_prompt: str | None = None,
     workspace_path: str | None = None,
     project_context: str | None = None,
+    latency_tier: str | None = None,
 ) -> str | None:
     enhance_url = f"{settings.API_BASE_URL}/enhance"
+    if _warmup_started and not _server_ready.is_set():
+        logging.info("Waiting for the server to finish warming up before the first enhancement...")
+        _server_ready.wait(READY_TIMEOUT_SECONDS)
     payload = {
         "original_prompt": prompt_text,
         "user_id": str(user_id),
@@ -26,16 +44,21 @@ def enhance_prompt_from_api(
         payload["workspace_path"] = workspace_path
     if project_context:
         payload["project_context"] = project_context
+    latency_tier = latency_tier or settings.LATENCY_TIER
+    if latency_tier:
+        payload["latency_tier"] = latency_tier
     try:
-        logging.info(f"Sending prompt to API for user {user_id}: '{prompt_text[:50]}...' (reroll: {is_reroll})")
-        # Increased timeout to 120 seconds to handle LLM API calls + potential retries
-        # LLM calls can take 10-30 seconds, and the workflow can retry up to 3 times
-        response = httpx.post(enhance_url, json=payload, timeout=60.0)
+        logging.info(
+            f"Sending prompt to API for user {user_id}: '{prompt_text[:50]}...' "
+            f"(reroll: {is_reroll}, tier: {latency_tier or 'server default'})"
+        )
+        headers = {"X-Request-Deadline": str(ENHANCE_TIMEOUT_SECONDS - DEADLINE_MARGIN_SECONDS)}
+        response = httpx.post(enhance_url, json=payload, headers=headers, timeout=ENHANCE_TIMEOUT_SECONDS)
         response.raise_for_status()
         data = response.json()
         return data.get("enhanced_prompt")
     except httpx.TimeoutException:
-        logging.error("Request to enhancement API timed out after 120 seconds.")
+        logging.error(f"Request to enhancement API timed out after {ENHANCE_TIMEOUT_SECONDS:.0f} seconds.")
         logging.error("This may happen if the LLM API is slow or the server is processing multiple retries.")
         return None
     except httpx.ConnectError as e:
@@ -61,6 +84,9 @@ def send_feedback_to_api(session_id: uuid.UUID, action: str) -> bool:
     """
     feedback_url = f"{settings.API_BASE_URL}/feedback"
     payload = {"session_id": str(session_id), "user_action": action}
+    if settings.USER_ID:
+        # Lets the server scope its fallback lookup to this user if the session is unknown
+        payload["user_id"] = str(settings.USER_ID)
     try:
         print(f"\n{'='*60}")
         print(f"🔄 CLIENT: Sending feedback for session {session_id}: '{action}'")
@@ -110,25 +136,33 @@ def send_feedback_to_api(session_id: uuid.UUID, action: str) -> bool:
 
 def warmup_api():
     """
-    Sends a lightweight request to the API to wake it up (serverless cold start).
-    Should be called in a background thread on app startup.
+    Wakes the API (serverless cold start) and waits until GET /ready reports that the
+    server has loaded its models and opened its provider connections. Should be called
+    in a background thread on app startup; enhance_prompt_from_api waits for it.
     """
-    # Simply hitting the base URL or a health endpoint to trigger a cold boot
-    # We strip '/api/v1' to hit the root if possible, or just hit the base
+    global _warmup_started
+    _warmup_started = True
+    base = settings.API_BASE_URL.replace("/api/v1", "").rstrip("/")
+    ready_url = f"{base}/ready"
+    print(f"🔥 Warmup: Waking {base} and waiting for {ready_url}...")
+    deadline = time.monotonic() + READY_TIMEOUT_SECONDS
     try:
-        base = settings.API_BASE_URL.replace("/api/v1", "")
-        # Remove trailing slash if present
-        if base.endswith("/"):
-            base = base[:-1]
-        
-        warmup_url = f"{base}/" 
-        print(f"🔥 Warmup: Pinging {warmup_url} to wake up server...")
-        
-        # Short timeout - we just want to trigger the boot, don't necessarily need to wait for full success
-        # if the server is sleeping, it might take time, but the request itself initiates the wake-up
-        httpx.get(warmup_url, timeout=5.0)
-        print("🔥 Warmup: Server pinged successfully.")
-    except Exception as e:
-        # It's expected to fail or timeout if server is deeply asleep or URL logic is slightly off
-        # The important thing is the network packet was sent
-        print(f"🔥 Warmup: Ping sent (result: {e})")
+        while time.monotonic() < deadline:
+            try:
+                response = httpx.get(ready_url, timeout=10.0)
+                if response.status_code == 200:
+                    print("🔥 Warmup: Server is ready.")
+                    return
+                if response.status_code == 404:
+                    # Server predates /ready: being reachable is all we can check
+                    print("🔥 Warmup: Server is up (no /ready endpoint).")
+                    return
+                retry_after = float(response.headers.get("Retry-After", READY_POLL_SECONDS))
+            except httpx.HTTPError as e:
+                # Expected while a sleeping machine boots
+                logging.debug(f"Warmup: {ready_url} not reachable yet ({e})")
+                retry_after = READY_POLL_SECONDS
+            time.sleep(min(retry_after, max(deadline - time.monotonic(), 0)))
+        print(f"🔥 Warmup: Server not ready after {READY_TIMEOUT_SECONDS:.0f}s; enhancing anyway.")
+    finally:
+        _server_ready.set()
@@ -44,6 +44,9 @@ class Settings(BaseSettings):
     USER_ID: uuid.UUID | None = None  # Add user_id to our settings
     # Optional workspace path for project-scoped memory (env: PROMPTBOOST_WORKSPACE or user_config.json)
     WORKSPACE_PATH: str | None = None
+    # Default latency tier for enhancements: "fast", "balanced" or "quality" (env or user_config.json);
+    # unset leaves it to the server. The "!!ef" / "!!eq" triggers override it per prompt.
+    LATENCY_TIER: str | None = None
 
     model_config = SettingsConfigDict(
         env_file=ENV_FILE_PATH,
@@ -90,8 +93,20 @@ def load_workspace_path() -> str | None:
         return None
 
 
+def load_latency_tier() -> str | None:
+    """Load the default latency tier from user_config.json if present."""
+    try:
+        with open(USER_CONFIG_PATH, "r") as f:
+            data = json.load(f)
+            return data.get("latency_tier") or None
+    except (FileNotFoundError, KeyError, json.JSONDecodeError):
+        return None
+
+
 settings = Settings()
 settings.USER_ID = load_or_create_user_id()
 # Optional: set from env or user_config.json for project-scoped prompt history
 if settings.WORKSPACE_PATH is None:
-    settings.WORKSPACE_PATH = load_workspace_path()
\ No newline at end of file
+    settings.WORKSPACE_PATH = load_workspace_path()
+if settings.LATENCY_TIER is None:
+    settings.LATENCY_TIER = load_latency_tier()
@@ -0,0 +1,152 @@
+"""
+Persistent, coalescing feedback queue.
+
+Dialog buttons call `enqueue_feedback`, which only updates an in-memory map (one
+pending action per session, newest wins) and rewrites feedback_queue.json next to
+user_config.json. A background thread sends the pending events to
+/feedback/batch and retries with exponential backoff while the server is
+unreachable, so clicks never wait on the network and events survive restarts.
+"""
+import datetime
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+
+import httpx
+
+from .config import settings, APP_DIR
+
+FEEDBACK_QUEUE_PATH = APP_DIR / "feedback_queue.json"
+
+_FLUSH_DELAY_SECONDS = 1.0     # Let a quick accept-after-reject coalesce before sending
+_MIN_BACKOFF_SECONDS = 2.0
+_MAX_BACKOFF_SECONDS = 300.0
+_MAX_BATCH = 500               # Server accepts up to 1000 events per request
+
+logger = logging.getLogger(__name__)
+
+
+class FeedbackQueue:
+    def __init__(self, path=FEEDBACK_QUEUE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending: dict[str, dict] = self._load()
+        self._thread: threading.Thread | None = None
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                events = json.load(f)
+            return {e["session_id"]: e for e in events}
+        except (FileNotFoundError, KeyError, TypeError, json.JSONDecodeError):
+            return {}
+
+    def _persist(self) -> None:
+        """Atomically rewrite the queue file (caller holds the lock)."""
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(list(self._pending.values()), f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Could not persist feedback queue at {self.path}: {e}")
+
+    def enqueue(self, session_id: uuid.UUID, action: str) -> None:
+        event = {
+            "session_id": str(session_id),
+            "user_action": action,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        if settings.USER_ID:
+            event["user_id"] = str(settings.USER_ID)
+        with self._lock:
+            self._pending[event["session_id"]] = event
+            self._persist()
+        self._wakeup.set()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _next_batch(self) -> list[dict]:
+        with self._lock:
+            return list(self._pending.values())[:_MAX_BATCH]
+
+    def _remove(self, batch: list[dict]) -> bool:
+        """Drop the events of a finished batch. Returns True when the queue is now empty."""
+        with self._lock:
+            for event in batch:
+                # Keep events that were superseded by a newer click while the request was in flight
+                if self._pending.get(event["session_id"]) is event:
+                    del self._pending[event["session_id"]]
+            self._persist()
+            return not self._pending
+
+    def flush(self, batch: list[dict] | None = None) -> bool:
+        """Send `batch` (default: the next pending events). Returns True when the queue was emptied."""
+        if batch is None:
+            batch = self._next_batch()
+        if not batch:
+            return True
+
+        response = httpx.post(f"{settings.API_BASE_URL}/feedback/batch", json={"events": batch}, timeout=15.0)
+        response.raise_for_status()
+        result = response.json()
+        logger.info(
+            f"Feedback batch sent: {result.get('applied', 0)}/{len(batch)} applied "
+            f"({len(result.get('unknown_session_ids', []))} unknown sessions)"
+        )
+        return self._remove(batch)
+
+    def _run(self) -> None:
+        backoff = _MIN_BACKOFF_SECONDS
+        while True:
+            if not self.pending_count():
+                self._wakeup.wait()
+            self._wakeup.clear()
+            self._wakeup.wait(_FLUSH_DELAY_SECONDS)
+            batch = self._next_batch()
+            try:
+                if self.flush(batch):
+                    backoff = _MIN_BACKOFF_SECONDS
+                continue
+            except httpx.HTTPStatusError as e:
+                # 404 (server without the batch endpoint yet), 408 and 429 are worth retrying
+                if 400 <= e.response.status_code < 500 and e.response.status_code not in (404, 408, 429):
+                    # The server will never accept this batch; drop it rather than retry forever
+                    logger.error(f"Feedback batch rejected ({e.response.status_code}); dropping its {len(batch)} events")
+                    self._remove(batch)
+                    continue
+                logger.warning(f"Feedback batch failed ({e.response.status_code}); retrying in {backoff:.0f}s")
+            except Exception as e:
+                logger.warning(f"Feedback batch failed ({e}); retrying in {backoff:.0f}s")
+            # Jittered so many clients coming back online don't retry in lockstep.
+            # A new click does not cut the backoff short; it goes out with the next attempt.
+            time.sleep(random.uniform(backoff / 2, backoff))
+            backoff = min(backoff * 2, _MAX_BACKOFF_SECONDS)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="feedback-queue", daemon=True)
+        self._thread.start()
+        if self.pending_count():
+            logger.info(f"Resuming {self.pending_count()} queued feedback events")
+            self._wakeup.set()
+
+
+feedback_queue = FeedbackQueue()
+
+
+def enqueue_feedback(session_id: uuid.UUID, action: str) -> None:
+    """Record feedback without touching the network; the background flusher delivers it."""
+    feedback_queue.enqueue(session_id, action)
+
+
+def start_feedback_flusher() -> None:
+    feedback_queue.start()
@@ -6,7 +6,8 @@ import uuid
 import pyperclip
 from pynput import keyboard
 import threading
-from enhancer_client.enhancer.api_client import enhance_prompt_from_api, send_feedback_to_api
+from enhancer_client.enhancer.api_client import enhance_prompt_from_api
+from enhancer_client.enhancer.feedback_queue import enqueue_feedback
 from enhancer_client.enhancer.config import settings
 from enhancer_client.enhancer.state import set_last_session_id, set_last_prompts
 from enhancer_client.enhancer.notifier import show_notification
@@ -34,7 +35,7 @@ def on_accept_hotkey():
             print("\n" + "="*60)
             print("✅ User ACCEPTED via Ctrl+Shift+A")
             print("="*60)
-            send_feedback_to_api(session_id, "accepted")
+            enqueue_feedback(session_id, "accepted")
             show_notification("✅ Accepted!", "Enhancement accepted")
             _current_enhancement['awaiting_feedback'] = False
         else:
@@ -57,7 +58,7 @@ def on_reject_hotkey():
         print("🔄 User REJECTED via Ctrl+Shift+R - Getting different version")
         print("="*60)
         
-        send_feedback_to_api(session_id, "rejected")
+        enqueue_feedback(session_id, "rejected")
         
         # Get new enhancement
         user_id = settings.USER_ID
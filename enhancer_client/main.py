@@ -36,6 +36,7 @@ import platform
 
 # Import from other modules
 from enhancer_client.enhancer.api_client import enhance_prompt_from_api, send_feedback_to_api
+from enhancer_client.enhancer.feedback_queue import start_feedback_flusher
 from enhancer_client.enhancer.notifier import show_notification
 from enhancer_client.enhancer.config import settings
 from enhancer_client.enhancer.project_context import gather_project_context
@@ -49,6 +50,8 @@ from enhancer_client.dialog_feedback import show_enhancement_dialog
 
 # Constants
 TRIGGER_SUFFIX_ENHANCE = "!!e"
+# Suffix -> latency tier for that prompt; plain "!!e" uses settings.LATENCY_TIER
+TIER_TRIGGERS = {"!!ef": "fast", "!!eq": "quality", TRIGGER_SUFFIX_ENHANCE: None}
 recent_text = ""
 monitoring_active = True
 tray_icon = None
@@ -72,15 +75,17 @@ def process_clipboard():
     current_stripped = current_text.strip()
     recent_stripped = recent_text.strip()
 
-    if current_stripped != recent_stripped and current_stripped.endswith(TRIGGER_SUFFIX_ENHANCE):
+    trigger = next((suffix for suffix in TIER_TRIGGERS if current_stripped.endswith(suffix)), None)
+    if current_stripped != recent_stripped and trigger:
         recent_text = current_text
-        prompt_to_enhance = current_stripped.removesuffix(TRIGGER_SUFFIX_ENHANCE).strip()
+        prompt_to_enhance = current_stripped.removesuffix(trigger).strip()
+        latency_tier = TIER_TRIGGERS[trigger]
         
         if not prompt_to_enhance:
             return
 
         print(f"\n{'='*60}")
-        print(f"✅ Enhancement trigger detected!")
+        print(f"✅ Enhancement trigger detected! ({latency_tier or settings.LATENCY_TIER or 'default'} tier)")
         print(f"{'='*60}")
         
         session_id = uuid.uuid4()
@@ -99,6 +104,7 @@ def process_clipboard():
             original_prompt=prompt_to_enhance,
             workspace_path=settings.WORKSPACE_PATH,
             project_context=gather_project_context(settings.WORKSPACE_PATH) if settings.WORKSPACE_PATH else None,
+            latency_tier=latency_tier,
         )
 
         if enhanced_text:
@@ -131,7 +137,7 @@ def clipboard_monitor_loop():
     global monitoring_active
     print("\n" + "="*60)
     print("📋 Clipboard monitoring started")
-    print(f"   Trigger: Copy text ending with '{TRIGGER_SUFFIX_ENHANCE}'")
+    print(f"   Trigger: Copy text ending with '{TRIGGER_SUFFIX_ENHANCE}' ('!!ef' fast, '!!eq' quality)")
     print("="*60 + "\n")
     
     while monitoring_active:
@@ -182,7 +188,7 @@ def setup_tray_icon():
     
     menu_items = [
         pystray.MenuItem("PromptBoost is running", lambda: None, enabled=False),
-        pystray.MenuItem(f"Trigger: {TRIGGER_SUFFIX_ENHANCE}", lambda: None, enabled=False),
+        pystray.MenuItem(f"Trigger: {TRIGGER_SUFFIX_ENHANCE} (!!ef fast, !!eq quality)", lambda: None, enabled=False),
         pystray.MenuItem("✅ Dialog box enabled", lambda: None, enabled=False),
         pystray.Menu.SEPARATOR,
         pystray.MenuItem("Quit", on_quit_tray)
@@ -217,6 +223,9 @@ def start_client_app():
     warmup_thread = threading.Thread(target=warmup_api, daemon=True)
     warmup_thread.start()
 
+    # Deliver queued accept/reject feedback (including any left from the last run) in the background
+    start_feedback_flusher()
+
     # Automatically sync the codebase in the background
     from enhancer_client.enhancer.sync import sync_workspace_to_server
     def run_auto_sync():
@@ -234,7 +243,7 @@ def start_client_app():
     tray_icon = setup_tray_icon()
     
     print("✅ PromptBoost is now running!")
-    print(f"📋 Copy text ending with '{TRIGGER_SUFFIX_ENHANCE}' to enhance")
+    print(f"📋 Copy text ending with '{TRIGGER_SUFFIX_ENHANCE}' to enhance ('!!ef' fast, '!!eq' quality)")
     print("🔔 Dialog box will appear when ready")
     print("❌ Right-click tray icon → Quit to exit\n")
     
@@ -0,0 +1,45 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks import server modules directly, so this puts `server/` on sys.path and
+provides placeholder settings (the benchmarks never reach the database or the
+LLM providers unless a script says otherwise).
+"""
+import os
+import statistics
+import sys
+import time
+
+_server_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'server'))
+if _server_dir not in sys.path:
+    sys.path.insert(0, _server_dir)
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+
+def measure(fn, repeat: int = 200, warmup: int = 5) -> dict:
+    """Call `fn` repeatedly and return latency statistics in microseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "n": repeat,
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p95_us": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "max_us": samples[-1],
+    }
+
+
+def print_table(title: str, rows: dict[str, dict]) -> None:
+    print(f"\n{title}")
+    print(f"{'case':<40} {'mean_us':>12} {'p50_us':>12} {'p95_us':>12}")
+    for name, stats in rows.items():
+        print(f"{name:<40} {stats['mean_us']:>12.1f} {stats['p50_us']:>12.1f} {stats['p95_us']:>12.1f}")
@@ -0,0 +1,124 @@
+"""
+Benchmark: prompt classification per /enhance request.
+
+"per_call" is what a request used to do: is_code in check_cache, detect_context and
+is_image_prompt in get_enhanced_prompt, is_code again in save_results, each scanning
+the prompt with its own regexes (the old bodies, copied below). "classify" is one
+prompt_classifier.classify call, whose result the graph now carries in GraphState.
+Results are checked to agree before timing.
+
+Inputs of --lengths characters: plain text matching no persona (the worst case: every
+keyword list is scanned), a Python request, an image request and pasted code.
+
+Usage: python scripts/benchmarks/bench_classifier.py [--lengths 200,2000,10000] [--repeat 300]
+"""
+import argparse
+import random
+import re
+
+import _common
+
+from app.services import prompt_classifier
+
+_IMAGE_KEYWORDS = [
+    "image", "photo", "photograph", "picture", "render", "midjourney",
+    "stable diffusion", "dall", "ideogram", "illustration", "concept art",
+    "digital art", "artwork", "portrait", "landscape", "cinematic still",
+    "poster", "cover art", "oil painting", "watercolor", "3d render",
+    "anime", "pixel art", "sculpture", "studio shot", "macro shot",
+    "ultra realistic", "hdr", "4k", "8k"
+]
+
+_PLAIN = (
+    "please write a function that parses the config file and handles errors gracefully "
+    "with structured logging for our billing service and explain every step clearly"
+).split()
+_CODE = "def handler(event):\n    if event:\n        return process(event)\n    raise ValueError('empty')\n"
+
+
+def _legacy_is_image_prompt(user_prompt):
+    if not user_prompt:
+        return False
+    lowered = user_prompt.lower()
+    return any(keyword in lowered for keyword in _IMAGE_KEYWORDS)
+
+
+def _legacy_is_code(user_prompt):
+    code_indicators = [
+        r'^import\s+', r'^from\s+\w+\s+import', r'^def\s+\w+\s*\(', r'^class\s+\w+',
+        r'^\s*assert\s', r'^\s*@', r'^\s*if\s+.*:', r'^\s*return\s', r'^\s*async\s+def',
+    ]
+    lines = user_prompt.strip().split('\n')
+    if len(lines) > 3 and any(line.startswith(('    ', '\t')) for line in lines[1:]):
+        return True
+    code_line_count = 0
+    for line in lines[:10]:
+        for pattern in code_indicators:
+            if re.search(pattern, line.strip()):
+                code_line_count += 1
+                break
+    return code_line_count >= 2
+
+
+def _legacy_detect_context(user_prompt):
+    if _legacy_is_image_prompt(user_prompt):
+        return (
+            "Act as an award-winning visual prompt designer for Midjourney, "
+            "Stable Diffusion, DALL·E, Ideogram, and other generative image models."
+        )
+    if re.search(r'\b(python|pytest|fastapi|py)\b', user_prompt, re.IGNORECASE):
+        return "Act as a Senior Python Developer specializing in Test-Driven Development and FastAPI."
+    if re.search(r'\b(javascript|react|js|node|typescript|ts)\b', user_prompt, re.IGNORECASE):
+        return "Act as a Full-Stack JavaScript Developer experienced with the MERN stack and TypeScript."
+    if re.search(r'\b(stripe|payment|charge|checkout)\b', user_prompt, re.IGNORECASE):
+        return "Act as a Senior Backend Engineer experienced with e-commerce payment gateways."
+    return "Act as a Senior Software Engineer and AI expert."
+
+
+def _per_call(prompt: str):
+    code = _legacy_is_code(prompt)  # check_cache
+    persona = _legacy_detect_context(prompt)
+    image = _legacy_is_image_prompt(prompt)
+    _legacy_is_code(prompt)  # save_results
+    return code, image, persona
+
+
+def _classify(prompt: str):
+    result = prompt_classifier.classify(prompt)
+    return result.is_code, result.is_image, result.persona
+
+
+def _inputs(rng: random.Random, length: int) -> dict[str, str]:
+    def fill(prefix: str, words: list[str]) -> str:
+        text = prefix
+        while len(text) < length:
+            text += " " + rng.choice(words)
+        return text[:length]
+
+    return {
+        "plain": fill("", _PLAIN),
+        "python": fill("", _PLAIN)[: max(length - 14, 0)] + " using fastapi",
+        "image": fill("a watercolor portrait of", _PLAIN),
+        "code": (_CODE * (length // len(_CODE) + 1))[:length],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lengths", default="200,2000,10000")
+    parser.add_argument("--repeat", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    prompt_classifier.get_classifier()
+    for length in (int(n) for n in args.lengths.split(",")):
+        rows = {}
+        for kind, prompt in _inputs(rng, length).items():
+            assert _per_call(prompt) == _classify(prompt), f"classification differs for {kind}"
+            rows[f"per_call  {kind}"] = _common.measure(lambda: _per_call(prompt), repeat=args.repeat)
+            rows[f"classify  {kind}"] = _common.measure(lambda: _classify(prompt), repeat=args.repeat)
+        _common.print_table(f"Classification per request, {length}-character prompts", rows)
+
+
+if __name__ == "__main__":
+    main()
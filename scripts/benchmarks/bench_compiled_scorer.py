@@ -0,0 +1,150 @@
+"""
+Benchmark: compiled NumPy scorer vs the joblib (scikit-learn) preference model.
+
+  - load: a fresh interpreter imports what the backend needs and loads the artifacts;
+    wall time and peak RSS above a bare `import numpy` interpreter (median of --runs).
+  - latency: predict_acceptance_probabilities for n candidates with each backend.
+Scores are checked to agree within 1e-9 before timing.
+
+Uses the artifacts in server/app/ml_models when present, otherwise fits a small
+TF-IDF + LogisticRegression on synthetic text; either way they are copied to a
+temporary directory and compiled there.
+
+Usage: python scripts/benchmarks/bench_compiled_scorer.py [--sizes 1,8] [--repeat 500] [--runs 5]
+"""
+import argparse
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import warnings
+from pathlib import Path
+
+import _common
+
+from app.services import compiled_scorer, ml_inference_service as ml
+
+_WORDS = (
+    "python api fastapi service tests docs database schema endpoint cache latency "
+    "senior engineer refactor async queue retry model prompt context project deploy "
+    "docker kubernetes logging metrics tracing security review performance"
+).split()
+
+# Run in a subprocess, which prints "<import + load seconds> <peak RSS kB>". Peak RSS is
+# VmHWM (Linux /proc): ru_maxrss would include the benchmark process the child was forked from.
+_LOAD_SNIPPETS = {
+    "baseline": "import numpy",
+    "joblib": (
+        "import joblib, numpy\n"
+        "model = joblib.load(d / 'preference_model.joblib')\n"
+        "vectorizer = joblib.load(d / 'tfidf_vectorizer.joblib')\n"
+        "model.predict_proba(vectorizer.transform(['warm up']))"
+    ),
+    "compiled": (
+        "sys.path.insert(0, server)\n"
+        "from app.services.compiled_scorer import CompiledScorer\n"
+        "CompiledScorer.load(d / 'compiled').predict('warm', ['up'])"
+    ),
+}
+_LOAD_TEMPLATE = """
+import sys, time, warnings
+from pathlib import Path
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+d, server = Path({directory!r}), {server!r}
+{snippet}
+elapsed = time.perf_counter() - start
+peak = next(line.split()[1] for line in open("/proc/self/status") if line.startswith("VmHWM:"))
+print(elapsed, peak)
+"""
+
+
+def _text(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+
+def _prepare_artifacts(rng: random.Random, directory: Path) -> str:
+    warnings.simplefilter("ignore")  # artifacts may come from a different scikit-learn version
+    if ml.MODEL_PATH.exists() and ml.VECTORIZER_PATH.exists():
+        shutil.copy(ml.MODEL_PATH, directory / ml.MODEL_FILENAME)
+        shutil.copy(ml.VECTORIZER_PATH, directory / ml.VECTORIZER_FILENAME)
+        source = "trained artifacts"
+    else:
+        import joblib
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+
+        texts = [_text(rng, 60) for _ in range(400)]
+        labels = [rng.randint(0, 1) for _ in texts]
+        vectorizer = TfidfVectorizer(max_features=5000, stop_words="english", max_df=0.95)
+        model = LogisticRegression(max_iter=1000, class_weight="balanced").fit(vectorizer.fit_transform(texts), labels)
+        joblib.dump(model, directory / ml.MODEL_FILENAME)
+        joblib.dump(vectorizer, directory / ml.VECTORIZER_FILENAME)
+        source = "synthetic artifacts"
+    return source
+
+
+def _load_cost(backend: str, directory: Path, runs: int) -> tuple[float, float]:
+    script = _LOAD_TEMPLATE.format(directory=str(directory), server=_common._server_dir, snippet=_LOAD_SNIPPETS[backend])
+    subprocess.run([sys.executable, "-c", script], check=True, capture_output=True)  # warm the page cache
+    seconds, rss = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout.split()
+        seconds.append(float(out[0]))
+        rss.append(float(out[1]))
+    return statistics.median(seconds), statistics.median(rss)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1,8")
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        source = _prepare_artifacts(rng, directory)
+        import joblib
+
+        model = joblib.load(directory / ml.MODEL_FILENAME)
+        vectorizer = joblib.load(directory / ml.VECTORIZER_FILENAME)
+        if not compiled_scorer.export_compiled(model, vectorizer, directory / ml.COMPILED_DIRNAME):
+            sys.exit(f"Model can't be compiled: {compiled_scorer.compile_unsupported_reason(model, vectorizer)}")
+
+        joblib_artifacts = {"model": model, "vectorizer": vectorizer, "scorer": None, "version": "bench", "metadata": {}}
+        compiled_artifacts = {**joblib_artifacts, "model": None, "vectorizer": None,
+                              "scorer": compiled_scorer.CompiledScorer.load(directory / ml.COMPILED_DIRNAME)}
+
+        baseline_s, baseline_rss = _load_cost("baseline", directory, args.runs)
+        print(f"\nLoad in a fresh interpreter ({source}; above `import numpy`: {baseline_s * 1000:.0f} ms, {baseline_rss / 1024:.1f} MB)")
+        print(f"{'backend':<12} {'import+load_ms':>15} {'extra_rss_mb':>14}")
+        load = {}
+        for backend in ("joblib", "compiled"):
+            seconds, rss = _load_cost(backend, directory, args.runs)
+            load[backend] = {"ms": (seconds - baseline_s) * 1000, "rss_mb": (rss - baseline_rss) / 1024}
+            print(f"{backend:<12} {load[backend]['ms']:>15.1f} {load[backend]['rss_mb']:>14.1f}")
+
+        original = _text(rng, 25)
+        rows = {}
+        for size in (int(s) for s in args.sizes.split(",")):
+            candidates = [_text(rng, 120) for _ in range(size)]
+            ml.ml_artifacts = joblib_artifacts
+            expected = ml.predict_acceptance_probabilities(original, candidates)
+            rows[f"joblib    n={size}"] = _common.measure(
+                lambda: ml.predict_acceptance_probabilities(original, candidates), repeat=args.repeat
+            )
+            ml.ml_artifacts = compiled_artifacts
+            actual = ml.predict_acceptance_probabilities(original, candidates)
+            assert max(abs(a - b) for a, b in zip(expected, actual)) < 1e-9, "compiled scores differ"
+            rows[f"compiled  n={size}"] = _common.measure(
+                lambda: ml.predict_acceptance_probabilities(original, candidates), repeat=args.repeat
+            )
+        _common.print_table(f"Scoring latency per batch ({source})", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark: per-request logging overhead, synchronous prints vs. the queue-based logger.
+
+"before" replays the print() calls an /enhance + /feedback pair used to make (node
+banners and the multi-line feedback banners) straight to a line-buffered stream,
+which is how stdout behaves in the container (PYTHONUNBUFFERED=1).
+"after" replays the equivalent logger calls through app.core.logging_config, where
+request threads only enqueue and a background thread writes the JSON lines.
+
+Usage: python scripts/benchmarks/bench_logging.py [--threads 8] [--requests 2000]
+"""
+import argparse
+import contextlib
+import logging
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import _common  # noqa: F401  (sets up sys.path)
+
+from app.core import logging_config
+
+
+def _old_request(session_id: uuid.UUID) -> None:
+    print("---NODE: CHECK CACHE---")
+    print("---CACHE DISABLED FOR DATA COLLECTION (forcing cache miss)---")
+    print("---NODE: ENHANCE PROMPT---")
+    print("---NODE: QUALITY FILTER---")
+    print("---Quality Score: 0.6151 (threshold: 0.40)---")
+    print("---MAX RETRIES REACHED: Saving anyway---")
+    print("---NODE: SAVE RESULTS---")
+    print("---Creating new cache entry---")
+    print(f"\n\n\n!!!! SERVER ENDPOINT: /feedback endpoint HIT! Received session_id: {session_id}, action: rejected !!!!\n\n\n")
+    print(f"\n{'='*80}")
+    print(f"!!!! SERVER CRUD: Updating feedback for session_id: {session_id} !!!!")
+    print(f"{'='*80}")
+    print("!!!! SERVER CRUD: Updating entry ID: 1 !!!!")
+    print("!!!! SERVER CRUD: Old action: accepted -> New action: rejected !!!!")
+    print("!!!! SERVER CRUD: ✅ COMMITTED! Verified action is now: rejected !!!!")
+    print(f"{'='*80}\n")
+    print("!!!! SERVER ENDPOINT: CRUD function reported SUCCESS. !!!!")
+
+
+_graph_logger = logging.getLogger("app.graphs.enhance_graph")
+_crud_logger = logging.getLogger("app.crud.prompt_cache")
+
+
+def _new_request(session_id: uuid.UUID) -> None:
+    _graph_logger.debug("node check_cache")
+    _graph_logger.debug("Cache disabled for data collection (forcing cache miss)")
+    _graph_logger.debug("node enhance_prompt")
+    _graph_logger.debug("node quality_filter")
+    _graph_logger.info("Quality score computed", extra={"quality_score": 0.6151, "threshold": 0.40})
+    _graph_logger.debug("Max retries reached: saving anyway")
+    _graph_logger.debug("node save_results")
+    _graph_logger.debug("Creating new cache entry")
+    _crud_logger.info("Updating feedback for session", extra={"session_id": str(session_id), "user_action": "rejected"})
+    _crud_logger.info("Feedback committed", extra={"analytics_id": 1, "old_action": "accepted", "new_action": "rejected"})
+
+
+def _run(fn, threads: int, requests: int) -> dict:
+    per_thread = requests // threads
+    latencies: list[float] = []
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        for _ in range(per_thread):
+            sid = uuid.uuid4()
+            start = time.perf_counter()
+            fn(sid)
+            local.append((time.perf_counter() - start) * 1e6)
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    wall_start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - wall_start
+    latencies.sort()
+    return {
+        "mean_us": sum(latencies) / len(latencies),
+        "p50_us": latencies[len(latencies) // 2],
+        "p95_us": latencies[int(len(latencies) * 0.95)],
+        "wall_s": wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryFile("w", buffering=1, encoding="utf-8") as sink:
+        with contextlib.redirect_stdout(sink):
+            results["before: print()"] = _run(_old_request, args.threads, args.requests)
+
+    with tempfile.TemporaryFile("w", buffering=1, encoding="utf-8") as sink:
+        real_stdout = sys.stdout
+        sys.stdout = sink
+        try:
+            logging_config.setup_logging()
+            results["after: queue logger"] = _run(_new_request, args.threads, args.requests)
+            drain_start = time.perf_counter()
+            logging_config.shutdown_logging()
+            results["after: queue logger"]["drain_s"] = time.perf_counter() - drain_start
+        finally:
+            sys.stdout = real_stdout
+
+    print(f"\nLogging overhead per request ({args.threads} threads, {args.requests} requests)")
+    print(f"{'case':<24} {'mean_us':>10} {'p50_us':>10} {'p95_us':>10} {'wall_s':>8}")
+    for name, r in results.items():
+        print(f"{name:<24} {r['mean_us']:>10.1f} {r['p50_us']:>10.1f} {r['p95_us']:>10.1f} {r['wall_s']:>8.3f}")
+    if "drain_s" in results["after: queue logger"]:
+        print(f"(background writer drained the queue in {results['after: queue logger']['drain_s']:.3f}s after the run)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: DB time of the save_results write path under concurrent load.
+
+"legacy" replays the old sequence (lookup, cache insert/update with its own
+commit+refresh, history insert+commit, analytics insert+commit). "single_tx" calls
+crud.save_enhancement_results (one transaction; one statement on Postgres).
+
+Runs against DATABASE_URL, so point it at a scratch database:
+    DATABASE_URL=postgresql://... python scripts/benchmarks/bench_save_results.py --threads 8
+"""
+import argparse
+import threading
+import time
+import uuid
+
+import _common  # noqa: F401  (sets up sys.path)
+
+from app.crud import prompt_cache as crud
+from app.database.session import SessionLocal, engine
+from app.models import prompt as models
+from app.schemas import prompt as schemas
+
+
+def _legacy(db, original: str, enhanced: str, project_id: str, user_id: uuid.UUID) -> None:
+    existing = crud.get_prompt_by_original_text(db, original, project_id=project_id)
+    if existing:
+        existing.enhanced_prompt = enhanced
+        db.commit()
+        db.refresh(existing)
+        prompt_id = existing.id
+    else:
+        prompt_id = crud.create_cached_prompt(
+            db, schemas.PromptCacheCreate(original_prompt=original, enhanced_prompt=enhanced, project_id=project_id)
+        ).id
+    crud.create_prompt_history_entry(db, schemas.PromptHistoryCreate(
+        project_id=project_id, user_id=user_id, session_id=uuid.uuid4(), original_prompt=original, enhanced_prompt=enhanced,
+    ))
+    crud.create_usage_analytics_entry(db, schemas.UsageAnalyticsCreate(
+        prompt_id=prompt_id, user_id=user_id, session_id=uuid.uuid4(), enhancement_strategy="bench", user_action="accepted",
+    ))
+
+
+def _single_tx(db, original: str, enhanced: str, project_id: str, user_id: uuid.UUID) -> None:
+    session_id = uuid.uuid4()
+    crud.save_enhancement_results(
+        db,
+        prompt=schemas.PromptCacheCreate(original_prompt=original, enhanced_prompt=enhanced, project_id=project_id),
+        analytics=schemas.UsageAnalyticsBase(user_id=user_id, session_id=session_id, enhancement_strategy="bench", user_action="accepted"),
+        history=schemas.PromptHistoryCreate(
+            project_id=project_id, user_id=user_id, session_id=session_id, original_prompt=original, enhanced_prompt=enhanced,
+        ),
+    )
+
+
+def _run(fn, threads: int, per_thread: int) -> list[float]:
+    latencies: list[float] = []
+    lock = threading.Lock()
+
+    def worker(worker_id: int):
+        db = SessionLocal()
+        user_id = uuid.uuid4()
+        local = []
+        try:
+            for i in range(per_thread):
+                # Half the prompts repeat so both the insert and the conflict/update paths are exercised.
+                original = f"bench prompt {worker_id}-{i % (per_thread // 2 or 1)}"
+                start = time.perf_counter()
+                fn(db, original, f"enhanced {i}", f"bench-{fn.__name__}", user_id)
+                local.append((time.perf_counter() - start) * 1000)
+        finally:
+            db.close()
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="save_results DB time: legacy vs single transaction")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--per-thread", type=int, default=100)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    print(f"\nsave_results DB time on {engine.dialect.name} ({args.threads} threads x {args.per_thread})")
+    print(f"{'case':<12} {'mean_ms':>9} {'p50_ms':>9} {'p95_ms':>9}")
+    for fn in (_legacy, _single_tx):
+        lat = _run(fn, args.threads, args.per_thread)
+        print(f"{fn.__name__.strip('_'):<12} {sum(lat) / len(lat):>9.2f} {lat[len(lat) // 2]:>9.2f} {lat[int(len(lat) * 0.95)]:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: quality scoring of N candidate enhancements for one prompt.
+
+"per_call" is the old predict_acceptance_probability body run per candidate: one
+vectorizer.transform([text]) and one predict_proba for each. "batched" is
+predict_acceptance_probabilities: one sparse transform (the original prompt counted
+once) and one predict_proba for the whole batch. Results are checked to match.
+
+Uses the artifacts in server/app/ml_models when present, otherwise fits a small
+TF-IDF + LogisticRegression on synthetic text with the training script's settings.
+
+Usage: python scripts/benchmarks/bench_scoring.py [--sizes 1,8,64] [--repeat 200]
+"""
+import argparse
+import os
+import random
+import warnings
+
+import _common
+
+os.environ["ML_SCORER_BACKEND"] = "joblib"  # this benchmark compares sklearn code paths
+
+from app.services import ml_inference_service as ml
+
+_WORDS = (
+    "python api fastapi service tests docs database schema endpoint cache latency "
+    "senior engineer refactor async queue retry model prompt context project deploy "
+    "docker kubernetes logging metrics tracing security review performance"
+).split()
+
+
+def _text(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+
+def _score_per_call(original: str, candidates: list[str]) -> list[float]:
+    model, vectorizer = ml.ml_artifacts["model"], ml.ml_artifacts["vectorizer"]
+    return [model.predict_proba(vectorizer.transform([original + " " + c]))[0][1] for c in candidates]
+
+
+def _load_or_fit_artifacts(rng: random.Random) -> str:
+    warnings.simplefilter("ignore")  # artifacts may come from a different scikit-learn version
+    ml.load_ml_models()
+    if ml.ml_artifacts["model"] is not None:
+        return "trained artifacts"
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    texts = [_text(rng, 60) for _ in range(400)]
+    labels = [rng.randint(0, 1) for _ in texts]
+    vectorizer = TfidfVectorizer(max_features=5000, stop_words="english", max_df=0.95)
+    model = LogisticRegression(max_iter=1000, class_weight="balanced").fit(vectorizer.fit_transform(texts), labels)
+    ml.ml_artifacts.update(model=model, vectorizer=vectorizer)
+    return "synthetic artifacts"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1,8,64")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    source = _load_or_fit_artifacts(rng)
+    original = _text(rng, 25)
+
+    rows = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        candidates = [_text(rng, 120) for _ in range(size)]
+        per_call = _score_per_call(original, candidates)
+        batched = ml.predict_acceptance_probabilities(original, candidates)
+        assert all(abs(a - b) < 1e-9 for a, b in zip(per_call, batched)), "batched scores differ"
+
+        rows[f"per_call  n={size}"] = _common.measure(
+            lambda: _score_per_call(original, candidates), repeat=args.repeat
+        )
+        rows[f"batched   n={size}"] = _common.measure(
+            lambda: ml.predict_acceptance_probabilities(original, candidates), repeat=args.repeat
+        )
+    _common.print_table(f"Quality scoring latency per batch ({source})", rows)
+
+
+if __name__ == "__main__":
+    main()
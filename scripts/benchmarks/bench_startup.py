@@ -0,0 +1,137 @@
+"""
+Benchmark: server cold start, with optional budgets (exit status 1 when exceeded).
+
+  - import: `import main` in a fresh interpreter (median of --runs), and the modules
+    with the largest cumulative import time from `python -X importtime`.
+  - bind: from launching uvicorn to the first 200 from GET / (the Fly/Render health
+    check), i.e. how long a cold machine refuses traffic.
+
+The heavy dependencies (langchain providers, langgraph, chromadb, google.genai, the
+preference model) are loaded by the startup warm-up after the port is bound (see
+app/services/warmup.py), so neither number should include them. --report writes the
+import profile as Markdown (docs/startup_import_profile.md is generated this way).
+server/tests/test_startup.py holds `import main` to a budget in CI.
+
+Usage: python scripts/benchmarks/bench_startup.py [--runs 5] [--top 25]
+           [--import-budget-ms 2000] [--bind-budget-ms 5000] [--report PATH]
+"""
+import argparse
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import _common
+
+
+def _importtime() -> list[tuple[int, int, int, str]]:
+    """(self_us, cumulative_us, depth, module) for every import made by `import main`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=_common._server_dir, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+
+def _import_ms(runs: int) -> float:
+    script = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", script], cwd=_common._server_dir,
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(float(out.split()[-1]) * 1000)
+    return statistics.median(samples)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _bind_ms(timeout: float = 60.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=_common._server_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                sys.exit(f"uvicorn exited with status {server.returncode} before answering")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.02)
+        sys.exit(f"uvicorn did not answer GET / within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def _report(path: str, rows, import_ms: float, bind_ms: float, top: int) -> None:
+    ranked = sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+    lines = [
+        "# Server startup import profile",
+        "",
+        "Generated by `python scripts/benchmarks/bench_startup.py --report docs/startup_import_profile.md`.",
+        "",
+        f"- `import main`: {import_ms:.0f} ms (median)",
+        f"- uvicorn launch to first `GET /` 200: {bind_ms:.0f} ms",
+        "",
+        f"Top {top} modules by cumulative import time (`python -X importtime -c \"import main\"`, one run):",
+        "",
+        "| module | depth | cumulative ms | self ms |",
+        "|---|---:|---:|---:|",
+    ]
+    lines += [f"| `{name}` | {depth} | {cumulative / 1000:.1f} | {self_us / 1000:.1f} |"
+              for self_us, cumulative, depth, name in ranked]
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--import-budget-ms", type=float, default=None)
+    parser.add_argument("--bind-budget-ms", type=float, default=None)
+    parser.add_argument("--report", default=None, help="Write the import profile as Markdown to this path.")
+    args = parser.parse_args()
+
+    rows = _importtime()
+    print("\nLargest cumulative imports under `import main`")
+    print(f"{'module':<60} {'cumulative_ms':>14} {'self_ms':>10}")
+    for self_us, cumulative, depth, name in sorted(rows, key=lambda row: row[1], reverse=True)[:args.top]:
+        print(f"{'  ' * depth + name:<60} {cumulative / 1000:>14.1f} {self_us / 1000:>10.1f}")
+
+    import_ms = _import_ms(args.runs)
+    bind_ms = statistics.median(_bind_ms() for _ in range(args.runs))
+    print(f"\nimport main: {import_ms:.0f} ms   launch -> GET / 200: {bind_ms:.0f} ms   (median of {args.runs})")
+    if args.report:
+        _report(args.report, rows, import_ms, bind_ms, args.top)
+        print(f"Wrote {args.report}")
+
+    over = []
+    if args.import_budget_ms is not None and import_ms > args.import_budget_ms:
+        over.append(f"import main {import_ms:.0f} ms > {args.import_budget_ms:.0f} ms")
+    if args.bind_budget_ms is not None and bind_ms > args.bind_budget_ms:
+        over.append(f"bind {bind_ms:.0f} ms > {args.bind_budget_ms:.0f} ms")
+    if over:
+        sys.exit("Startup budget exceeded: " + "; ".join(over))
+
+
+if __name__ == "__main__":
+    main()
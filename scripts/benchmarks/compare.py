@@ -0,0 +1,78 @@
+"""
+Compare two benchmark suite results (scripts/benchmarks/suite.py JSON files).
+
+Prints every case with its baseline and candidate value for --metric and the change,
+marking cases slower than --threshold (a fraction, default 0.25 = 25%; the cases of a
+few microseconds vary by more than 10% between runs) and cases that only one file has.
+Exit status 1 when any case regressed, so it can gate CI.
+
+Usage: python scripts/benchmarks/compare.py BASELINE.json CANDIDATE.json
+           [--metric p50_us] [--threshold 0.25]
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("mean_us", "p50_us", "p95_us", "max_us")
+
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _label(meta: dict) -> str:
+    commit = meta.get("commit") or "unknown"
+    return f"{commit}{'-dirty' if meta.get('dirty') else ''}"
+
+
+def compare(baseline: dict, candidate: dict, metric: str, threshold: float) -> list[tuple[str, float | None, float | None, float | None, str]]:
+    """(case, baseline value, candidate value, relative change, flag) for every case in either run."""
+    rows = []
+    base_results, cand_results = baseline["results"], candidate["results"]
+    for case in sorted(set(base_results) | set(cand_results)):
+        before = base_results.get(case, {}).get(metric)
+        after = cand_results.get(case, {}).get(metric)
+        if before is None or after is None:
+            rows.append((case, before, after, None, "new" if before is None else "removed"))
+            continue
+        change = (after - before) / before if before else 0.0
+        flag = "REGRESSION" if change > threshold else "faster" if change < -threshold else ""
+        rows.append((case, before, after, change, flag))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", choices=METRICS, default="p50_us")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    baseline, candidate = _load(args.baseline), _load(args.candidate)
+    for name, run in (("baseline", baseline), ("candidate", candidate)):
+        meta = run["meta"]
+        print(f"{name:<10} {_label(meta):<16} {meta.get('created_at', '')}  python {meta.get('python', '?')}  "
+              f"scorer {meta.get('scorer', '?')}")
+    if baseline["meta"].get("platform") != candidate["meta"].get("platform"):
+        print("warning: the runs are from different platforms; timings may not be comparable")
+
+    def fmt(value):
+        return f"{value:>14.1f}" if value is not None else f"{'-':>14}"
+
+    rows = compare(baseline, candidate, args.metric, args.threshold)
+    print(f"\n{'case':<40} {'baseline':>14} {'candidate':>14} {'change':>9}  ({args.metric})")
+    for case, before, after, change, flag in rows:
+        change_text = f"{change:>+9.1%}" if change is not None else f"{'':>9}"
+        print(f"{case:<40} {fmt(before)} {fmt(after)} {change_text}  {flag}")
+
+    regressions = [row[0] for row in rows if row[4] == "REGRESSION"]
+    if regressions:
+        print(f"\n{len(regressions)} case(s) more than {args.threshold:.0%} slower: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\nNo case more than {args.threshold:.0%} slower.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Benchmark suite: the server's per-request hot paths, saved as JSON so runs on different
+commits can be compared (scripts/benchmarks/compare.py).
+
+  clean_llm_output   tagged, preamble/markdown-heavy and long noisy LLM outputs
+  classify           detect_context and is_code on plain, Python, image, pasted-code
+                     and long prompts
+  chunk_text         100 KB and 500 KB files (500 KB is the ZIP upload's per-file limit)
+  recent_prompts     _format_recent_prompts_section with 5 and 10 long entries
+  upload_zip         upload_project_zip on an in-memory archive of --zip-files source
+                     files plus ignored ones (extraction and chunking; the background
+                     sync is queued, not run)
+  scoring            predict_acceptance_probability with the loaded preference model
+  chroma_query       query_project_context (n_results=5) in projects of --chroma-sizes
+                     chunks, all in one collection
+  graph              enhancement_graph.ainvoke end to end (balanced and fast tiers)
+
+Provider calls use the mock backends (app/services/mock_backends.py) with zero latency
+and no injected failures, so the numbers are the server's own overhead. The database
+and Chroma directory are temporary; DATABASE_URL and CHROMA_PERSIST_DIRECTORY from the
+environment are ignored. Results go to --output, by default
+scripts/benchmarks/results/<commit>[-dirty].json.
+
+Usage: python scripts/benchmarks/suite.py [--only graph,scoring] [--repeat 200]
+           [--chroma-sizes 100,1000,5000] [--zip-files 200] [--output PATH]
+"""
+import argparse
+import asyncio
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import uuid
+import warnings
+import zipfile
+
+import _common
+
+_workdir = tempfile.TemporaryDirectory(prefix="promptboost-bench-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(_workdir.name, 'bench.db')}",
+    CHROMA_PERSIST_DIRECTORY=os.path.join(_workdir.name, "chroma"),
+    LLM_BACKEND="mock",
+    EMBEDDING_BACKEND="mock",
+    MOCK_LLM_LATENCY_MS="0",
+    MOCK_EMBEDDING_LATENCY_MS="0",
+    MOCK_LATENCY_DISTRIBUTION="constant",
+    MOCK_RATE_LIMIT_RATE="0",
+    MOCK_ERROR_RATE="0",
+    WRITE_BEHIND_ENABLED="false",
+    LOG_LEVEL="WARNING",
+)
+
+GROUPS = ("clean_llm_output", "classify", "chunk_text", "recent_prompts", "upload_zip", "scoring", "chroma_query", "graph")
+_results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+_ENHANCED = (
+    "Act as a Senior Python Backend Engineer. I need help with the following task: build a "
+    "FastAPI service for a todo app backed by PostgreSQL.\n\n**Requirements:**\n"
+    "1. Use SQLAlchemy 2.0 models with Alembic migrations.\n"
+    "2. Expose CRUD endpoints with pagination and input validation.\n"
+    "3. Add pytest tests for the happy path and one failure case per endpoint.\n"
+    "4. Return the result as a single, complete, runnable project layout."
+)
+NOISY_OUTPUTS = {
+    "tagged": f"<ENHANCED_PROMPT>\n{_ENHANCED}\n</ENHANCED_PROMPT>",
+    "preamble": (
+        f"Here is the enhanced prompt for you:\n\n<ENHANCED_PROMPT>\n<persona>Senior Engineer</persona>\n"
+        f"{_ENHANCED}\n</ENHANCED_PROMPT>\n\nLet me know if you want me to adjust the scope."
+    ),
+    "markdown": (
+        "Enhanced Prompt: (v2)\n**Task Request:** todo API\n**Project Context:** FastAPI, Postgres\n\n"
+        f"{_ENHANCED}\n\n**Deliverables:**\n- source\n- tests\n**Acceptance Criteria:**\n- all tests pass\n"
+    ),
+    "long": "<ENHANCED_PROMPT>\n" + "\n".join(
+        f"<section id='{i}'>{_ENHANCED}</section>" for i in range(12)
+    ) + "\n</ENHANCED_PROMPT>",
+}
+_CODE = (
+    "import json\nfrom typing import Any\n\n\ndef handler(event: dict, context: Any) -> dict:\n"
+    "    payload = json.loads(event['body'])\n    if not payload.get('user_id'):\n"
+    "        raise ValueError('user_id is required')\n    return {'statusCode': 200}\n"
+)
+PROMPTS = {
+    "plain": "please help me organise the notes from yesterday's planning meeting into action items",
+    "python": "write a python api for a todo app with fastapi and postgres",
+    "image": "a watercolor portrait of a fox in the snow, cinematic lighting, 4k",
+    "code": _CODE,
+    "long_5k": ("refactor the billing service so invoices are generated asynchronously and retried "
+                "on failure with structured logging ") * 50,
+}
+
+
+def _source_file(rng: random.Random, size: int) -> str:
+    lines, total = [], 0
+    while total < size:
+        name = f"handler_{rng.randrange(10_000)}"
+        line = f"def {name}(event):\n    return process(event, retries={rng.randrange(5)})  # {name}\n\n"
+        lines.append(line)
+        total += len(line)
+    return "".join(lines)[:size]
+
+
+def _zip_archive(rng: random.Random, files: int) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        for i in range(files):
+            z.writestr(f"project/src/pkg_{i % 10}/module_{i}.py", _source_file(rng, rng.randrange(2_000, 12_000)))
+        # Skipped by the upload: ignored directories and extensions, and an oversized file
+        for i in range(files // 4):
+            z.writestr(f"project/node_modules/dep_{i}/index.js", "module.exports = {};\n" * 50)
+            z.writestr(f"project/assets/image_{i}.png", os.urandom(2_000))
+        z.writestr("project/data/huge.csv", "a,b,c\n" * 100_000)
+    return buffer.getvalue()
+
+
+def _git_commit() -> tuple[str | None, bool]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+
+
+def bench_clean_llm_output(args, rows, meta):
+    from app.services.llm_service import clean_llm_output
+
+    for name, text in NOISY_OUTPUTS.items():
+        rows[f"clean_llm_output/{name}"] = _common.measure(lambda: clean_llm_output(text), repeat=args.repeat * 5)
+
+
+def bench_classify(args, rows, meta):
+    from app.services.llm_service import detect_context, is_code
+
+    for name, prompt in PROMPTS.items():
+        rows[f"detect_context/{name}"] = _common.measure(lambda: detect_context(prompt), repeat=args.repeat * 5)
+        rows[f"is_code/{name}"] = _common.measure(lambda: is_code(prompt), repeat=args.repeat * 5)
+
+
+def bench_chunk_text(args, rows, meta):
+    from app.api.v1.project import chunk_text
+
+    rng = random.Random(args.seed)
+    for size in (100_000, 500_000):
+        text = _source_file(rng, size)
+        rows[f"chunk_text/{size // 1000}kb"] = _common.measure(lambda: chunk_text(text, "src/big.py"), repeat=args.repeat)
+
+
+def bench_recent_prompts(args, rows, meta):
+    from app.services.llm_service import _format_recent_prompts_section
+
+    for count in (5, 10):
+        recent = [(PROMPTS["long_5k"][: 150 + 40 * i], _ENHANCED) for i in range(count)]
+        rows[f"recent_prompts/{count}"] = _common.measure(
+            lambda: _format_recent_prompts_section(recent), repeat=args.repeat * 5
+        )
+
+
+def bench_upload_zip(args, rows, meta):
+    from fastapi import BackgroundTasks, UploadFile
+
+    from app.api.v1.project import upload_project_zip
+
+    archive = _zip_archive(random.Random(args.seed), args.zip_files)
+    meta["upload_zip_bytes"] = len(archive)
+    loop = asyncio.new_event_loop()
+
+    def upload():
+        tasks = BackgroundTasks()
+        response = loop.run_until_complete(upload_project_zip(
+            tasks, project_id="bench-zip", file=UploadFile(io.BytesIO(archive), filename="project.zip")
+        ))
+        assert tasks.tasks, response
+
+    try:
+        rows[f"upload_zip/{args.zip_files}_files"] = _common.measure(upload, repeat=max(args.repeat // 10, 5), warmup=1)
+    finally:
+        loop.close()
+
+
+def bench_scoring(args, rows, meta):
+    from app.services import ml_inference_service as ml
+
+    warnings.simplefilter("ignore")  # artifacts may come from a different scikit-learn version
+    ml.load_ml_models()
+    artifacts = ml.ml_artifacts
+    meta["scorer"] = (
+        "compiled" if artifacts["scorer"] is not None
+        else "joblib" if artifacts["model"] is not None
+        else "none (model not found, returns 1.0)"
+    )
+    meta["model_version"] = artifacts["version"]
+    rows["scoring/single"] = _common.measure(
+        lambda: ml.predict_acceptance_probability(PROMPTS["python"], _ENHANCED), repeat=args.repeat
+    )
+    long_enhanced = "\n".join([_ENHANCED] * 8)
+    rows["scoring/long"] = _common.measure(
+        lambda: ml.predict_acceptance_probability(PROMPTS["python"], long_enhanced), repeat=args.repeat
+    )
+
+
+def bench_chroma_query(args, rows, meta):
+    from app.services.vector_db import vector_db
+
+    if not vector_db.is_ready():
+        raise RuntimeError("Vector DB did not initialize")
+    rng = random.Random(args.seed)
+    for size in args.chroma_sizes:
+        project_id = f"bench-{size}"
+        documents = [_source_file(rng, 800) for _ in range(size)]
+        vector_db.upsert_project_documents(
+            project_id=project_id,
+            documents=documents,
+            metadatas=[{"filename": f"src/module_{i // 5}.py", "chunk_index": i % 5} for i in range(size)],
+            ids=[f"{project_id}_{i}" for i in range(size)],
+        )
+        query = PROMPTS["python"]
+        assert vector_db.query_project_context(project_id, query, n_results=5)
+        rows[f"chroma_query/{size}"] = _common.measure(
+            lambda: vector_db.query_project_context(project_id, query, n_results=5), repeat=max(args.repeat // 4, 10)
+        )
+
+
+def bench_graph(args, rows, meta):
+    from app.database.session import AsyncSessionLocal, engine
+    from app.graphs.enhance_graph import get_enhancement_graph
+    from app.models.prompt import Base
+    from app.services import llm_service, ml_inference_service
+
+    Base.metadata.create_all(engine)
+    llm_service.init_llms()
+    llm_service.prepare_templates()
+    if ml_inference_service.ml_artifacts["version"] is None:
+        ml_inference_service.load_ml_models()
+    graph = get_enhancement_graph()
+    loop = asyncio.new_event_loop()
+    user_id = uuid.uuid4()
+
+    async def invoke(tier: str):
+        async with AsyncSessionLocal() as db:
+            state = await graph.ainvoke({
+                "original_prompt": PROMPTS["python"],
+                "user_id": user_id,
+                "session_id": uuid.uuid4(),
+                "db": db,
+                "is_reroll": False,
+                "previous_enhancement": None,
+                "project_id": "bench-graph",
+                "project_context": None,
+                "recent_prompts": [(PROMPTS["plain"], _ENHANCED)] * 5,
+                "deadline_at": None,
+                "latency_tier": tier,
+                "started_at": None,
+            })
+        assert state.get("enhanced_prompt") and not llm_service.is_error_output(state["enhanced_prompt"]), state
+
+    try:
+        for tier in ("balanced", "fast"):
+            rows[f"graph/{tier}"] = _common.measure(
+                lambda: loop.run_until_complete(invoke(tier)), repeat=max(args.repeat // 4, 10)
+            )
+    finally:
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", default=",".join(GROUPS), help=f"Comma list of groups: {', '.join(GROUPS)}")
+    parser.add_argument("--repeat", type=int, default=200, help="Base iteration count (fast cases run 5x, slow ones fewer).")
+    parser.add_argument("--chroma-sizes", default="100,1000,5000")
+    parser.add_argument("--zip-files", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    args.chroma_sizes = [int(s) for s in args.chroma_sizes.split(",")]
+    groups = [g for g in args.only.split(",") if g]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"Unknown groups: {', '.join(sorted(unknown))}")
+
+    commit, dirty = _git_commit()
+    meta = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+    }
+    rows: dict[str, dict] = {}
+    for group in groups:
+        print(f"running {group}...", file=sys.stderr)
+        globals()[f"bench_{group}"](args, rows, meta)
+    _common.print_table("Server hot paths", rows)
+
+    output = args.output or os.path.join(_results_dir, f"{commit or 'unknown'}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"meta": meta, "results": rows}, f, indent=2)
+    print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        _workdir.cleanup()
@@ -0,0 +1,265 @@
+"""
+Open-loop load generator for the PromptBoost API.
+
+Sends a weighted mix of POST /enhance, /feedback and /project/sync requests at a
+target rate (requests start on schedule whether or not earlier ones have finished,
+up to --max-in-flight) and reports, per endpoint, the status codes, p50/p95/p99
+latency and completed requests per second.
+
+With --serve the script starts its own uvicorn server on a free port with the mock
+LLM and embedding backends (LLM_BACKEND=mock, EMBEDDING_BACKEND=mock, see
+server/app/services/mock_backends.py), a throwaway SQLite database (LOADTEST_DATABASE_URL
+to use another) and a temporary Chroma directory, so no API keys or provider quota are
+needed; any other settings (MOCK_*, WRITE_BEHIND_ENABLED, ...) are passed through from
+the environment. Without --serve it drives --base-url.
+
+Usage:
+    python scripts/load_test.py --serve --rps 20 --duration 30
+    python scripts/load_test.py --serve --llm-latency-ms 1200 --rate-limit-rate 0.05 --mix enhance=1
+    python scripts/load_test.py --base-url http://localhost:8000/api/v1 --rps 5 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+_server_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+PROMPTS = [
+    "write a python api for a todo app",
+    "explain how react hooks work",
+    "add stripe checkout to my fastapi backend",
+    "write pytest tests for the user service",
+    "a watercolor portrait of a fox in the snow",
+    "refactor this module to use dependency injection",
+    "build a typescript cli that syncs two folders",
+    "how do I paginate a sqlalchemy query",
+]
+ACTIONS = ["accepted", "rejected", "modified"]
+SOURCE = (
+    "def handler(event, context):\n"
+    "    payload = json.loads(event['body'])\n"
+    "    if not payload.get('user_id'):\n"
+    "        raise ValueError('user_id is required')\n"
+    "    return {'statusCode': 200, 'body': json.dumps(process(payload))}\n"
+)
+
+
+def _parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("enhance", "feedback", "sync"):
+            raise SystemExit(f"Unknown endpoint in --mix: {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _percentile(sorted_values: list[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, args, rng: random.Random):
+        self.client = client
+        self.args = args
+        self.rng = rng
+        self.user_id = str(uuid.uuid4())
+        self.project_ids = [f"loadtest-{i}" for i in range(args.projects)]
+        self.sessions: list[str] = []  # enhanced sessions that feedback can refer to
+        self.results: dict[str, list[tuple[int | str, float]]] = {"enhance": [], "feedback": [], "sync": []}
+        self.in_flight = 0
+        self.dropped = 0
+
+    def _enhance(self) -> tuple[str, dict]:
+        session_id = str(uuid.uuid4())
+        body = {
+            "original_prompt": self.rng.choice(PROMPTS),
+            "user_id": self.user_id,
+            "session_id": session_id,
+            "project_id": self.rng.choice(self.project_ids),
+        }
+        if self.args.latency_tier:
+            body["latency_tier"] = self.args.latency_tier
+        return "/enhance", body
+
+    def _feedback(self) -> tuple[str, dict]:
+        session_id = self.rng.choice(self.sessions) if self.sessions else str(uuid.uuid4())
+        return "/feedback", {"session_id": session_id, "user_action": self.rng.choice(ACTIONS), "user_id": self.user_id}
+
+    def _sync(self) -> tuple[str, dict]:
+        filename = f"src/module_{self.rng.randrange(1000)}.py"
+        documents = [SOURCE.replace("handler", f"handler_{i}") for i in range(self.args.sync_chunks)]
+        return "/project/sync", {
+            "project_id": self.rng.choice(self.project_ids),
+            "documents": documents,
+            "metadatas": [{"filename": filename, "chunk_index": i} for i in range(len(documents))],
+            "ids": [f"{filename}_{i}_{uuid.uuid4().hex[:8]}" for i in range(len(documents))],
+        }
+
+    async def _send(self, endpoint: str) -> None:
+        path, body = getattr(self, f"_{endpoint}")()
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(path, json=body)
+            outcome = response.status_code
+            if endpoint == "enhance" and response.status_code == 200:
+                self.sessions.append(body["session_id"])
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+        finally:
+            self.in_flight -= 1
+        self.results[endpoint].append((outcome, time.perf_counter() - started))
+
+    async def run(self) -> float:
+        mix = _parse_mix(self.args.mix)
+        endpoints, weights = list(mix), list(mix.values())
+        total = int(self.args.rps * self.args.duration)
+        tasks = []
+        started = time.perf_counter()
+        for i in range(total):
+            delay = started + i / self.args.rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.in_flight >= self.args.max_in_flight:
+                self.dropped += 1
+                continue
+            self.in_flight += 1
+            tasks.append(asyncio.create_task(self._send(self.rng.choices(endpoints, weights)[0])))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> dict:
+        summary = {"target_rps": self.args.rps, "elapsed_s": round(elapsed, 2), "dropped": self.dropped, "endpoints": {}}
+        for endpoint, results in self.results.items():
+            if not results:
+                continue
+            statuses: dict[str, int] = {}
+            for outcome, _ in results:
+                statuses[str(outcome)] = statuses.get(str(outcome), 0) + 1
+            ok = sorted(seconds * 1000 for outcome, seconds in results if isinstance(outcome, int) and outcome < 400)
+            summary["endpoints"][endpoint] = {
+                "requests": len(results),
+                "ok": len(ok),
+                "statuses": statuses,
+                "throughput_rps": round(len(ok) / elapsed, 2),
+                "p50_ms": _percentile(ok, 0.50),
+                "p95_ms": _percentile(ok, 0.95),
+                "p99_ms": _percentile(ok, 0.99),
+            }
+        return summary
+
+
+def _print_summary(summary: dict) -> None:
+    def fmt(value):
+        return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
+
+    print(f"\nTarget {summary['target_rps']} req/s for {summary['elapsed_s']} s, "
+          f"{summary['dropped']} not sent (max in flight reached)")
+    print(f"{'endpoint':<10} {'requests':>9} {'ok':>7} {'ok/s':>8} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9}  statuses")
+    for endpoint, row in summary["endpoints"].items():
+        print(f"{endpoint:<10} {row['requests']:>9} {row['ok']:>7} {row['throughput_rps']:>8.2f} "
+              f"{fmt(row['p50_ms'])} {fmt(row['p95_ms'])} {fmt(row['p99_ms'])}  {row['statuses']}")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(args, workdir: str) -> tuple[subprocess.Popen, str]:
+    """uvicorn with the mock backends, a fresh SQLite database and Chroma directory; returns (process, API base URL)."""
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "mock",
+        "EMBEDDING_BACKEND": "mock",
+        "DATABASE_URL": os.environ.get("LOADTEST_DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"),
+        "CHROMA_PERSIST_DIRECTORY": os.path.join(workdir, "chroma"),
+    }
+    for flag, name in (("llm_latency_ms", "MOCK_LLM_LATENCY_MS"), ("error_rate", "MOCK_ERROR_RATE"),
+                       ("rate_limit_rate", "MOCK_RATE_LIMIT_RATE")):
+        if getattr(args, flag) is not None:
+            env[name] = str(getattr(args, flag))
+    create_tables = "from app.database.session import engine; from app.models.prompt import Base; Base.metadata.create_all(engine)"
+    subprocess.run([sys.executable, "-c", create_tables], cwd=_server_dir, env=env, check=True)
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=_server_dir, env=env, stdout=subprocess.DEVNULL, stderr=None if args.server_logs else subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"uvicorn exited with status {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                return server, f"http://127.0.0.1:{port}/api/v1"
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    sys.exit("Server did not become ready within 120s")
+
+
+async def _main(args, base_url: str) -> dict:
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        test = LoadTest(client, args, random.Random(args.seed))
+        elapsed = await test.run()
+    return test.report(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000/api/v1")
+    parser.add_argument("--serve", action="store_true", help="Start a local server with the mock backends.")
+    parser.add_argument("--rps", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load.")
+    parser.add_argument("--mix", default="enhance=8,feedback=3,sync=1", help="Relative weights per endpoint.")
+    parser.add_argument("--max-in-flight", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--latency-tier", choices=["fast", "balanced", "quality"], default=None)
+    parser.add_argument("--projects", type=int, default=5, help="Distinct project ids to spread requests over.")
+    parser.add_argument("--sync-chunks", type=int, default=8, help="Chunks per /project/sync request.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Also write the summary to this file.")
+    serve = parser.add_argument_group("--serve options (else use MOCK_* environment variables)")
+    serve.add_argument("--llm-latency-ms", type=float, default=None)
+    serve.add_argument("--error-rate", type=float, default=None)
+    serve.add_argument("--rate-limit-rate", type=float, default=None)
+    serve.add_argument("--server-logs", action="store_true", help="Show the server's stderr.")
+    args = parser.parse_args()
+
+    server = None
+    with tempfile.TemporaryDirectory(prefix="promptboost-loadtest-") as workdir:
+        base_url = args.base_url
+        if args.serve:
+            server, base_url = _start_server(args, workdir)
+        try:
+            summary = asyncio.run(_main(args, base_url))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+    _print_summary(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Create upcoming monthly partitions and apply the retention policy to prompt_history
+and usage_analytics (see app/services/data_retention.py). Safe to run from cron;
+the server runs the same pass every DATA_MAINTENANCE_INTERVAL_HOURS.
+
+    python scripts/manage_data_retention.py --dry-run
+    python scripts/manage_data_retention.py --retention-months 12 --mode archive
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+_server_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server'))
+if _server_dir not in sys.path:
+    sys.path.insert(0, _server_dir)
+
+from app.services.data_retention import RETENTION_MODES, run_maintenance
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition upkeep and retention for history/analytics tables.")
+    parser.add_argument("--retention-months", type=int, default=None,
+                        help="Override DATA_RETENTION_MONTHS (0 keeps everything).")
+    parser.add_argument("--mode", choices=RETENTION_MODES, default=None,
+                        help="Override DATA_RETENTION_MODE.")
+    parser.add_argument("--months-ahead", type=int, default=None,
+                        help="Override PARTITION_PREMAKE_MONTHS.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report what would be retired without changing anything.")
+    args = parser.parse_args()
+
+    report = run_maintenance(
+        retention_months=args.retention_months,
+        mode=args.mode,
+        months_ahead=args.months_ahead,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Recompute analytics_daily_rollup from usage_analytics (the write path normally keeps
+it current; use this after a backfill, a manual data fix, on a fresh SQLite DB, or when a
+server died with rollup deltas still buffered in memory).
+
+    python scripts/rebuild_analytics_rollup.py            # everything
+    python scripts/rebuild_analytics_rollup.py --days 7   # only the last 7 days
+"""
+import argparse
+import datetime
+import logging
+import os
+import sys
+
+_server_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server'))
+if _server_dir not in sys.path:
+    sys.path.insert(0, _server_dir)
+
+from app.crud import prompt_cache as crud
+from app.database.session import SessionLocal
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the analytics_daily_rollup table.")
+    parser.add_argument("--days", type=int, default=None,
+                        help="Only rebuild the last N days (default: all days).")
+    args = parser.parse_args()
+
+    since = None
+    if args.days is not None:
+        since = datetime.datetime.utcnow().date() - datetime.timedelta(days=args.days - 1)
+
+    db = SessionLocal()
+    try:
+        rows = crud.rebuild_analytics_rollup(db, since=since)
+    finally:
+        db.close()
+    print(f"Rebuilt analytics_daily_rollup: {rows} rows" + (f" since {since}" if since else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,36 @@
+import argparse
+import datetime
 import sys
 import os
+import numpy as np
 import pandas as pd
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
+import sklearn
 import joblib
 import logging
 
 # This allows the script to import from the 'app' directory
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server')))
 
+from app.core.config import settings
 from app.database.session import SessionLocal
 # Correctly import models to use them in the query
 from app.models import prompt as models
+from app.services import ml_inference_service
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Define artifact paths
-ARTIFACTS_DIR = os.path.join("server", "app", "ml_models")
-MODEL_PATH = os.path.join(ARTIFACTS_DIR, "preference_model.joblib")
-VECTORIZER_PATH = os.path.join(ARTIFACTS_DIR, "tfidf_vectorizer.joblib")
+# Versioned artifacts: server/app/ml_models/versions/<version>/ plus the CURRENT pointer
+ARTIFACTS_DIR = ml_inference_service.ARTIFACTS_DIR
+# Incremental mode: model + stateless vectorizer + watermark, resumed by the next run
+CHECKPOINT_PATH = ARTIFACTS_DIR / "incremental" / "checkpoint.joblib"
+HASHING_FEATURES = 2 ** 18
 
 def load_feedback_data(db: Session) -> pd.DataFrame:
     """
@@ -41,14 +49,17 @@ def load_feedback_data(db: Session) -> pd.DataFrame:
         models.UsageAnalytics.user_action.isnot(None)
     )
     
-    df = pd.read_sql(query.statement, query.session.bind)
+    # Full-table export: run it on the read replica when DATABASE_READ_URL is set
+    statement = query.statement.execution_options(replica_ok=True)
+    df = pd.read_sql(statement, db.get_bind(clause=statement))
     logging.info(f"Found {len(df)} records with user feedback.")
     return df
 
-def train_model():
+def train_model(activate: bool = True):
     """
     Main function to load data, train the preference model, and save the artifacts.
     Requires at least 50 accepted and 50 rejected samples.
+    With activate=False the new version is written but CURRENT is left alone.
     """
     db = SessionLocal()
     df = load_feedback_data(db)
@@ -139,11 +150,178 @@ def train_model():
     logging.info(f"Rejected class accuracy: {rejected_acc:.4f}")
 
     # --- Saving Artifacts ---
-    os.makedirs(ARTIFACTS_DIR, exist_ok=True)
-    joblib.dump(model, MODEL_PATH)
-    joblib.dump(vectorizer, VECTORIZER_PATH)
-    logging.info(f"Model and vectorizer saved successfully to {ARTIFACTS_DIR}")
-    logging.info("✅ Training complete! The quality filter will now use this model.")
+    metadata = {
+        "trained_at": datetime.datetime.utcnow().isoformat(),
+        "samples": len(df),
+        "accepted": int(accepted_count),
+        "rejected": int(rejected_count),
+        "accuracy": round(float(accuracy), 4),
+        "model": type(model).__name__,
+        "vectorizer": type(vectorizer).__name__,
+        "sklearn_version": sklearn.__version__,
+    }
+    version = ml_inference_service.save_model_version(model, vectorizer, metadata, activate=activate)
+    logging.info(f"Model, vectorizer and compiled scorer saved successfully to {ARTIFACTS_DIR} as version {version}")
+    if activate:
+        logging.info("✅ Training complete! Running servers pick up this version within ML_MODEL_WATCH_SECONDS.")
+    else:
+        logging.info(f"✅ Training complete! Activate it with POST /api/v1/admin/model/reload?version={version}.")
+
+# --- Incremental mode ---
+# The full run above relearns everything from one DataFrame. --incremental instead
+# streams only the feedback rows past the last watermark, in chunks from a server-side
+# cursor, through a HashingVectorizer (no vocabulary to fit, so it never changes) into
+# SGDClassifier.partial_fit, and resumes from the checkpoint the previous run saved.
+# Memory is bounded by --chunk-size rather than by the number of feedback rows.
+#
+# The watermark is (created_at, id) of the last analytics row consumed. Feedback updates
+# an existing row rather than inserting one, so rows are only consumed once they are
+# older than --settle-minutes (FEEDBACK_FALLBACK_WINDOW_MINUTES by default): feedback
+# arriving after that is not picked up incrementally; a full run relearns it.
+
+def new_incremental_state() -> dict:
+    return {
+        "vectorizer": HashingVectorizer(
+            n_features=HASHING_FEATURES, stop_words='english', alternate_sign=False, norm='l2'
+        ),
+        "model": SGDClassifier(loss='log_loss', alpha=1e-5, random_state=42),
+        "watermark": None,          # (created_at, id) of the last row trained on
+        "class_counts": [0, 0],     # rejected, accepted: for balanced sample weights
+        "rows_seen": 0,
+        "progressive_correct": 0,   # predictions made on each chunk before training on it
+        "progressive_total": 0,
+    }
+
+
+def load_checkpoint() -> dict:
+    if CHECKPOINT_PATH.exists():
+        return joblib.load(CHECKPOINT_PATH)
+    return new_incremental_state()
+
+
+def save_checkpoint(state: dict) -> None:
+    """Write-then-rename, so an interrupted run leaves the previous checkpoint intact."""
+    CHECKPOINT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CHECKPOINT_PATH.with_name(CHECKPOINT_PATH.name + ".tmp")
+    joblib.dump(state, tmp)
+    os.replace(tmp, CHECKPOINT_PATH)
+
+
+def stream_new_feedback(db: Session, watermark, settled_before: datetime.datetime, chunk_size: int):
+    """Yield lists of (created_at, id, user_action, original, enhanced) past `watermark`, oldest first."""
+    analytics = models.UsageAnalytics
+    statement = select(
+        analytics.created_at,
+        analytics.id,
+        analytics.user_action,
+        models.PromptCache.original_prompt,
+        models.PromptCache.enhanced_prompt,
+    ).join(
+        models.PromptCache, analytics.prompt_id == models.PromptCache.id
+    ).where(
+        analytics.user_action.isnot(None),
+        analytics.created_at < settled_before,
+    ).order_by(analytics.created_at, analytics.id)
+    if watermark is not None:
+        created_at, row_id = watermark
+        statement = statement.where(or_(
+            analytics.created_at > created_at,
+            and_(analytics.created_at == created_at, analytics.id > row_id),
+        ))
+
+    statement = statement.execution_options(replica_ok=True)
+    with db.get_bind(clause=statement).connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(statement)
+        for partition in result.partitions():
+            yield partition
+
+
+def train_incremental(activate: bool = True, chunk_size: int = 5000, settle_minutes: int | None = None):
+    """Update the checkpointed model with feedback since the last watermark and publish it."""
+    state = load_checkpoint()
+    if settle_minutes is None:
+        settle_minutes = settings.FEEDBACK_FALLBACK_WINDOW_MINUTES
+    settled_before = datetime.datetime.utcnow() - datetime.timedelta(minutes=settle_minutes)
+    logging.info(f"Incremental training from watermark {state['watermark']} (rows before {settled_before:%Y-%m-%d %H:%M})")
+
+    vectorizer, model = state["vectorizer"], state["model"]
+    new_rows = 0
+    db = SessionLocal()
+    try:
+        for chunk in stream_new_feedback(db, state["watermark"], settled_before, chunk_size):
+            y = np.array([1 if row.user_action == models.UserAction.accepted else 0 for row in chunk])
+            X = vectorizer.transform([row.original_prompt + " " + row.enhanced_prompt for row in chunk])
+
+            if state["rows_seen"]:
+                state["progressive_correct"] += int((model.predict(X) == y).sum())
+                state["progressive_total"] += len(y)
+
+            counts = state["class_counts"]
+            counts[0] += int((y == 0).sum())
+            counts[1] += int((y == 1).sum())
+            # Balanced weights from the class counts so far (partial_fit has no class_weight='balanced')
+            total = counts[0] + counts[1]
+            weights = np.array([total / (2 * max(counts[label], 1)) for label in y])
+            model.partial_fit(X, y, classes=np.array([0, 1]), sample_weight=weights)
+
+            state["rows_seen"] += len(chunk)
+            state["watermark"] = (chunk[-1].created_at, chunk[-1].id)
+            new_rows += len(chunk)
+            save_checkpoint(state)
+            logging.info(f"Trained on {new_rows} new rows (watermark {state['watermark']})")
+    finally:
+        db.close()
+
+    if new_rows == 0:
+        logging.info("No new feedback since the last watermark. Nothing to publish.")
+        return
+    if min(state["class_counts"]) == 0:
+        logging.warning(f"Only one class seen so far ({state['class_counts']}); not publishing a model yet.")
+        return
+
+    progressive_accuracy = (
+        state["progressive_correct"] / state["progressive_total"] if state["progressive_total"] else None
+    )
+    if progressive_accuracy is not None:
+        logging.info(f"Progressive validation accuracy: {progressive_accuracy:.4f}")
+    metadata = {
+        "trained_at": datetime.datetime.utcnow().isoformat(),
+        "mode": "incremental",
+        "samples": state["rows_seen"],
+        "new_samples": new_rows,
+        "accepted": state["class_counts"][1],
+        "rejected": state["class_counts"][0],
+        "progressive_accuracy": round(progressive_accuracy, 4) if progressive_accuracy is not None else None,
+        "watermark": list(state["watermark"]),
+        "model": type(model).__name__,
+        "vectorizer": type(vectorizer).__name__,
+        "sklearn_version": sklearn.__version__,
+    }
+    version = ml_inference_service.save_model_version(model, vectorizer, metadata, activate=activate)
+    logging.info(f"✅ Incremental training complete! Published version {version}.")
+
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the preference model and publish a new artifact version.")
+    parser.add_argument("--no-activate", action="store_true", help="Write the version without pointing CURRENT at it.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Update the checkpointed hashing/SGD model with feedback since the last run.")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per streamed chunk (--incremental).")
+    parser.add_argument("--settle-minutes", type=int, default=None,
+                        help="Only train on rows older than this (--incremental; default FEEDBACK_FALLBACK_WINDOW_MINUTES).")
+    parser.add_argument("--reset", action="store_true", help="Discard the incremental checkpoint and start over.")
+    parser.add_argument("--compile", metavar="VERSION", default=None,
+                        help="Only (re)export the compiled NumPy scorer for an existing version ('unversioned' for the flat files).")
+    args = parser.parse_args()
+    if args.compile:
+        version = None if args.compile == ml_inference_service.UNVERSIONED else args.compile
+        if ml_inference_service.compile_version(version):
+            logging.info(f"Compiled scorer written for version {args.compile}.")
+        else:
+            logging.warning(f"Version {args.compile} can't be compiled; it will be served with joblib.")
+    elif args.incremental:
+        if args.reset and CHECKPOINT_PATH.exists():
+            CHECKPOINT_PATH.unlink()
+        train_incremental(activate=not args.no_activate, chunk_size=args.chunk_size, settle_minutes=args.settle_minutes)
+    else:
+        train_model(activate=not args.no_activate)
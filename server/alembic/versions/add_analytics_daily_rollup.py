@@ -0,0 +1,46 @@
+"""Add analytics_daily_rollup (acceptance counts per day/strategy/group/action)
+
+Revision ID: f5a6b7c8d9e0
+Revises: e4f5a6b7c8d9
+Create Date: 2026-10-19
+
+The table is backfilled from usage_analytics here; from then on the write path keeps
+it current (see crud.statements.rollup_upsert). scripts/rebuild_analytics_rollup.py
+recomputes it if it ever drifts.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "f5a6b7c8d9e0"
+down_revision: Union[str, None] = "e4f5a6b7c8d9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS analytics_daily_rollup (
+            day DATE NOT NULL,
+            enhancement_strategy VARCHAR(100) NOT NULL,
+            experiment_group VARCHAR(50) NOT NULL,
+            user_action VARCHAR(20) NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, enhancement_strategy, experiment_group, user_action)
+        )
+    """)
+    op.execute("""
+        INSERT INTO analytics_daily_rollup (day, enhancement_strategy, experiment_group, user_action, count)
+        SELECT created_at::date,
+               COALESCE(enhancement_strategy, ''),
+               COALESCE(experiment_group, ''),
+               COALESCE(user_action::text, 'none'),
+               count(*)
+        FROM usage_analytics
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS analytics_daily_rollup")
@@ -0,0 +1,54 @@
+"""Add latency tier and latency to usage_analytics and analytics_daily_rollup
+
+Revision ID: b7c8d9e0f1a2
+Revises: a6b7c8d9e0f1
+Create Date: 2026-10-19
+
+usage_analytics gains latency_tier and latency_ms (NULL on existing rows). The rollup
+gains latency_tier as a key column ("" for those rows) plus latency_ms_total and
+latency_count, so the primary key is recreated. Downgrading merges the tiers of each
+(day, strategy, group, action) back into one row.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "b7c8d9e0f1a2"
+down_revision: Union[str, None] = "a6b7c8d9e0f1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE usage_analytics ADD COLUMN latency_tier VARCHAR(20), ADD COLUMN latency_ms INTEGER")
+    op.execute("""
+        ALTER TABLE analytics_daily_rollup
+            ADD COLUMN latency_tier VARCHAR(20) NOT NULL DEFAULT '',
+            ADD COLUMN latency_ms_total BIGINT NOT NULL DEFAULT 0,
+            ADD COLUMN latency_count INTEGER NOT NULL DEFAULT 0,
+            DROP CONSTRAINT analytics_daily_rollup_pkey,
+            ADD PRIMARY KEY (day, enhancement_strategy, experiment_group, latency_tier, user_action)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE TEMPORARY TABLE analytics_daily_rollup_merged ON COMMIT DROP AS
+        SELECT day, enhancement_strategy, experiment_group, user_action, SUM(count)::integer AS count
+        FROM analytics_daily_rollup
+        GROUP BY 1, 2, 3, 4
+    """)
+    op.execute("DELETE FROM analytics_daily_rollup")
+    op.execute("""
+        ALTER TABLE analytics_daily_rollup
+            DROP CONSTRAINT analytics_daily_rollup_pkey,
+            DROP COLUMN latency_tier,
+            DROP COLUMN latency_ms_total,
+            DROP COLUMN latency_count,
+            ADD PRIMARY KEY (day, enhancement_strategy, experiment_group, user_action)
+    """)
+    op.execute("""
+        INSERT INTO analytics_daily_rollup (day, enhancement_strategy, experiment_group, user_action, count)
+        SELECT day, enhancement_strategy, experiment_group, user_action, count FROM analytics_daily_rollup_merged
+    """)
+    op.execute("ALTER TABLE usage_analytics DROP COLUMN latency_tier, DROP COLUMN latency_ms")
@@ -0,0 +1,38 @@
+"""Add (session_id, created_at) and (user_id, created_at) indexes to usage_analytics
+
+Revision ID: c2d3e4f5a6b7
+Revises: b1c2d3e4f5a6
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "c2d3e4f5a6b7"
+down_revision: Union[str, None] = "b1c2d3e4f5a6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY so a large usage_analytics table stays writable while the indexes build;
+    # it cannot run inside the migration transaction.
+    with op.get_context().autocommit_block():
+        # /feedback: latest row for a session_id
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_usage_analytics_session_created
+            ON usage_analytics(session_id, created_at DESC)
+        """)
+        # /feedback fallback: a user's most recent rows within a time window
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_usage_analytics_user_created
+            ON usage_analytics(user_id, created_at DESC)
+        """)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_usage_analytics_user_created")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_usage_analytics_session_created")
@@ -0,0 +1,25 @@
+"""Add usage_analytics.model_version (preference model that scored the enhancement)
+
+Revision ID: a6b7c8d9e0f1
+Revises: f5a6b7c8d9e0
+Create Date: 2026-10-19
+
+On Postgres the column is added to the partitioned parent and so to every partition.
+Existing rows keep NULL: they predate versioned model artifacts.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "a6b7c8d9e0f1"
+down_revision: Union[str, None] = "f5a6b7c8d9e0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE usage_analytics ADD COLUMN model_version VARCHAR(64)")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE usage_analytics DROP COLUMN model_version")
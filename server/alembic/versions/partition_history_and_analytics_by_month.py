@@ -0,0 +1,164 @@
+"""Partition prompt_history and usage_analytics by month on created_at
+
+Revision ID: e4f5a6b7c8d9
+Revises: d3e4f5a6b7c8
+Create Date: 2026-10-19
+
+Each table is rebuilt as a RANGE-partitioned table (one partition per calendar month
+plus a DEFAULT catch-all), existing rows are copied across and the old table is
+dropped. The primary key becomes (id, created_at) because Postgres requires the
+partition key in every unique constraint; ids still come from the original sequence.
+
+promptboost_ensure_monthly_partitions() creates missing monthly partitions; the app's
+maintenance job (app/services/data_retention.py) calls it to stay a few months ahead.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "e4f5a6b7c8d9"
+down_revision: Union[str, None] = "d3e4f5a6b7c8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+# Indexes recreated on the partitioned parents (they cascade to every partition)
+INDEXES = {
+    "prompt_history": [
+        "CREATE INDEX ix_prompt_history_project_id ON prompt_history(project_id)",
+        "CREATE INDEX ix_prompt_history_user_id ON prompt_history(user_id)",
+        "CREATE INDEX ix_prompt_history_created_at ON prompt_history(created_at DESC)",
+        "CREATE INDEX ix_prompt_history_project_user_created ON prompt_history(project_id, user_id, created_at DESC)",
+    ],
+    "usage_analytics": [
+        "CREATE INDEX ix_usage_analytics_prompt_id ON usage_analytics(prompt_id)",
+        "CREATE INDEX ix_usage_analytics_user_id ON usage_analytics(user_id)",
+        "CREATE INDEX ix_usage_analytics_session_created ON usage_analytics(session_id, created_at DESC)",
+        "CREATE INDEX ix_usage_analytics_user_created ON usage_analytics(user_id, created_at DESC)",
+    ],
+}
+
+ENSURE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION promptboost_ensure_monthly_partitions(parent text, first_month date, last_month date)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month_start date := date_trunc('month', first_month)::date;
+    month_end date;
+    part text;
+    default_part text := parent || '_default';
+    created integer := 0;
+    stray bigint;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        month_end := (month_start + interval '1 month')::date;
+        part := format('%s_p%s', parent, to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(part) IS NULL THEN
+            EXECUTE format('SELECT count(*) FROM %I WHERE created_at >= %L AND created_at < %L',
+                           default_part, month_start, month_end) INTO stray;
+            IF stray > 0 THEN
+                -- Rows already landed in the DEFAULT partition: move them into the new one
+                EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, default_part);
+                EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                               part, parent, month_start, month_end);
+                EXECUTE format('INSERT INTO %I SELECT * FROM %I WHERE created_at >= %L AND created_at < %L',
+                               part, default_part, month_start, month_end);
+                EXECUTE format('DELETE FROM %I WHERE created_at >= %L AND created_at < %L',
+                               default_part, month_start, month_end);
+                EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I DEFAULT', parent, default_part);
+            ELSE
+                EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                               part, parent, month_start, month_end);
+            END IF;
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END $$;
+"""
+
+
+def _is_partitioned(table: str) -> bool:
+    return bool(op.get_bind().execute(
+        sa.text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}
+    ).scalar())
+
+
+def _partition_table(table: str) -> None:
+    if _is_partitioned(table):
+        return
+    staging = f"{table}_partitioned"
+    op.execute(f"UPDATE {table} SET created_at = timezone('utc', now()) WHERE created_at IS NULL")
+    op.execute(f"CREATE TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+    op.execute(f"ALTER TABLE {staging} ALTER COLUMN created_at SET NOT NULL")
+    op.execute(f"ALTER TABLE {staging} ALTER COLUMN created_at SET DEFAULT timezone('utc', now())")
+    op.execute(f"ALTER TABLE {staging} ADD CONSTRAINT {table}_pkey_p PRIMARY KEY (id, created_at)")
+    op.execute(f"CREATE TABLE {staging}_default PARTITION OF {staging} DEFAULT")
+    op.execute(f"""
+        SELECT promptboost_ensure_monthly_partitions(
+            '{staging}',
+            COALESCE((SELECT min(created_at) FROM {table}), now())::date,
+            (now() + interval '{MONTHS_AHEAD} months')::date
+        )
+    """)
+    op.execute(f"INSERT INTO {staging} SELECT * FROM {table}")
+
+    # Keep the id sequence alive when the old table goes away
+    sequence = op.get_bind().execute(sa.text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": table}).scalar()
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {staging}.id")
+    op.execute(f"DROP TABLE {table}")
+
+    # Rename the parent and its partitions to their final names
+    op.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+    op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {table}_pkey_p TO {table}_pkey")
+    partitions = op.get_bind().execute(sa.text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:t)
+    """), {"t": table}).scalars().all()
+    for partition in partitions:
+        op.execute(f"ALTER TABLE {partition} RENAME TO {partition.replace(staging, table, 1)}")
+
+    if table == "usage_analytics":
+        op.execute("""
+            ALTER TABLE usage_analytics ADD CONSTRAINT usage_analytics_prompt_id_fkey
+            FOREIGN KEY (prompt_id) REFERENCES prompt_cache(id)
+        """)
+    for statement in INDEXES[table]:
+        op.execute(statement)
+
+
+def _unpartition_table(table: str) -> None:
+    if not _is_partitioned(table):
+        return
+    staging = f"{table}_plain"
+    op.execute(f"CREATE TABLE {staging} (LIKE {table} INCLUDING DEFAULTS)")
+    op.execute(f"INSERT INTO {staging} SELECT * FROM {table}")
+    op.execute(f"ALTER TABLE {staging} ALTER COLUMN created_at DROP NOT NULL")
+    sequence = op.get_bind().execute(sa.text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": table}).scalar()
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {staging}.id")
+    op.execute(f"DROP TABLE {table}")  # drops every partition with it
+    op.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)")
+    if table == "usage_analytics":
+        op.execute("""
+            ALTER TABLE usage_analytics ADD CONSTRAINT usage_analytics_prompt_id_fkey
+            FOREIGN KEY (prompt_id) REFERENCES prompt_cache(id)
+        """)
+    for statement in INDEXES[table]:
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    op.execute(ENSURE_PARTITIONS_FUNCTION)
+    _partition_table("prompt_history")
+    _partition_table("usage_analytics")
+
+
+def downgrade() -> None:
+    _unpartition_table("usage_analytics")
+    _unpartition_table("prompt_history")
+    op.execute("DROP FUNCTION IF EXISTS promptboost_ensure_monthly_partitions(text, date, date)")
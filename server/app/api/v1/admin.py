@@ -0,0 +1,59 @@
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+
+from app.core.config import settings
+from app.database import instrumentation
+from app.services import ml_inference_service
+
+router = APIRouter()
+
+
+def require_admin(x_admin_token: str | None = Header(None)):
+    """Gate admin endpoints on the X-Admin-Token header; they don't exist without ADMIN_TOKEN."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token or "", settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/admin/db", dependencies=[Depends(require_admin)])
+def get_db_stats(
+    limit: int = Query(20, ge=1, le=500, description="Number of statement fingerprints to return."),
+    reset: bool = Query(False, description="Clear the timings after taking this snapshot."),
+):
+    """
+    Pool state, checkout wait/hold timings, peak checked-out connections and the
+    statements with the most total time, per engine. Use peak_checked_out and the
+    wait figures to size DB_POOL_SIZE / DB_MAX_OVERFLOW.
+    """
+    snapshot = instrumentation.snapshot(limit=limit)
+    if reset:
+        instrumentation.reset()
+    return snapshot
+
+
+@router.get("/admin/model", dependencies=[Depends(require_admin)])
+def get_model_versions():
+    """The preference model version in use, the one CURRENT points at, and all published versions."""
+    return {
+        "loaded_version": ml_inference_service.loaded_model_version(),
+        "current_version": ml_inference_service.current_version(),
+        "versions": ml_inference_service.list_model_versions(),
+    }
+
+
+@router.post("/admin/model/reload", dependencies=[Depends(require_admin)])
+def reload_model(
+    version: str | None = Query(None, description="Version to activate (rollback); defaults to the one CURRENT points at."),
+):
+    """
+    Load the preference model in the background and swap it in; in-flight scoring
+    finishes on the previous model. On failure the previous model stays active.
+    """
+    try:
+        return ml_inference_service.reload_ml_models(version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -1,20 +1,18 @@
+import asyncio
 import hashlib
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.database.session import SessionLocal
+import logging
+import time
+from contextlib import suppress
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.session import get_async_db
 from app.schemas import prompt as schemas
-from app.graphs.enhance_graph import enhancement_graph
-from app.crud import prompt_cache as crud
+from app.graphs.enhance_graph import get_enhancement_graph
+from app.services import latency_tiers, recent_history
+from app.core import deadline, metrics, tracing
 
 router = APIRouter()
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
+logger = logging.getLogger(__name__)
 
 def resolve_project_id(workspace_path: str | None, project_id: str | None) -> str | None:
     """Resolve project_id: use request project_id if set, else derive from workspace_path."""
@@ -26,27 +24,96 @@ def resolve_project_id(workspace_path: str | None, project_id: str | None) -> st
     return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:32]
 
 
+# Non-standard "client closed request" status (nginx); nobody is left to read it
+CLIENT_CLOSED_REQUEST = 499
+
+
 @router.post("/enhance", response_model=schemas.PromptEnhanceResponse)
-def enhance_prompt_endpoint(
+async def enhance_prompt_endpoint(
     request: schemas.PromptEnhanceRequest,
-    db: Session = Depends(get_db)
+    http_request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    x_request_deadline: str | None = Header(
+        None, description="Seconds the client will wait for this response (default REQUEST_DEADLINE_SECONDS)."
+    ),
 ):
+    deadline_at = deadline.from_header(x_request_deadline)
+    tier = latency_tiers.resolve(request.latency_tier)
+    with tracing.start_span(
+        "POST /enhance", root=True, project_id=request.project_id, is_reroll=request.is_reroll, latency_tier=tier
+    ):
+        return await _cancel_on_disconnect(http_request, "/enhance", _run_enhancement(request, db, deadline_at))
+
+
+async def _wait_for_disconnect(http_request: Request) -> None:
+    """Return once the client goes away. The body has already been read, so the next ASGI message is the disconnect."""
+    while (await http_request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _cancel_on_disconnect(http_request: Request, endpoint: str, work):
+    """
+    Run `work` unless the client disconnects first; then cancel it. Cancellation reaches
+    the pending graph node and any in-flight provider call (the HTTP request to Groq or
+    Gemini is abandoned), so retries and fallbacks for a caller that has gone are not started.
+    """
+    work = asyncio.ensure_future(work)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(http_request))
+    try:
+        await asyncio.wait({work, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        work.cancel()
+        raise
+    finally:
+        disconnected.cancel()
+    if work.done():
+        return work.result()
+    work.cancel()
+    with suppress(asyncio.CancelledError):
+        await work  # let the nodes unwind (session rollback) before the request ends
+    metrics.CLIENT_DISCONNECTS.inc(endpoint=endpoint)
+    logger.info("Client disconnected; enhancement cancelled")
+    return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+
+async def _run_enhancement(
+    request: schemas.PromptEnhanceRequest, db: AsyncSession, deadline_at: float | None = None
+) -> schemas.PromptEnhanceResponse:
+    started_at = time.monotonic()
+    tier = latency_tiers.resolve(request.latency_tier)
+    policy = latency_tiers.policy(tier)
     project_id = resolve_project_id(request.workspace_path, request.project_id)
-    recent_prompts: list[tuple[str, str]] = []
-    if project_id:
-        recent_prompts = crud.get_recent_prompts_for_project(
-            db, project_id=project_id, user_id=request.user_id, limit=5
-        )
-    # NEW: Fetch similar chunks from Vector DB
-    from app.services.vector_db import vector_db
-    rag_context = ""
-    if project_id:
-        rag_context = vector_db.query_project_context(project_id, request.original_prompt, n_results=5)
-    
-    # Combine static context with RAG context
-    full_project_context = request.project_context or ""
-    if rag_context:
-        full_project_context += f"\n\n--- Relevant Code Snippets from Repository ---\n{rag_context}"
+    with tracing.start_span("enhance.assemble_context", project_id=project_id):
+        recent_prompts: list[tuple[str, str]] = []
+        if project_id:
+            recent_prompts = await recent_history.get_recent_prompts(
+                db, project_id=project_id, user_id=request.user_id, limit=policy.recent_prompts
+            )
+        # NEW: Fetch similar chunks from Vector DB
+        from app.services.vector_db import vector_db
+        rag_context = ""
+        # Retrieval is optional: only spend what the LLM call won't need
+        rag_budget = deadline.remaining(deadline_at) - deadline.expected_llm_seconds("groq")
+        if project_id and policy.rag_results and rag_budget <= 0:
+            deadline.shortcut("retrieval", "skipped")
+        elif project_id and policy.rag_results:
+            # Chroma and the embedding call are blocking clients; keep them off the event loop.
+            # On timeout the thread finishes in the background; the request stops waiting for it.
+            try:
+                rag_context = await asyncio.wait_for(
+                    asyncio.to_thread(
+                        vector_db.query_project_context, project_id, request.original_prompt, n_results=policy.rag_results
+                    ),
+                    timeout=None if deadline_at is None else rag_budget,
+                )
+            except asyncio.TimeoutError:
+                deadline.shortcut("retrieval", "timed_out")
+                logger.warning("Project context retrieval cut short by the request deadline")
+
+        # Combine static context with RAG context
+        full_project_context = request.project_context or ""
+        if rag_context:
+            full_project_context += f"\n\n--- Relevant Code Snippets from Repository ---\n{rag_context}"
     
     inputs = {
         "original_prompt": request.true_original_prompt if request.is_reroll and request.true_original_prompt else request.original_prompt,
@@ -58,23 +125,32 @@ def enhance_prompt_endpoint(
         "project_id": project_id,
         "project_context": full_project_context if full_project_context else None,
         "recent_prompts": recent_prompts,
+        "deadline_at": deadline_at,
+        "latency_tier": tier,
+        "started_at": started_at,
     }
     
     try:
-        final_state = enhancement_graph.invoke(inputs)
+        final_state = await get_enhancement_graph().ainvoke(inputs)
         enhanced = final_state.get("enhanced_prompt")
+        if final_state.get("deadline_exceeded") and not enhanced:
+            raise HTTPException(status_code=504, detail="Enhancement did not finish before the request deadline")
         
         # Ensure enhanced_prompt is never None for Pydantic validation
         if enhanced is None or not isinstance(enhanced, str):
             enhanced = "Error: Enhancement failed on the server. Please check server logs."
         
+        metrics.ENHANCE_TIER_LATENCY.observe(time.monotonic() - started_at, tier=tier)
         return schemas.PromptEnhanceResponse(
             original_prompt=request.original_prompt,
             enhanced_prompt=enhanced,
-            from_cache=final_state.get("from_cache", False)
+            from_cache=final_state.get("from_cache", False),
+            latency_tier=tier,
         )
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"/enhance failed: {e}")
+        logger.exception(f"/enhance failed: {e}")
         return schemas.PromptEnhanceResponse(
             original_prompt=request.original_prompt,
             enhanced_prompt=f"Error: Enhancement failed - {str(e)}",
@@ -1,28 +1,53 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database.session import SessionLocal
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.session import get_async_db
 from app.schemas import prompt as schemas
-from app.crud import prompt_cache as crud
+from app.crud import prompt_cache_async as crud
+from app.crud.statements import FeedbackFallback
+from app.services.write_behind import write_buffer
 
 router = APIRouter()
 
-# Dependency to get a DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/feedback", response_model=schemas.FeedbackResponse)
-def record_feedback(request: schemas.FeedbackRequest, db: Session = Depends(get_db)):
-    # --- DEBUG ---
-    print(f"\n\n\n!!!! SERVER ENDPOINT: /feedback endpoint HIT! Received session_id: {request.session_id}, action: {request.user_action.value} !!!!\n\n\n")
-    
-    updated_entry = crud.update_user_action_for_session(db=db, session_id=request.session_id, user_action=request.user_action)
+async def record_feedback(request: schemas.FeedbackRequest, db: AsyncSession = Depends(get_async_db)):
+    # The analytics row for this session may still be sitting in the write-behind buffer
+    if write_buffer.has_pending_session(request.session_id):
+        await run_in_threadpool(write_buffer.flush_if_pending, request.session_id)
+    updated_entry = await crud.update_user_action_for_session(
+        db=db, session_id=request.session_id, user_action=request.user_action, user_id=request.user_id
+    )
     if not updated_entry:
-        print(f"!!!! SERVER ENDPOINT: CRUD function reported FAILURE. Did not find session ID. !!!!")
         return schemas.FeedbackResponse(status="warning", message="Session ID not found.")
-    
-    print(f"!!!! SERVER ENDPOINT: CRUD function reported SUCCESS. !!!!")
-    return schemas.FeedbackResponse(status="success", message="Feedback recorded.")
\ No newline at end of file
+    return schemas.FeedbackResponse(status="success", message="Feedback recorded.")
+
+@router.post("/feedback/batch", response_model=schemas.FeedbackBatchResponse)
+async def record_feedback_batch(request: schemas.FeedbackBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    """Apply queued client feedback in bulk. Events are coalesced so the newest action per session wins."""
+    latest: dict = {}
+    for event in request.events:
+        current = latest.get(event.session_id)
+        # Later events win unless both are timestamped and this one is older
+        if current is None or not (event.timestamp and current.timestamp and event.timestamp < current.timestamp):
+            latest[event.session_id] = event
+    if not latest:
+        return schemas.FeedbackBatchResponse(status="success", received=0, applied=0)
+
+    if write_buffer.has_pending_session(*latest):
+        await run_in_threadpool(write_buffer.flush_if_pending, *latest)
+    # An unknown session falls back to the user's newest entry made by the time of the event
+    # (not by now: the queue may be flushed long after); events without a timestamp do not
+    fallbacks = {
+        sid: FeedbackFallback(event.user_id, event.timestamp.replace(tzinfo=None))
+        for sid, event in latest.items()
+        if event.user_id is not None and event.timestamp is not None
+    }
+    updated, unknown = await crud.bulk_update_user_actions(
+        db, {sid: event.user_action for sid, event in latest.items()}, fallbacks
+    )
+    return schemas.FeedbackBatchResponse(
+        status="success" if not unknown else "partial",
+        received=len(request.events),
+        applied=len(updated),
+        unknown_session_ids=unknown,
+    )
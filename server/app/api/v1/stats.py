@@ -0,0 +1,67 @@
+import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import prompt_cache_async as crud
+from app.crud.statements import ROLLUP_NO_ACTION
+from app.database.session import get_async_db
+from app.schemas import prompt as schemas
+from app.services.rollup_buffer import rollup_buffer
+
+router = APIRouter()
+
+
+@router.get("/stats", response_model=schemas.StatsResponse)
+async def get_stats(
+    days: int = Query(7, ge=1, le=366, description="Window ending today (UTC); ignored when start is given."),
+    start: datetime.date | None = None,
+    end: datetime.date | None = None,
+    strategy: str | None = None,
+    experiment_group: str | None = None,
+    by_day: bool = False,
+    latency_tier: str | None = Query(None, description='Only requests run in this tier ("" for rows from before tiers).'),
+    by_tier: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Acceptance counts and mean latency per enhancement_strategy / experiment_group
+    (optionally per day and/or latency tier), read from analytics_daily_rollup: cost
+    depends on the number of days and strategies in the window, not on the size of usage_analytics.
+    """
+    end = end or datetime.datetime.utcnow().date()
+    start = start or end - datetime.timedelta(days=days - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    # Rollup deltas from this process's recent requests may still be in memory
+    await run_in_threadpool(rollup_buffer.flush)
+    rows = await crud.get_rollup_stats(
+        db, start, end, strategy=strategy, experiment_group=experiment_group, by_day=by_day,
+        latency_tier=latency_tier, by_tier=by_tier,
+    )
+    buckets: dict[tuple, schemas.StatsBucket] = {}
+    # Latency sums stay on the action they were inserted under, so add them up per bucket
+    latency: dict[tuple, list[int]] = {}
+    for row in rows:
+        key = (row.day if by_day else None, row.enhancement_strategy, row.experiment_group, row.latency_tier if by_tier else None)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = schemas.StatsBucket(
+                day=key[0], enhancement_strategy=row.enhancement_strategy or None, experiment_group=row.experiment_group or None,
+                latency_tier=key[3] or None,
+            )
+            latency[key] = [0, 0]
+        field = "unrated" if row.user_action == ROLLUP_NO_ACTION else row.user_action
+        setattr(bucket, field, getattr(bucket, field) + int(row.count))
+        bucket.total += int(row.count)
+        latency[key][0] += int(row.latency_ms_total or 0)
+        latency[key][1] += int(row.latency_count or 0)
+
+    for key, bucket in buckets.items():
+        rated = bucket.accepted + bucket.rejected + bucket.modified
+        bucket.acceptance_rate = round(bucket.accepted / rated, 4) if rated else None
+        latency_ms_total, latency_count = latency[key]
+        bucket.mean_latency_ms = round(latency_ms_total / latency_count, 1) if latency_count else None
+    return schemas.StatsResponse(start=start, end=end, buckets=list(buckets.values()))
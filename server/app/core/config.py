@@ -16,11 +16,111 @@ class Settings(BaseSettings):
     It automatically reads environment variables from the .env file found at ENV_FILE_PATH.
     """
     DATABASE_URL: str
-    GROQ_API_KEY: str
-    GOOGLE_API_KEY: str
+    # Optional read replica for staleness-tolerant reads (see app/database/routing.py)
+    DATABASE_READ_URL: str | None = None
+    # Required for the live backends; the mock backends below need neither
+    GROQ_API_KEY: str | None = None
+    GOOGLE_API_KEY: str | None = None
     PROJECT_NAME: str = "PromptBoost"
     PROJECT_DESCRIPTION: str = "Prompt Enhancement Service"
 
+    # Logging: queue-backed writer; LOG_FORMAT is "json" or "text".
+    # LOG_SAMPLE_RATES keeps a fraction of low-severity records, e.g. "DEBUG=0.01,INFO=1.0".
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_RATES: str = "DEBUG=0.01"
+
+    # Tracing: "none", "otlp", "json" or a comma list (e.g. "otlp,json")
+    TRACE_EXPORTER: str = "none"
+    TRACE_SAMPLE_RATIO: float = 0.05
+    TRACE_JSON_PATH: str = str(SERVER_ROOT / "traces.jsonl")
+    OTEL_EXPORTER_OTLP_ENDPOINT: str | None = None
+
+    # Write-behind for prompt_history/usage_analytics inserts (off by default).
+    # Rows are flushed in bulk every FLUSH_INTERVAL_MS or BATCH_SIZE rows; a full queue
+    # falls back to synchronous writes.
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_FLUSH_INTERVAL_MS: int = 250
+    WRITE_BEHIND_BATCH_SIZE: int = 200
+    WRITE_BEHIND_MAX_QUEUE: int = 10000
+
+    # analytics_daily_rollup deltas from /enhance and /feedback are buffered in memory and
+    # applied every ROLLUP_FLUSH_INTERVAL_MS (by the write-behind thread when it is enabled)
+    ROLLUP_FLUSH_INTERVAL_MS: int = 1000
+
+    # /enhance budget when the client sends no X-Request-Deadline header (seconds). Nodes skip
+    # optional work (retrieval, quality retries, the LLM fallback) that would overrun it;
+    # DEADLINE_LLM_ESTIMATE_SECONDS is the assumed LLM attempt time until latencies are observed.
+    REQUEST_DEADLINE_SECONDS: float = 55.0
+    DEADLINE_LLM_ESTIMATE_SECONDS: float = 8.0
+
+    # /feedback for an unknown session_id falls back to the same user's latest row in this window
+    FEEDBACK_FALLBACK_WINDOW_MINUTES: int = 30
+
+    # In-process cache of recent prompts per (project, user); 0 disables it
+    RECENT_HISTORY_CACHE_SIZE: int = 10000
+    RECENT_HISTORY_TTL_SECONDS: float = 300.0
+
+    # DB instrumentation: statements slower than DB_SLOW_QUERY_MS are logged; the admin
+    # endpoint keeps timings for the DB_STATEMENT_STATS_SIZE most recent fingerprints.
+    DB_SLOW_QUERY_MS: int = 500
+    DB_STATEMENT_STATS_SIZE: int = 500
+    # Required in the X-Admin-Token header for /api/v1/admin/*; unset disables those endpoints
+    ADMIN_TOKEN: str | None = None
+
+    # Seconds between checks of ml_models/CURRENT for a newly published preference model; 0 disables
+    ML_MODEL_WATCH_SECONDS: float = 30.0
+    # Preference model scorer: "compiled" (NumPy arrays, no scikit-learn in the worker),
+    # "joblib" (the pickled estimators) or "auto" (compiled when the version has one)
+    ML_SCORER_BACKEND: str = "auto"
+
+    # Persona registry for prompt classification (app/services/prompt_classifier.py);
+    # unset uses app/services/personas.json
+    PERSONA_REGISTRY_PATH: str | None = None
+
+    # Latency tiers for /enhance (app/services/latency_tiers.py): "fast", "balanced" or "quality".
+    # Requests without a latency_tier use DEFAULT_LATENCY_TIER.
+    DEFAULT_LATENCY_TIER: str = "balanced"
+    FAST_TIER_MODEL: str = "llama-3.1-8b-instant"
+    FAST_TIER_MAX_TOKENS: int = 400
+    QUALITY_TIER_MODEL: str = "llama-3.3-70b-versatile"
+    QUALITY_TIER_BEST_OF: int = 3
+    QUALITY_TIER_RAG_RESULTS: int = 10
+
+    # Provider backends: "live" (Groq/Gemini) or "mock" (app/services/mock_backends.py: offline,
+    # deterministic output, for load tests). Mock calls take MOCK_*_LATENCY_MS drawn from
+    # MOCK_LATENCY_DISTRIBUTION (lognormal/exponential/uniform/constant) and fail with a 429 or
+    # a 500 at MOCK_RATE_LIMIT_RATE / MOCK_ERROR_RATE (fractions of calls).
+    LLM_BACKEND: str = "live"
+    EMBEDDING_BACKEND: str = "live"
+    MOCK_LLM_LATENCY_MS: float = 800.0
+    MOCK_EMBEDDING_LATENCY_MS: float = 150.0
+    MOCK_LATENCY_DISTRIBUTION: str = "lognormal"
+    MOCK_LATENCY_SIGMA: float = 0.5
+    MOCK_RATE_LIMIT_RATE: float = 0.0
+    MOCK_ERROR_RATE: float = 0.0
+    MOCK_EMBEDDING_DIMENSIONS: int = 256
+    MOCK_SEED: int = 0
+    # Where Chroma keeps the project vectors; unset uses app/chroma_data
+    CHROMA_PERSIST_DIRECTORY: str | None = None
+
+    # Startup warm-up (app/services/warmup.py): time limit for each network probe (provider
+    # connections, a one-line embedding, the Chroma collection). /ready turns 200 once it's done.
+    WARMUP_PROBE_TIMEOUT_SECONDS: float = 10.0
+
+    # prompt_history/usage_analytics maintenance: Postgres keeps PARTITION_PREMAKE_MONTHS
+    # monthly partitions ahead; rows/partitions older than DATA_RETENTION_MONTHS (0 keeps
+    # everything) are archived (Postgres schema / SQLite file) or dropped per DATA_RETENTION_MODE.
+    # DATA_MAINTENANCE_INTERVAL_HOURS=0 disables the in-process job (use scripts/manage_data_retention.py).
+    DATA_MAINTENANCE_INTERVAL_HOURS: float = 24.0
+    PARTITION_PREMAKE_MONTHS: int = 3
+    DATA_RETENTION_MONTHS: int = 0
+    DATA_RETENTION_MODE: str = "archive"
+    DATA_ARCHIVE_SCHEMA: str = "archive"
+    DATA_ARCHIVE_SQLITE_PATH: str = str(SERVER_ROOT / "archive.db")
+    DATA_PRUNE_BATCH_SIZE: int = 5000
+
     model_config = SettingsConfigDict(
         env_file=ENV_FILE_PATH,
         extra='ignore'  # Ignore extra fields from .env file (like POSTGRES_USER, etc.)
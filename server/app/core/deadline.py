@@ -0,0 +1,70 @@
+"""
+Per-request deadlines for /enhance.
+
+The client sends its remaining budget in seconds as X-Request-Deadline (relative, so
+client and server clocks don't have to agree); without it REQUEST_DEADLINE_SECONDS
+applies. The endpoint turns that into an absolute time.monotonic() deadline and puts it
+in GraphState["deadline_at"]. Nodes ask `remaining()` / `can_afford()` before starting
+work and take a cheaper path (skip retrieval, retry, fallback) or stop when the work
+would not finish in time.
+
+Estimates for an LLM attempt come from `expected_llm_seconds`: an exponentially
+weighted average of observed latencies per provider, seeded with
+DEADLINE_LLM_ESTIMATE_SECONDS.
+"""
+import math
+import threading
+import time
+
+from app.core import metrics
+from app.core.config import settings
+
+HEADER = "X-Request-Deadline"
+
+_EWMA_WEIGHT = 0.2
+_llm_latency: dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def from_header(value: str | None) -> float:
+    """Absolute monotonic deadline for a request, from the header value or the server default."""
+    budget = settings.REQUEST_DEADLINE_SECONDS
+    if value:
+        try:
+            budget = float(value)
+        except ValueError:
+            pass
+    if not math.isfinite(budget) or budget <= 0:
+        budget = settings.REQUEST_DEADLINE_SECONDS
+    return time.monotonic() + budget
+
+
+def remaining(deadline: float | None) -> float:
+    """Seconds left before `deadline` (infinite when there is none); negative once it has passed."""
+    if deadline is None:
+        return math.inf
+    return deadline - time.monotonic()
+
+
+def timeout(deadline: float | None) -> float | None:
+    """`remaining()` as an asyncio timeout: None without a deadline, never negative."""
+    return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+
+def can_afford(deadline: float | None, seconds: float) -> bool:
+    return remaining(deadline) >= seconds
+
+
+def record_llm_latency(provider: str, seconds: float) -> None:
+    with _lock:
+        previous = _llm_latency.get(provider)
+        _llm_latency[provider] = seconds if previous is None else previous + _EWMA_WEIGHT * (seconds - previous)
+
+
+def expected_llm_seconds(provider: str) -> float:
+    return _llm_latency.get(provider, settings.DEADLINE_LLM_ESTIMATE_SECONDS)
+
+
+def shortcut(node: str, action: str) -> None:
+    """Count a place where the deadline changed what a node did (skipped, stopped, ...)."""
+    metrics.DEADLINE_SHORTCUTS.inc(node=node, action=action)
@@ -0,0 +1,391 @@
+"""
+In-process Prometheus-compatible metrics.
+
+A deliberately small registry (counters, gauges, histograms) so the server can
+expose `/metrics` without pulling in a client library or talking to an external
+service. Updates take a per-metric lock and touch a couple of floats, which keeps
+the overhead on the request path negligible.
+"""
+import asyncio
+import bisect
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Iterable
+
+# Latency buckets (seconds) covering sub-millisecond DB calls up to slow LLM retries.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: dict | None = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.extend(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.type_name}\n"
+        return header + "".join(line + "\n" for line in self._samples())
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be computed at scrape time via `set_function`."""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._function: Callable[[], dict[tuple[str, ...], float]] | None = None
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], dict[tuple[str, ...], float]]) -> None:
+        """Compute the gauge lazily on scrape; `fn` returns {label_values_tuple: value}."""
+        self._function = fn
+
+    def _samples(self) -> list[str]:
+        if self._function is not None:
+            try:
+                items = list(self._function().items())
+            except Exception:
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram, rendered in the Prometheus text format."""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = series
+            series[idx] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, {'le': _format_value(bound)})} {_format_value(cumulative)}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(cumulative)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(m.render() for m in metrics)
+
+
+registry = Registry()
+
+# --- Metric catalogue ---
+GRAPH_NODE_LATENCY = registry.histogram(
+    "promptboost_graph_node_duration_seconds",
+    "Time spent inside each enhancement graph node.",
+    ["node"],
+)
+GRAPH_NODES_CANCELLED = registry.counter(
+    "promptboost_graph_nodes_cancelled_total",
+    "Enhancement graph nodes cancelled mid-run (client disconnect or shutdown).",
+    ["node"],
+)
+ENHANCE_TIER_LATENCY = registry.histogram(
+    "promptboost_enhance_tier_duration_seconds",
+    "End-to-end /enhance time (context assembly and graph) per latency tier.",
+    ["tier"],
+)
+LLM_REQUEST_LATENCY = registry.histogram(
+    "promptboost_llm_request_duration_seconds",
+    "Latency of LLM provider calls.",
+    ["provider", "outcome"],
+)
+LLM_ERRORS = registry.counter(
+    "promptboost_llm_errors_total",
+    "LLM provider calls that raised an error.",
+    ["provider"],
+)
+LLM_CANCELLED = registry.counter(
+    "promptboost_llm_cancelled_total",
+    "LLM provider calls abandoned in flight because the request was cancelled.",
+    ["provider"],
+)
+CACHE_LOOKUPS = registry.counter(
+    "promptboost_cache_lookups_total",
+    "Prompt cache lookups by result (hit, miss, bypass, disabled).",
+    ["result"],
+)
+CACHE_HIT_RATIO = registry.gauge(
+    "promptboost_cache_hit_ratio",
+    "Share of prompt cache lookups that were hits since process start.",
+)
+CACHE_WRITES = registry.counter(
+    "promptboost_cache_writes_total",
+    "Prompt cache upserts after an enhancement (inserted = new prompt, updated = existing row refreshed).",
+    ["result"],
+)
+VECTOR_QUERY_LATENCY = registry.histogram(
+    "promptboost_vector_query_duration_seconds",
+    "Latency of Chroma project-context queries (including the query embedding).",
+)
+EMBEDDING_LATENCY = registry.histogram(
+    "promptboost_embedding_duration_seconds",
+    "Latency of Gemini embedding calls per batch.",
+    ["outcome"],
+)
+QUALITY_DECISIONS = registry.counter(
+    "promptboost_quality_decisions_total",
+    "Decisions taken after the quality filter (retry, save, max_retries, deadline).",
+    ["decision"],
+)
+QUALITY_RETRIES = registry.counter(
+    "promptboost_quality_retries_total",
+    "Enhancements retried because the quality score was below threshold.",
+)
+ML_MODEL_RELOADS = registry.counter(
+    "promptboost_ml_model_reloads_total",
+    "Preference model hot reloads by result (ok, error).",
+    ["result"],
+)
+ML_MODEL_INFO = registry.gauge(
+    "promptboost_ml_model_info",
+    "Always 1, labelled with the preference model version currently used for scoring.",
+    ["version"],
+)
+LOG_RECORDS_DROPPED = registry.counter(
+    "promptboost_log_records_dropped_total",
+    "Log records dropped because the logging queue was full.",
+)
+DB_POOL = registry.gauge(
+    "promptboost_db_pool_connections",
+    "Database pool state (size, checked_out, checked_in, overflow) per engine (sync, async).",
+    ["engine", "state"],
+)
+DB_POOL_WAIT = registry.histogram(
+    "promptboost_db_pool_wait_seconds",
+    "Time to obtain a connection from the pool (queueing plus connect), per engine.",
+    ["engine"],
+)
+DB_POOL_HOLD = registry.histogram(
+    "promptboost_db_pool_hold_seconds",
+    "Time a connection stays checked out of the pool, per engine.",
+    ["engine"],
+)
+DB_STATEMENT_DURATION = registry.histogram(
+    "promptboost_db_statement_seconds",
+    "SQL statement execution time by engine and operation (SELECT, INSERT, ...).",
+    ["engine", "operation"],
+)
+DB_SLOW_STATEMENTS = registry.counter(
+    "promptboost_db_slow_statements_total",
+    "Statements slower than DB_SLOW_QUERY_MS.",
+    ["engine"],
+)
+DB_READ_ROUTING = registry.counter(
+    "promptboost_db_read_routing_total",
+    "SELECTs routed to the read replica or kept on the primary (only when DATABASE_READ_URL is set).",
+    ["target"],
+)
+RECENT_HISTORY_LOOKUPS = registry.counter(
+    "promptboost_recent_history_lookups_total",
+    "Recent-prompt lookups for project continuity (hit = served from memory).",
+    ["result"],
+)
+WRITE_BEHIND_QUEUE_DEPTH = registry.gauge(
+    "promptboost_write_behind_queue_depth",
+    "Rows waiting in the write-behind buffer.",
+)
+WRITE_BEHIND_FLUSHED_ROWS = registry.counter(
+    "promptboost_write_behind_flushed_rows_total",
+    "Rows written by write-behind flushes.",
+)
+WRITE_BEHIND_FAILED_ROWS = registry.counter(
+    "promptboost_write_behind_failed_rows_total",
+    "Rows lost because a write-behind flush failed.",
+)
+WRITE_BEHIND_OVERFLOWS = registry.counter(
+    "promptboost_write_behind_overflows_total",
+    "Enhancements written synchronously because the write-behind queue was full.",
+)
+WRITE_BEHIND_FLUSH_LATENCY = registry.histogram(
+    "promptboost_write_behind_flush_seconds",
+    "Duration of one write-behind batch flush.",
+)
+ROLLUP_FLUSHES = registry.counter(
+    "promptboost_rollup_flushes_total",
+    "Flushes of buffered analytics_daily_rollup deltas (error = kept for the next flush).",
+    ["result"],
+)
+DATA_MAINTENANCE_RUNS = registry.counter(
+    "promptboost_data_maintenance_runs_total",
+    "Partition/retention maintenance runs by result (ok, error).",
+    ["result"],
+)
+DATA_RETIRED = registry.counter(
+    "promptboost_data_retired_total",
+    "Partitions (postgres) or rows (sqlite) archived or dropped by the retention policy.",
+    ["table", "mode"],
+)
+DEADLINE_SHORTCUTS = registry.counter(
+    "promptboost_deadline_shortcuts_total",
+    "Work skipped or stopped because the request deadline would be missed, by node and action.",
+    ["node", "action"],
+)
+CLIENT_DISCONNECTS = registry.counter(
+    "promptboost_client_disconnects_total",
+    "Requests whose work was cancelled because the client disconnected first.",
+    ["endpoint"],
+)
+STARTUP_WARMUP_SECONDS = registry.gauge(
+    "promptboost_startup_warmup_seconds",
+    "Time each startup warm-up step took (ML models, LLM clients, graph, vector DB), by step and result.",
+    ["step", "result"],
+)
+
+
+def _cache_hit_ratio() -> dict[tuple[str, ...], float]:
+    hits = CACHE_LOOKUPS.get(result="hit")
+    misses = CACHE_LOOKUPS.get(result="miss")
+    total = hits + misses
+    return {(): hits / total if total else 0.0}
+
+
+CACHE_HIT_RATIO.set_function(_cache_hit_ratio)
+
+
+def instrument_node(node_name: str):
+    """Decorator recording the latency of a LangGraph node."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with GRAPH_NODE_LATENCY.time(node=node_name):
+                    try:
+                        return await fn(*args, **kwargs)
+                    except asyncio.CancelledError:
+                        GRAPH_NODES_CANCELLED.inc(node=node_name)
+                        raise
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with GRAPH_NODE_LATENCY.time(node=node_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,196 @@
+"""
+Request tracing built on OpenTelemetry.
+
+One `/enhance` request produces a span tree: endpoint -> context assembly ->
+graph nodes -> LLM attempts / SQL statements / Chroma query + embedding.
+
+Configured through settings:
+- TRACE_EXPORTER: "none" (default), "otlp", "json", or a comma list such as "otlp,json".
+- TRACE_SAMPLE_RATIO: fraction of root requests that are recorded (parent-based).
+- TRACE_JSON_PATH: file the offline JSON-lines exporter appends to.
+- OTEL_EXPORTER_OTLP_ENDPOINT: collector endpoint for the OTLP exporter.
+
+If OpenTelemetry isn't installed, or the exporter is "none", every helper here is
+a cheap no-op. Child spans are only created when the parent span is recording, so
+unsampled requests don't pay for per-statement spans.
+"""
+import inspect
+import logging
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from app.core.config import settings
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    from opentelemetry.trace import Status, StatusCode
+except ImportError:  # tracing is optional
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+_configured = False
+
+
+if trace is not None:
+    class JsonFileSpanExporter(SpanExporter):
+        """Appends finished spans as JSON lines to a local file (offline use)."""
+
+        def __init__(self, path: str):
+            self._path = path
+            self._lock = threading.Lock()
+
+        def export(self, spans) -> "SpanExportResult":
+            try:
+                lines = [span.to_json(indent=None) for span in spans]
+                with self._lock, open(self._path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                return SpanExportResult.SUCCESS
+            except Exception as e:
+                logger.error(f"JSON span export failed: {e}")
+                return SpanExportResult.FAILURE
+
+        def shutdown(self) -> None:
+            pass
+
+
+def _build_otlp_exporter():
+    try:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    if settings.OTEL_EXPORTER_OTLP_ENDPOINT:
+        return OTLPSpanExporter(endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT)
+    return OTLPSpanExporter()
+
+
+def setup_tracing() -> None:
+    """Install the tracer provider and exporters. Safe to call more than once."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    exporters = {e.strip().lower() for e in settings.TRACE_EXPORTER.split(",") if e.strip()}
+    exporters.discard("none")
+    if not exporters:
+        return
+    if trace is None:
+        logger.warning("TRACE_EXPORTER is set but opentelemetry-sdk is not installed. Tracing disabled.")
+        return
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.PROJECT_NAME.lower()}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACE_SAMPLE_RATIO)),
+    )
+    if "otlp" in exporters:
+        try:
+            provider.add_span_processor(BatchSpanProcessor(_build_otlp_exporter()))
+        except ImportError:
+            logger.warning("OTLP exporter requested but opentelemetry-exporter-otlp is not installed.")
+    if "json" in exporters:
+        provider.add_span_processor(BatchSpanProcessor(JsonFileSpanExporter(settings.TRACE_JSON_PATH)))
+    trace.set_tracer_provider(provider)
+    logger.info(f"Tracing enabled (exporters={sorted(exporters)}, sample_ratio={settings.TRACE_SAMPLE_RATIO}).")
+
+
+def shutdown_tracing() -> None:
+    """Flush pending spans on shutdown."""
+    if trace is None:
+        return
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "shutdown"):
+        provider.shutdown()
+
+
+def _tracer():
+    return trace.get_tracer("promptboost")
+
+
+def _is_recording() -> bool:
+    return trace is not None and trace.get_current_span().is_recording()
+
+
+@contextmanager
+def start_span(name: str, root: bool = False, **attributes):
+    """
+    Open a span as a child of the current one. Child spans are skipped when the
+    parent isn't sampled; pass root=True for request entry points.
+    """
+    if trace is None or (not root and not _is_recording()):
+        yield None
+        return
+    with _tracer().start_as_current_span(name) as span:
+        for key, value in attributes.items():
+            if value is not None:
+                span.set_attribute(key, value)
+        yield span
+
+
+def set_attributes(span, **attributes) -> None:
+    if span is None:
+        return
+    for key, value in attributes.items():
+        if value is not None:
+            span.set_attribute(key, value)
+
+
+def traced(name: str):
+    """Decorator wrapping a function (e.g. a graph node) in a span."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with start_span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_engine(engine) -> None:
+    """Emit one span per SQL statement executed through `engine` (sync or async)."""
+    if trace is None:
+        return
+    from sqlalchemy import event
+
+    engine = getattr(engine, "sync_engine", engine)  # AsyncEngine events are registered on its sync core
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not _is_recording():
+            return
+        cm = _tracer().start_as_current_span("db.statement")
+        span = cm.__enter__()
+        span.set_attribute("db.system", engine.dialect.name)
+        span.set_attribute("db.statement", statement[:2000])
+        span.set_attribute("db.executemany", bool(executemany))
+        context._trace_cm = cm
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        cm = getattr(context, "_trace_cm", None)
+        if cm is not None:
+            context._trace_cm = None
+            cm.__exit__(None, None, None)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        context = exception_context.execution_context
+        cm = getattr(context, "_trace_cm", None) if context is not None else None
+        if cm is not None:
+            context._trace_cm = None
+            span = trace.get_current_span()
+            span.set_status(Status(StatusCode.ERROR, str(exception_context.original_exception)[:200]))
+            cm.__exit__(None, None, None)
+
@@ -1,8 +1,37 @@
+import datetime
+import logging
 import uuid # <-- THIS IS THE FIX. ADD THIS LINE.
+from collections import Counter
+from sqlalchemy import String, cast, delete, func, insert, select
 from sqlalchemy.orm import Session, joinedload
+from app.crud.statements import (
+    RECENT_PROMPT_PREVIEW_CHARS,
+    ROLLUP_NO_ACTION,
+    FeedbackFallback,
+    FeedbackUpdate,
+    RollupKey,
+    fallback_criteria,
+    feedback_update,
+    group_by_action,
+    latest_matching,
+    latest_per_session,
+    prompt_cache_upsert,
+    prompt_lookup,
+    recent_prompts_query,
+    rollup_inserted,
+    rollup_latency,
+    rollup_moved,
+    rollup_upsert,
+    save_results_statement,
+    update_from_statement,
+    update_ids_statement,
+)
 from app.models import prompt as models
 from app.schemas import prompt as schemas
 
+logger = logging.getLogger(__name__)
+
+
 # ... (the rest of the file is correct and does not need to be changed) ...
 
 def get_prompt_by_original_text(
@@ -11,13 +40,9 @@ def get_prompt_by_original_text(
     """
     Retrieve a cached prompt by original text and optional project_id.
     When project_id is set, cache is project-scoped; otherwise global (project_id IS NULL).
+    May be served by the read replica: a stale miss only costs an LLM call.
     """
-    q = db.query(models.PromptCache).filter(models.PromptCache.original_prompt == original_prompt)
-    if project_id is not None:
-        q = q.filter(models.PromptCache.project_id == project_id)
-    else:
-        q = q.filter(models.PromptCache.project_id.is_(None))
-    return q.first()
+    return db.scalars(prompt_lookup(original_prompt, project_id).execution_options(replica_ok=True)).first()
 
 
 def create_cached_prompt(db: Session, prompt: schemas.PromptCacheCreate) -> models.PromptCache:
@@ -34,6 +59,98 @@ def create_cached_prompt(db: Session, prompt: schemas.PromptCacheCreate) -> mode
     db.refresh(db_prompt)
     return db_prompt # <-- Return the new object with its ID
 
+
+def save_enhancement_results(
+    db: Session,
+    prompt: schemas.PromptCacheCreate,
+    analytics: schemas.UsageAnalyticsBase,
+    history: schemas.PromptHistoryCreate | None = None,
+) -> tuple[int, bool]:
+    """
+    Persist an enhancement in a single transaction: upsert the cache row, append the
+    project history entry (if any) and insert the analytics row, with one commit.
+
+    On Postgres all three writes go out as one statement (data-modifying CTEs around
+    INSERT ... ON CONFLICT ... RETURNING id). On SQLite they are three statements in
+    one transaction. The analytics_daily_rollup bucket is incremented in the same
+    transaction. Returns (prompt_cache id, whether the cache row was newly created).
+    """
+    now = datetime.datetime.utcnow()
+    dialect_name = db.get_bind().dialect.name
+    upsert = prompt_cache_upsert(dialect_name, prompt, now)
+    analytics_values = {**analytics.model_dump(), "created_at": now}
+    history_values = {**history.model_dump(), "created_at": now} if history is not None else None
+
+    try:
+        if dialect_name == "postgresql":
+            stmt = save_results_statement(upsert, analytics_values, history_values)
+            prompt_id, prompt_created_at = db.execute(stmt).one()
+        else:
+            prompt_id, prompt_created_at = _upsert_prompt_row(db, upsert, prompt, now)
+            if history_values is not None:
+                db.execute(insert(models.PromptHistory).values(**history_values))
+            db.execute(insert(models.UsageAnalytics).values(prompt_id=prompt_id, **analytics_values))
+        _apply_rollup(db, rollup_inserted([analytics_values]), rollup_latency([analytics_values]))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    # A conflicting (pre-existing) cache row keeps its original created_at.
+    return prompt_id, prompt_created_at == now
+
+
+def upsert_cached_prompt(db: Session, prompt: schemas.PromptCacheCreate) -> tuple[int, bool]:
+    """
+    Upsert only the prompt_cache row and commit. Used when history/analytics writes
+    are deferred to the write-behind buffer. Returns (id, whether the row was created).
+    """
+    now = datetime.datetime.utcnow()
+    upsert = prompt_cache_upsert(db.get_bind().dialect.name, prompt, now)
+    try:
+        prompt_id, prompt_created_at = _upsert_prompt_row(db, upsert, prompt, now)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return prompt_id, prompt_created_at == now
+
+
+def bulk_insert_enhancement_rows(db: Session, history_rows: list[dict], analytics_rows: list[dict]) -> None:
+    """Insert batches of prompt_history / usage_analytics rows (executemany) in one transaction."""
+    try:
+        if history_rows:
+            db.execute(insert(models.PromptHistory), history_rows)
+        if analytics_rows:
+            db.execute(insert(models.UsageAnalytics), analytics_rows)
+            _apply_rollup(db, rollup_inserted(analytics_rows), rollup_latency(analytics_rows))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _upsert_prompt_row(db: Session, upsert, prompt: schemas.PromptCacheCreate, now: datetime.datetime):
+    if upsert is not None:
+        return db.execute(upsert.returning(models.PromptCache.id, models.PromptCache.created_at)).one()
+    return _select_or_insert_prompt(db, prompt, now)
+
+
+def _select_or_insert_prompt(
+    db: Session, prompt: schemas.PromptCacheCreate, created_at: datetime.datetime
+) -> tuple[int, datetime.datetime]:
+    """Portable fallback for dialects without ON CONFLICT (runs inside the caller's transaction)."""
+    # Read on the primary: a stale replica answer here would insert a duplicate
+    existing = db.scalars(prompt_lookup(prompt.original_prompt, prompt.project_id)).first()
+    if existing:
+        existing.enhanced_prompt = prompt.enhanced_prompt
+        db.flush()
+        return existing.id, existing.created_at
+    row = models.PromptCache(**prompt.model_dump(), created_at=created_at)
+    db.add(row)
+    db.flush()
+    return row.id, row.created_at
+
+
 def create_prompt_history_entry(
     db: Session, data: schemas.PromptHistoryCreate
 ) -> models.PromptHistory:
@@ -54,16 +171,12 @@ def get_recent_prompts_for_project(
     """
     Return the most recent (original_prompt, enhanced_prompt) pairs for the project.
     If user_id is provided, filter by user; otherwise return for any user in the project.
-    Ordered by created_at desc.
+    Ordered by created_at desc (ix_prompt_history_project_user_created).
+
+    Bodies are truncated in SQL to RECENT_PROMPT_PREVIEW_CHARS + 1 characters, so the
+    caller can still tell a prompt was longer than the preview.
     """
-    q = (
-        db.query(models.PromptHistory.original_prompt, models.PromptHistory.enhanced_prompt)
-        .filter(models.PromptHistory.project_id == project_id)
-    )
-    if user_id is not None:
-        q = q.filter(models.PromptHistory.user_id == user_id)
-    q = q.order_by(models.PromptHistory.created_at.desc()).limit(limit)
-    rows = q.all()
+    rows = db.execute(recent_prompts_query(project_id, user_id, limit)).all()
     return [(r[0], r[1]) for r in rows]
 
 
@@ -77,54 +190,168 @@ def create_usage_analytics_entry(db: Session, analytics_data: schemas.UsageAnaly
     db.refresh(db_analytics)
     return db_analytics
 
-def update_user_action_for_session(db: Session, session_id: uuid.UUID, user_action: models.UserAction) -> models.UsageAnalytics | None:
-    """Finds a usage_analytics entry by session_id and updates its user_action."""
-    
-    print(f"\n{'='*80}")
-    print(f"!!!! SERVER CRUD: Updating feedback for session_id: {session_id} !!!!")
-    print(f"{'='*80}")
-    
-    # Try exact match first
-    db_analytics = db.query(models.UsageAnalytics).filter(
-        models.UsageAnalytics.session_id == session_id
-    ).order_by(models.UsageAnalytics.created_at.desc()).first()
-    
-    if not db_analytics:
-        # FALLBACK: Find the most recent NON-REJECTED entry (likely the one user wants to reject)
-        print(f"!!!! SERVER CRUD: No exact match for {session_id}. Using fallback: most recent non-rejected entry !!!!")
-        from sqlalchemy import or_
-        db_analytics = db.query(models.UsageAnalytics).filter(
-            or_(
-                models.UsageAnalytics.user_action != models.UserAction.rejected,
-                models.UsageAnalytics.user_action.is_(None)
+def update_user_action_for_session(
+    db: Session,
+    session_id: uuid.UUID,
+    user_action: models.UserAction,
+    user_id: uuid.UUID | None = None,
+) -> FeedbackUpdate | None:
+    """
+    Set user_action on the latest usage_analytics row for session_id with a single
+    UPDATE ... RETURNING (served by ix_usage_analytics_session_created).
+
+    If the session is unknown (e.g. the client lost its session id) and user_id is
+    given, fall back to that user's most recent non-rejected row within
+    FEEDBACK_FALLBACK_WINDOW_MINUTES. Returns the updated row (FeedbackUpdate), or None.
+    """
+    logger.info("Updating feedback for session", extra={"session_id": str(session_id), "user_action": user_action.value})
+
+    updated = _update_latest_analytics_row(db, user_action, models.UsageAnalytics.session_id == session_id)
+    if updated is None and user_id is not None:
+        logger.warning("No exact match for session; using the user's most recent non-rejected entry", extra={"session_id": str(session_id)})
+        updated = _update_latest_analytics_row(db, user_action, *fallback_criteria(user_id))
+        if updated is not None:
+            logger.info("Fallback matched analytics entry", extra={"analytics_id": updated.id, "matched_session_id": str(updated.session_id)})
+
+    if updated is None:
+        db.rollback()
+        logger.warning("No analytics entry found for feedback", extra={"session_id": str(session_id)})
+        return None
+
+    _apply_rollup(db, rollup_moved([updated], user_action))
+    db.commit()
+    logger.info(
+        "Feedback committed",
+        extra={
+            "analytics_id": updated.id,
+            "old_action": updated.old_action.value if updated.old_action else None,
+            "new_action": user_action.value,
+        },
+    )
+    return updated
+
+
+def bulk_update_user_actions(
+    db: Session,
+    actions: dict[uuid.UUID, models.UserAction],
+    fallbacks: dict[uuid.UUID, FeedbackFallback] | None = None,
+) -> tuple[list[FeedbackUpdate], list[uuid.UUID]]:
+    """
+    Apply feedback for many sessions: one UPDATE per distinct action, each touching the
+    latest usage_analytics row of every session in its group. A session that matched no
+    row and has an entry in fallbacks then takes the user's newest not-yet-updated row
+    created by its as_of (fallback_criteria), one row per session. Commits once and
+    returns the updated rows (FeedbackUpdate) and the session ids nothing matched.
+    """
+    updated = []
+    deltas = Counter()
+    try:
+        for user_action, session_ids in group_by_action(actions).items():
+            latest = latest_per_session(session_ids)
+            if db.get_bind().dialect.name != "postgresql":
+                old_actions = {row.id: row.old_action for row in db.execute(latest).all()}
+                rows = db.execute(update_ids_statement(list(old_actions), user_action)).all()
+                group_updated = [feedback_update(row, old_actions[row.id]) for row in rows]
+            else:
+                group_updated = [FeedbackUpdate(*row) for row in db.execute(update_from_statement(latest.subquery(), user_action))]
+            updated.extend(group_updated)
+            deltas.update(rollup_moved(group_updated, user_action))
+        matched = {row.session_id for row in updated}
+        unmatched = [session_id for session_id in actions if session_id not in matched]
+        fallbacks = fallbacks or {}
+        unknown = [session_id for session_id in unmatched if session_id not in fallbacks]
+        # Oldest event first, each claiming a row no other session in this batch has
+        for session_id in sorted((sid for sid in unmatched if sid in fallbacks), key=lambda sid: fallbacks[sid].as_of):
+            fallback = fallbacks[session_id]
+            criteria = fallback_criteria(fallback.user_id, fallback.as_of, [row.id for row in updated])
+            row = _update_latest_analytics_row(db, actions[session_id], *criteria)
+            if row is None:
+                unknown.append(session_id)
+                continue
+            updated.append(row)
+            deltas.update(rollup_moved([row], actions[session_id]))
+        _apply_rollup(db, deltas)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    logger.info("Batch feedback committed", extra={"sessions": len(actions), "updated": len(updated), "unknown": len(unknown)})
+    return updated, unknown
+
+
+def _update_latest_analytics_row(db: Session, user_action: models.UserAction, *criteria):
+    """UPDATE the newest usage_analytics row matching criteria; returns (id, session_id, old_action) or None."""
+    latest = latest_matching(*criteria)
+    if db.get_bind().dialect.name != "postgresql":
+        # SQLite's RETURNING cannot reference the FROM subquery: locate the row, then
+        # update it by primary key in the same transaction.
+        target = db.execute(latest).one_or_none()
+        if target is None:
+            return None
+        row = db.execute(update_ids_statement([target.id], user_action)).one()
+        return feedback_update(row, target.old_action)
+    row = db.execute(update_from_statement(latest.with_for_update().subquery(), user_action)).one_or_none()
+    return FeedbackUpdate(*row) if row is not None else None
+
+
+# --- analytics_daily_rollup ---
+
+
+def apply_rollup_deltas(db: Session, deltas: Counter, latency: dict[RollupKey, tuple[int, int]] | None = None) -> None:
+    """Apply rollup deltas buffered by services.rollup_buffer in their own transaction."""
+    try:
+        _apply_rollup(db, deltas, latency)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _apply_rollup(db: Session, deltas: Counter, latency: dict[RollupKey, tuple[int, int]] | None = None) -> None:
+    stmt = rollup_upsert(db.get_bind().dialect.name, deltas, latency)
+    if stmt is not None:
+        db.execute(stmt)
+
+
+def rebuild_analytics_rollup(db: Session, since: datetime.date | None = None) -> int:
+    """
+    Recompute analytics_daily_rollup from usage_analytics for days >= since (all days
+    when None), e.g. after a backfill or for dialects the write path does not maintain.
+    A full rebuild also loses the days whose raw rows the retention policy already
+    removed; pass `since` to keep them. Returns the number of rollup rows written.
+    """
+    rollup = models.AnalyticsDailyRollup
+    analytics = models.UsageAnalytics
+    keys = (
+        func.date(analytics.created_at),
+        func.coalesce(analytics.enhancement_strategy, ""),
+        func.coalesce(analytics.experiment_group, ""),
+        func.coalesce(analytics.latency_tier, ""),
+        func.coalesce(cast(analytics.user_action, String), ROLLUP_NO_ACTION),
+    )
+    grouped = select(
+        *keys, func.count(), func.coalesce(func.sum(analytics.latency_ms), 0), func.count(analytics.latency_ms)
+    ).group_by(*keys)
+    clear = delete(rollup)
+    if since is not None:
+        grouped = grouped.where(analytics.created_at >= datetime.datetime.combine(since, datetime.time.min))
+        clear = clear.where(rollup.day >= since)
+    try:
+        db.execute(clear)
+        result = db.execute(
+            insert(rollup).from_select(
+                [
+                    "day", "enhancement_strategy", "experiment_group", "latency_tier", "user_action",
+                    "count", "latency_ms_total", "latency_count",
+                ],
+                grouped,
             )
-        ).order_by(models.UsageAnalytics.created_at.desc()).first()
-        
-        if db_analytics:
-            print(f"!!!! SERVER CRUD: FALLBACK SUCCESS - Found entry ID: {db_analytics.id}, session: {db_analytics.session_id} !!!!")
-            print(f"!!!! SERVER CRUD: NOTE: Using fallback because session_id didn't match - this is okay for now !!!!")
-    
-    if db_analytics:
-        old_action = db_analytics.user_action.value if db_analytics.user_action else None
-        print(f"!!!! SERVER CRUD: Updating entry ID: {db_analytics.id} !!!!")
-        print(f"!!!! SERVER CRUD: Old action: {old_action} -> New action: {user_action.value} !!!!")
-        
-        db_analytics.user_action = user_action
+        )
         db.commit()
-        db.refresh(db_analytics)
-        
-        # Verify the update
-        verified = db.query(models.UsageAnalytics).filter(models.UsageAnalytics.id == db_analytics.id).first()
-        verified_action = verified.user_action.value if verified.user_action else None
-        print(f"!!!! SERVER CRUD: ✅ COMMITTED! Verified action is now: {verified_action} !!!!")
-        print(f"{'='*80}\n")
-        return db_analytics
-    
-    # Last resort: log all sessions for debugging
-    all_sessions = db.query(models.UsageAnalytics).order_by(models.UsageAnalytics.created_at.desc()).limit(5).all()
-    print(f"!!!! SERVER CRUD: ❌ FAILED - No entry found. Recent sessions:")
-    for s in all_sessions:
-        action_str = s.user_action.value if s.user_action else "None"
-        print(f"   ID: {s.id}, Session: {s.session_id}, Action: {action_str}, Created: {s.created_at}")
-    print(f"{'='*80}\n")
-    return None
\ No newline at end of file
+    except Exception:
+        db.rollback()
+        raise
+    logger.info("Analytics rollup rebuilt", extra={"since": str(since), "rows": result.rowcount})
+    return result.rowcount
+
+
@@ -0,0 +1,239 @@
+"""
+AsyncSession versions of the CRUD operations on the request path (/enhance, /feedback
+and the enhancement graph). Statements come from crud.statements, shared with
+crud.prompt_cache; only the execution differs, so both layers stay in lockstep. The one
+exception is analytics_daily_rollup: rather than upsert its hot rows in every request's
+transaction, this layer hands the deltas to services.rollup_buffer once it has committed.
+"""
+import datetime
+import logging
+import uuid
+from collections import Counter
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.statements import (
+    FeedbackFallback,
+    FeedbackUpdate,
+    fallback_criteria,
+    feedback_update,
+    group_by_action,
+    latest_matching,
+    latest_per_session,
+    prompt_cache_upsert,
+    prompt_lookup,
+    recent_prompts_query,
+    rollup_inserted,
+    rollup_latency,
+    rollup_moved,
+    rollup_stats_query,
+    save_results_statement,
+    update_from_statement,
+    update_ids_statement,
+)
+from app.models import prompt as models
+from app.schemas import prompt as schemas
+from app.services.rollup_buffer import rollup_buffer
+
+logger = logging.getLogger(__name__)
+
+
+def _dialect(db: AsyncSession) -> str:
+    return db.get_bind().dialect.name
+
+
+async def get_prompt_by_original_text(
+    db: AsyncSession, original_prompt: str, project_id: str | None = None
+) -> models.PromptCache | None:
+    return (await db.scalars(prompt_lookup(original_prompt, project_id).execution_options(replica_ok=True))).first()
+
+
+async def save_enhancement_results(
+    db: AsyncSession,
+    prompt: schemas.PromptCacheCreate,
+    analytics: schemas.UsageAnalyticsBase,
+    history: schemas.PromptHistoryCreate | None = None,
+) -> tuple[int, bool]:
+    """See crud.prompt_cache.save_enhancement_results."""
+    now = datetime.datetime.utcnow()
+    dialect_name = _dialect(db)
+    upsert = prompt_cache_upsert(dialect_name, prompt, now)
+    analytics_values = {**analytics.model_dump(), "created_at": now}
+    history_values = {**history.model_dump(), "created_at": now} if history is not None else None
+
+    try:
+        if dialect_name == "postgresql":
+            result = await db.execute(save_results_statement(upsert, analytics_values, history_values))
+            prompt_id, prompt_created_at = result.one()
+        else:
+            prompt_id, prompt_created_at = await _upsert_prompt_row(db, upsert, prompt, now)
+            if history_values is not None:
+                await db.execute(insert(models.PromptHistory).values(**history_values))
+            await db.execute(insert(models.UsageAnalytics).values(prompt_id=prompt_id, **analytics_values))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    rollup_buffer.add(rollup_inserted([analytics_values]), rollup_latency([analytics_values]))
+    return prompt_id, prompt_created_at == now
+
+
+async def upsert_cached_prompt(db: AsyncSession, prompt: schemas.PromptCacheCreate) -> tuple[int, bool]:
+    """See crud.prompt_cache.upsert_cached_prompt."""
+    now = datetime.datetime.utcnow()
+    upsert = prompt_cache_upsert(_dialect(db), prompt, now)
+    try:
+        prompt_id, prompt_created_at = await _upsert_prompt_row(db, upsert, prompt, now)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return prompt_id, prompt_created_at == now
+
+
+async def bulk_insert_enhancement_rows(db: AsyncSession, history_rows: list[dict], analytics_rows: list[dict]) -> None:
+    try:
+        if history_rows:
+            await db.execute(insert(models.PromptHistory), history_rows)
+        if analytics_rows:
+            await db.execute(insert(models.UsageAnalytics), analytics_rows)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    rollup_buffer.add(rollup_inserted(analytics_rows), rollup_latency(analytics_rows))
+
+
+async def _upsert_prompt_row(db: AsyncSession, upsert, prompt: schemas.PromptCacheCreate, now: datetime.datetime):
+    if upsert is not None:
+        result = await db.execute(upsert.returning(models.PromptCache.id, models.PromptCache.created_at))
+        return result.one()
+    existing = (await db.scalars(prompt_lookup(prompt.original_prompt, prompt.project_id))).first()
+    if existing:
+        existing.enhanced_prompt = prompt.enhanced_prompt
+        await db.flush()
+        return existing.id, existing.created_at
+    row = models.PromptCache(**prompt.model_dump(), created_at=now)
+    db.add(row)
+    await db.flush()
+    return row.id, row.created_at
+
+
+async def get_recent_prompts_for_project(
+    db: AsyncSession,
+    project_id: str,
+    user_id: uuid.UUID | None = None,
+    limit: int = 5,
+) -> list[tuple[str, str]]:
+    """See crud.prompt_cache.get_recent_prompts_for_project."""
+    rows = (await db.execute(recent_prompts_query(project_id, user_id, limit))).all()
+    return [(r[0], r[1]) for r in rows]
+
+
+async def update_user_action_for_session(
+    db: AsyncSession,
+    session_id: uuid.UUID,
+    user_action: models.UserAction,
+    user_id: uuid.UUID | None = None,
+) -> FeedbackUpdate | None:
+    """See crud.prompt_cache.update_user_action_for_session."""
+    logger.info("Updating feedback for session", extra={"session_id": str(session_id), "user_action": user_action.value})
+
+    updated = await _update_latest_analytics_row(db, user_action, models.UsageAnalytics.session_id == session_id)
+    if updated is None and user_id is not None:
+        logger.warning("No exact match for session; using the user's most recent non-rejected entry", extra={"session_id": str(session_id)})
+        updated = await _update_latest_analytics_row(db, user_action, *fallback_criteria(user_id))
+        if updated is not None:
+            logger.info("Fallback matched analytics entry", extra={"analytics_id": updated.id, "matched_session_id": str(updated.session_id)})
+
+    if updated is None:
+        await db.rollback()
+        logger.warning("No analytics entry found for feedback", extra={"session_id": str(session_id)})
+        return None
+
+    await db.commit()
+    rollup_buffer.add(rollup_moved([updated], user_action))
+    logger.info(
+        "Feedback committed",
+        extra={
+            "analytics_id": updated.id,
+            "old_action": updated.old_action.value if updated.old_action else None,
+            "new_action": user_action.value,
+        },
+    )
+    return updated
+
+
+async def bulk_update_user_actions(
+    db: AsyncSession,
+    actions: dict[uuid.UUID, models.UserAction],
+    fallbacks: dict[uuid.UUID, FeedbackFallback] | None = None,
+) -> tuple[list[FeedbackUpdate], list[uuid.UUID]]:
+    """See crud.prompt_cache.bulk_update_user_actions."""
+    updated = []
+    deltas = Counter()
+    try:
+        for user_action, session_ids in group_by_action(actions).items():
+            latest = latest_per_session(session_ids)
+            if _dialect(db) != "postgresql":
+                old_actions = {row.id: row.old_action for row in (await db.execute(latest)).all()}
+                rows = (await db.execute(update_ids_statement(list(old_actions), user_action))).all()
+                group_updated = [feedback_update(row, old_actions[row.id]) for row in rows]
+            else:
+                result = await db.execute(update_from_statement(latest.subquery(), user_action))
+                group_updated = [FeedbackUpdate(*row) for row in result]
+            updated.extend(group_updated)
+            deltas.update(rollup_moved(group_updated, user_action))
+        matched = {row.session_id for row in updated}
+        unmatched = [session_id for session_id in actions if session_id not in matched]
+        fallbacks = fallbacks or {}
+        unknown = [session_id for session_id in unmatched if session_id not in fallbacks]
+        # Oldest event first, each claiming a row no other session in this batch has
+        for session_id in sorted((sid for sid in unmatched if sid in fallbacks), key=lambda sid: fallbacks[sid].as_of):
+            fallback = fallbacks[session_id]
+            criteria = fallback_criteria(fallback.user_id, fallback.as_of, [row.id for row in updated])
+            row = await _update_latest_analytics_row(db, actions[session_id], *criteria)
+            if row is None:
+                unknown.append(session_id)
+                continue
+            updated.append(row)
+            deltas.update(rollup_moved([row], actions[session_id]))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    rollup_buffer.add(deltas)
+    logger.info("Batch feedback committed", extra={"sessions": len(actions), "updated": len(updated), "unknown": len(unknown)})
+    return updated, unknown
+
+
+async def _update_latest_analytics_row(db: AsyncSession, user_action: models.UserAction, *criteria):
+    latest = latest_matching(*criteria)
+    if _dialect(db) != "postgresql":
+        target = (await db.execute(latest)).one_or_none()
+        if target is None:
+            return None
+        row = (await db.execute(update_ids_statement([target.id], user_action))).one()
+        return feedback_update(row, target.old_action)
+    row = (await db.execute(update_from_statement(latest.with_for_update().subquery(), user_action))).one_or_none()
+    return FeedbackUpdate(*row) if row is not None else None
+
+
+async def get_rollup_stats(
+    db: AsyncSession,
+    start: datetime.date,
+    end: datetime.date,
+    strategy: str | None = None,
+    experiment_group: str | None = None,
+    by_day: bool = False,
+    latency_tier: str | None = None,
+    by_tier: bool = False,
+) -> list:
+    """
+    Rows of ([day,] enhancement_strategy, experiment_group[, latency_tier], user_action, count,
+    latency_ms_total, latency_count) from the rollup table.
+    """
+    return (
+        await db.execute(rollup_stats_query(start, end, strategy, experiment_group, by_day, latency_tier, by_tier))
+    ).all()
@@ -0,0 +1,308 @@
+"""
+SQL statement builders shared by crud.prompt_cache (Session) and crud.prompt_cache_async
+(AsyncSession). They only build statements and rollup deltas; executing them, and the
+transaction around it, is up to each layer, so both stay in lockstep.
+"""
+import datetime
+import uuid
+from collections import Counter
+from typing import NamedTuple
+
+from sqlalchemy import func, insert, literal, or_, select, update
+
+from app.core.config import settings
+from app.models import prompt as models
+from app.schemas import prompt as schemas
+
+
+class FeedbackUpdate(NamedTuple):
+    """A usage_analytics row whose user_action was just changed (plus its rollup key)."""
+    id: int
+    session_id: uuid.UUID
+    old_action: models.UserAction | None
+    created_at: datetime.datetime | None = None
+    enhancement_strategy: str | None = None
+    experiment_group: str | None = None
+    latency_tier: str | None = None
+
+
+def prompt_lookup(original_prompt: str, project_id: str | None):
+    stmt = select(models.PromptCache).where(models.PromptCache.original_prompt == original_prompt)
+    if project_id is not None:
+        return stmt.where(models.PromptCache.project_id == project_id)
+    return stmt.where(models.PromptCache.project_id.is_(None))
+
+
+def prompt_cache_upsert(dialect_name: str, prompt: schemas.PromptCacheCreate, created_at: datetime.datetime):
+    """
+    INSERT ... ON CONFLICT (partial unique index) DO UPDATE for prompt_cache, or None
+    if the dialect has no ON CONFLICT support.
+    """
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+
+    table = models.PromptCache
+    stmt = insert(table).values(
+        original_prompt=prompt.original_prompt,
+        enhanced_prompt=prompt.enhanced_prompt,
+        project_id=prompt.project_id,
+        created_at=created_at,
+    )
+    if prompt.project_id is None:
+        conflict_target = {"index_elements": [table.original_prompt], "index_where": table.project_id.is_(None)}
+    else:
+        conflict_target = {
+            "index_elements": [table.project_id, table.original_prompt],
+            "index_where": table.project_id.isnot(None),
+        }
+    return stmt.on_conflict_do_update(**conflict_target, set_={"enhanced_prompt": stmt.excluded.enhanced_prompt})
+
+
+def save_results_statement(upsert, analytics_values: dict, history_values: dict | None):
+    """Postgres: the cache upsert, analytics insert and optional history insert as one WITH statement."""
+    upserted = upsert.returning(models.PromptCache.id, models.PromptCache.created_at).cte("upserted_prompt")
+    columns = list(analytics_values)
+    analytics_insert = insert(models.UsageAnalytics).from_select(
+        ["prompt_id", *columns],
+        select(
+            upserted.c.id,
+            *(literal(analytics_values[c], type_=models.UsageAnalytics.__table__.c[c].type) for c in columns),
+        ),
+    )
+    stmt = select(upserted.c.id, upserted.c.created_at).add_cte(analytics_insert.cte("analytics_row"))
+    if history_values is not None:
+        stmt = stmt.add_cte(insert(models.PromptHistory).values(**history_values).cte("history_row"))
+    return stmt
+
+
+# Recent prompts are only shown as 200-char previews (see llm_service._format_recent_prompts_section)
+RECENT_PROMPT_PREVIEW_CHARS = 200
+
+
+def recent_prompts_query(project_id: str, user_id: uuid.UUID | None, limit: int):
+    preview_len = RECENT_PROMPT_PREVIEW_CHARS + 1
+    history = models.PromptHistory
+    stmt = select(
+        func.substr(history.original_prompt, 1, preview_len),
+        func.substr(history.enhanced_prompt, 1, preview_len),
+    ).where(history.project_id == project_id)
+    if user_id is not None:
+        stmt = stmt.where(history.user_id == user_id)
+    # Continuity context tolerates replica lag (the in-process cache already does)
+    return stmt.order_by(history.created_at.desc()).limit(limit).execution_options(replica_ok=True)
+
+
+def fallback_criteria(
+    user_id: uuid.UUID, as_of: datetime.datetime | None = None, exclude_ids: list[int] | None = None
+) -> tuple:
+    """
+    The user's recent, not-yet-rejected analytics rows (feedback for an unknown session_id).
+    The window ends at as_of (naive UTC, e.g. when a queued event happened) or now; rows in
+    exclude_ids (already updated in the same batch) are skipped.
+    """
+    analytics = models.UsageAnalytics
+    window_end = as_of or datetime.datetime.utcnow()
+    window_start = window_end - datetime.timedelta(minutes=settings.FEEDBACK_FALLBACK_WINDOW_MINUTES)
+    criteria = (
+        analytics.user_id == user_id,
+        analytics.created_at >= window_start,
+        or_(analytics.user_action != models.UserAction.rejected, analytics.user_action.is_(None)),
+    )
+    if as_of is not None:
+        criteria += (analytics.created_at <= as_of,)
+    if exclude_ids:
+        criteria += (analytics.id.not_in(exclude_ids),)
+    return criteria
+
+
+class FeedbackFallback(NamedTuple):
+    """Who sent a batch event and when (naive UTC), to match it when its session is unknown."""
+    user_id: uuid.UUID
+    as_of: datetime.datetime
+
+
+def group_by_action(actions: dict[uuid.UUID, models.UserAction]) -> dict[models.UserAction, list[uuid.UUID]]:
+    by_action: dict[models.UserAction, list[uuid.UUID]] = {}
+    for session_id, user_action in actions.items():
+        by_action.setdefault(user_action, []).append(session_id)
+    return by_action
+
+
+def latest_per_session(session_ids: list[uuid.UUID]):
+    """SELECT (id, old_action) of the newest usage_analytics row of each session."""
+    analytics = models.UsageAnalytics
+    ranked = select(
+        analytics.id,
+        analytics.user_action.label("old_action"),
+        func.row_number().over(partition_by=analytics.session_id, order_by=analytics.created_at.desc()).label("rank"),
+    ).where(analytics.session_id.in_(session_ids)).subquery()
+    return select(ranked.c.id, ranked.c.old_action).where(ranked.c.rank == 1)
+
+
+def latest_matching(*criteria):
+    """SELECT (id, old_action) of the newest usage_analytics row matching criteria."""
+    analytics = models.UsageAnalytics
+    return (
+        select(analytics.id, analytics.user_action.label("old_action"))
+        .where(*criteria)
+        .order_by(analytics.created_at.desc())
+        .limit(1)
+    )
+
+
+def update_from_statement(latest, user_action: models.UserAction):
+    """Postgres: UPDATE ... FROM (latest rows) RETURNING the FeedbackUpdate columns."""
+    analytics = models.UsageAnalytics
+    return (
+        update(analytics)
+        .where(analytics.id == latest.c.id)
+        .values(user_action=user_action)
+        .returning(
+            analytics.id, analytics.session_id, latest.c.old_action,
+            analytics.created_at, analytics.enhancement_strategy, analytics.experiment_group, analytics.latency_tier,
+        )
+    )
+
+
+def update_ids_statement(ids: list[int], user_action: models.UserAction):
+    """UPDATE by primary key, RETURNING id, session_id and the rollup key columns."""
+    analytics = models.UsageAnalytics
+    return update(analytics).where(analytics.id.in_(ids)).values(user_action=user_action).returning(
+        analytics.id, analytics.session_id, analytics.created_at, analytics.enhancement_strategy, analytics.experiment_group,
+        analytics.latency_tier,
+    )
+
+
+def feedback_update(row, old_action: models.UserAction | None) -> FeedbackUpdate:
+    """FeedbackUpdate from an update_ids_statement row and the action it had before."""
+    return FeedbackUpdate(
+        row.id, row.session_id, old_action, row.created_at, row.enhancement_strategy, row.experiment_group, row.latency_tier
+    )
+
+
+# --- analytics_daily_rollup ---
+
+# Stored in place of NULL key columns (NULLs cannot take part in the primary key)
+ROLLUP_NO_ACTION = "none"
+
+
+RollupKey = tuple[datetime.date, str, str, str, str]
+
+
+def _rollup_key(
+    created_at: datetime.datetime | None, strategy: str | None, group: str | None, tier: str | None, action
+) -> RollupKey:
+    day = (created_at or datetime.datetime.utcnow()).date()
+    if isinstance(action, models.UserAction):
+        action = action.value
+    return day, strategy or "", group or "", tier or "", action or ROLLUP_NO_ACTION
+
+
+def _inserted_key(row: dict) -> RollupKey:
+    return _rollup_key(
+        row.get("created_at"), row.get("enhancement_strategy"), row.get("experiment_group"),
+        row.get("latency_tier"), row.get("user_action"),
+    )
+
+
+def rollup_inserted(analytics_rows: list[dict]) -> Counter:
+    """+1 per new usage_analytics row."""
+    return Counter(_inserted_key(row) for row in analytics_rows)
+
+
+def rollup_latency(analytics_rows: list[dict]) -> dict[RollupKey, tuple[int, int]]:
+    """(summed latency_ms, rows with a latency) per bucket of new usage_analytics rows."""
+    latency: dict[RollupKey, tuple[int, int]] = {}
+    for row in analytics_rows:
+        if row.get("latency_ms") is not None:
+            key = _inserted_key(row)
+            total, count = latency.get(key, (0, 0))
+            latency[key] = (total + row["latency_ms"], count + 1)
+    return latency
+
+
+def rollup_moved(updates: list[FeedbackUpdate], new_action: models.UserAction) -> Counter:
+    """-1 on the old action and +1 on the new one for each row whose feedback changed."""
+    deltas = Counter()
+    for u in updates:
+        deltas[_rollup_key(u.created_at, u.enhancement_strategy, u.experiment_group, u.latency_tier, u.old_action)] -= 1
+        deltas[_rollup_key(u.created_at, u.enhancement_strategy, u.experiment_group, u.latency_tier, new_action)] += 1
+    return deltas
+
+
+def rollup_upsert(dialect_name: str, deltas: Counter, latency: dict[RollupKey, tuple[int, int]] | None = None):
+    """
+    INSERT ... ON CONFLICT DO UPDATE SET count = count + excluded.count (and the latency
+    sums) for the non-zero deltas, or None if there is nothing to apply or the dialect has
+    no ON CONFLICT. Rows are sorted so concurrent transactions lock rollup rows in the same order.
+    """
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    latency = latency or {}
+    values = [
+        {
+            "day": key[0], "enhancement_strategy": key[1], "experiment_group": key[2], "latency_tier": key[3],
+            "user_action": key[4], "count": deltas.get(key, 0),
+            "latency_ms_total": latency.get(key, (0, 0))[0], "latency_count": latency.get(key, (0, 0))[1],
+        }
+        for key in sorted(set(deltas) | set(latency))
+        if deltas.get(key) or key in latency
+    ]
+    if not values:
+        return None
+    rollup = models.AnalyticsDailyRollup
+    stmt = insert(rollup).values(values)
+    return stmt.on_conflict_do_update(
+        index_elements=[rollup.day, rollup.enhancement_strategy, rollup.experiment_group, rollup.latency_tier, rollup.user_action],
+        set_={
+            "count": rollup.count + stmt.excluded.count,
+            "latency_ms_total": rollup.latency_ms_total + stmt.excluded.latency_ms_total,
+            "latency_count": rollup.latency_count + stmt.excluded.latency_count,
+        },
+    )
+
+
+def rollup_stats_query(
+    start: datetime.date,
+    end: datetime.date,
+    strategy: str | None = None,
+    experiment_group: str | None = None,
+    by_day: bool = False,
+    latency_tier: str | None = None,
+    by_tier: bool = False,
+):
+    """Summed rollup counts and latency per (strategy, group[, day][, tier], action) for start <= day <= end."""
+    rollup = models.AnalyticsDailyRollup
+    keys = [rollup.enhancement_strategy, rollup.experiment_group]
+    if by_day:
+        keys.insert(0, rollup.day)
+    if by_tier:
+        keys.append(rollup.latency_tier)
+    stmt = (
+        select(
+            *keys,
+            rollup.user_action,
+            func.sum(rollup.count).label("count"),
+            func.sum(rollup.latency_ms_total).label("latency_ms_total"),
+            func.sum(rollup.latency_count).label("latency_count"),
+        )
+        .where(rollup.day >= start, rollup.day <= end)
+        .group_by(*keys, rollup.user_action)
+        .order_by(*keys)
+        .execution_options(replica_ok=True)
+    )
+    if strategy is not None:
+        stmt = stmt.where(rollup.enhancement_strategy == strategy)
+    if experiment_group is not None:
+        stmt = stmt.where(rollup.experiment_group == experiment_group)
+    if latency_tier is not None:
+        stmt = stmt.where(rollup.latency_tier == latency_tier)
+    return stmt
@@ -0,0 +1,215 @@
+"""
+Connection-pool and statement instrumentation, built on SQLAlchemy events.
+
+Per engine ("sync", "async", "sync_read", "async_read"):
+  - pool wait: time spent obtaining a connection from the pool (queueing when the
+    pool is exhausted plus opening new connections). SQLAlchemy has no "checkout
+    requested" event, so the pool's _do_get is wrapped (re-applied after dispose()).
+  - pool hold: checkout -> checkin, from the pool "checkout"/"checkin" events.
+  - peak checked-out connections since start / the last reset.
+
+Per statement: duration by operation (SELECT/INSERT/...) in metrics, and by SQL
+fingerprint (literals and bind parameters replaced by ?, IN lists and multi-row
+VALUES collapsed) in a bounded in-process table for /api/v1/admin/db. Statements
+slower than DB_SLOW_QUERY_MS are logged with their fingerprint.
+
+The peak and wait figures are what to size DB_POOL_SIZE / DB_MAX_OVERFLOW from.
+"""
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_MAX_FINGERPRINT_CHARS = 1000
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_BIND_PARAM = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+|\?")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.IGNORECASE)
+_REPEATED_ROWS = re.compile(r"(\([^()]*\))(?:\s*,\s*\1)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Normalise SQL so statements differing only in values share one entry."""
+    sql = _STRING_LITERAL.sub("?", statement)
+    sql = _BIND_PARAM.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (?, ...)", sql)
+    sql = _REPEATED_ROWS.sub(r"\1, ...", sql)
+    return _WHITESPACE.sub(" ", sql).strip()[:_MAX_FINGERPRINT_CHARS]
+
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    keyword = head[0].upper() if head else ""
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH") else "OTHER"
+
+
+class _Timing:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class _EngineStats:
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.wait = _Timing()
+        self.hold = _Timing()
+        self.peak_checked_out = 0
+        self.slow_statements = 0
+
+
+_lock = threading.Lock()
+_engines: dict[str, _EngineStats] = {}
+_statements: OrderedDict[str, tuple[str, _Timing]] = OrderedDict()
+
+
+def _record_statement(name: str, statement: str, seconds: float) -> None:
+    operation = _operation(statement)
+    metrics.DB_STATEMENT_DURATION.observe(seconds, engine=name, operation=operation)
+    key = fingerprint(statement)
+    slow = seconds * 1000 >= settings.DB_SLOW_QUERY_MS
+    with _lock:
+        entry = _statements.get(key)
+        if entry is None:
+            entry = _statements[key] = (operation, _Timing())
+            while len(_statements) > settings.DB_STATEMENT_STATS_SIZE:
+                _statements.popitem(last=False)
+        else:
+            _statements.move_to_end(key)
+        entry[1].add(seconds)
+        if slow:
+            _engines[name].slow_statements += 1
+    if slow:
+        metrics.DB_SLOW_STATEMENTS.inc(engine=name)
+        logger.warning(
+            "Slow query",
+            extra={"engine": name, "duration_ms": round(seconds * 1000, 1), "fingerprint": key},
+        )
+
+
+def _wrap_pool_get(name: str, pool) -> None:
+    stats = _engines[name]
+    do_get = pool._do_get
+
+    def _timed_do_get():
+        start = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with _lock:
+                stats.wait.add(waited)
+            metrics.DB_POOL_WAIT.observe(waited, engine=name)
+
+    pool._do_get = _timed_do_get
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Attach pool and statement instrumentation to `engine` (sync or async) under `name`."""
+    engine = getattr(engine, "sync_engine", engine)  # AsyncEngine events live on its sync core
+    _engines[name] = stats = _EngineStats(engine)
+    _wrap_pool_get(name, engine.pool)
+
+    @event.listens_for(engine, "engine_disposed")
+    def _engine_disposed(disposed_engine):
+        _wrap_pool_get(name, disposed_engine.pool)  # dispose() swaps in a fresh pool
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        checked_out = getattr(engine.pool, "checkedout", None)
+        if checked_out is not None:
+            with _lock:
+                stats.peak_checked_out = max(stats.peak_checked_out, checked_out())
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None) if connection_record is not None else None
+        if started is not None:
+            held = time.perf_counter() - started
+            with _lock:
+                stats.hold.add(held)
+            metrics.DB_POOL_HOLD.observe(held, engine=name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._instrumentation_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_instrumentation_start", None)
+        if start is not None:
+            _record_statement(name, statement, time.perf_counter() - start)
+
+
+def _pool_status(stats: _EngineStats) -> dict:
+    pool = stats.engine.pool
+    status = {"class": type(pool).__name__, "peak_checked_out": stats.peak_checked_out}
+    if hasattr(pool, "checkedout"):
+        status.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+        })
+    return status
+
+
+def snapshot(limit: int = 20) -> dict:
+    """Pool state and timings per engine, plus the `limit` statements with the most total time."""
+    with _lock:
+        statements = sorted(_statements.items(), key=lambda item: item[1][1].total, reverse=True)[:limit]
+        top = [{"fingerprint": key, "operation": op, **timing.as_dict()} for key, (op, timing) in statements]
+        fingerprints = len(_statements)
+    return {
+        "slow_query_ms": settings.DB_SLOW_QUERY_MS,
+        "engines": {
+            name: {
+                "pool": _pool_status(stats),
+                "wait": stats.wait.as_dict(),
+                "hold": stats.hold.as_dict(),
+                "slow_statements": stats.slow_statements,
+            }
+            for name, stats in _engines.items()
+        },
+        "fingerprints_tracked": fingerprints,
+        "top_statements": top,
+    }
+
+
+def reset() -> None:
+    """Clear the in-process timings and peaks (Prometheus metrics are left alone)."""
+    with _lock:
+        _statements.clear()
+        for stats in _engines.values():
+            stats.wait, stats.hold = _Timing(), _Timing()
+            stats.peak_checked_out = stats.slow_statements = 0
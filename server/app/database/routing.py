@@ -0,0 +1,53 @@
+"""
+Primary/replica routing for ORM sessions.
+
+A statement opts into the read replica with `.execution_options(replica_ok=True)`:
+it declares that a slightly stale answer is acceptable (cache lookups, recent
+history, analytics reads). Everything else - writes, SELECT ... FOR UPDATE and
+unmarked reads - goes to the primary.
+
+Read-your-writes: once a session has written anything, every later statement in
+that session uses the primary, so a request never reads back older data than it
+just wrote. `session.info["replica_ok"] = False` pins a whole session to the primary.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.core import metrics
+
+
+class RoutingSession(Session):
+    """Session that sends replica_ok reads to `read_bind` when one is configured."""
+
+    def __init__(self, *args, read_bind: Engine | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_bind = read_bind
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.read_bind is not None and clause is not None and self._replica_ok(clause):
+            metrics.DB_READ_ROUTING.inc(target="replica")
+            return self.read_bind
+        if self.read_bind is not None and clause is not None and clause.is_select:
+            metrics.DB_READ_ROUTING.inc(target="primary")
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+    def _replica_ok(self, clause) -> bool:
+        return (
+            getattr(clause, "is_select", False)
+            and clause.get_execution_options().get("replica_ok", False)
+            and getattr(clause, "_for_update_arg", None) is None
+            and self.info.get("replica_ok", True)
+            and not self.info.get("wrote", False)
+        )
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _track_writes(state: ORMExecuteState) -> None:
+    if not state.is_select:
+        state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _track_flush(session: Session, flush_context) -> None:
+    session.info["wrote"] = True
@@ -1,26 +1,130 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.core import metrics, tracing
+from app.database import instrumentation
+from app.database.routing import RoutingSession
 
 database_url = settings.DATABASE_URL
+read_database_url = settings.DATABASE_READ_URL
 
-if database_url.startswith("sqlite"):
-    engine = create_engine(
-        database_url,
-        connect_args={"check_same_thread": False}
-    )
-else:
-    pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
-    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
-    pool_recycle = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
-    engine = create_engine(
-        database_url,
+pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+pool_recycle = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+
+
+def _create_engine(url: str):
+    if url.startswith("sqlite"):
+        return create_engine(
+            url,
+            connect_args={"check_same_thread": False}
+        )
+    return create_engine(
+        url,
         pool_pre_ping=True,
         pool_recycle=pool_recycle,
         pool_size=pool_size,
         max_overflow=max_overflow
     )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+
+engine = _create_engine(database_url)
+tracing.instrument_engine(engine)
+instrumentation.instrument_engine(engine, "sync")
+
+# Optional replica (DATABASE_READ_URL) with its own pool of the same size; reads marked
+# replica_ok go there unless the session has already written (see database/routing.py).
+read_engine = _create_engine(read_database_url) if read_database_url else None
+if read_engine is not None:
+    tracing.instrument_engine(read_engine)
+    instrumentation.instrument_engine(read_engine, "sync_read")
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RoutingSession, read_bind=read_engine)
+
+
+def to_async_url(url: str):
+    """
+    Map a sync DATABASE_URL onto its asyncio driver (asyncpg / aiosqlite).
+
+    Returns (url, connect_args): libpq-only query options such as sslmode are not
+    understood by asyncpg, so they are translated into connect args.
+    """
+    sa_url = make_url(url)
+    backend = sa_url.get_backend_name()
+    connect_args: dict = {}
+    if backend == "sqlite":
+        return sa_url.set(drivername="sqlite+aiosqlite"), connect_args
+    if backend in ("postgresql", "postgres"):
+        query = dict(sa_url.query)
+        sslmode = query.pop("sslmode", None)
+        query.pop("channel_binding", None)
+        if sslmode:
+            connect_args["ssl"] = sslmode  # asyncpg accepts the libpq mode names
+        return sa_url.set(drivername="postgresql+asyncpg", query=query), connect_args
+    return sa_url, connect_args
+
+
+def _create_async_engine(url: str):
+    async_url, connect_args = to_async_url(url)
+    if url.startswith("sqlite"):
+        return create_async_engine(async_url, connect_args=connect_args)
+    return create_async_engine(
+        async_url,
+        connect_args=connect_args,
+        pool_pre_ping=True,
+        pool_recycle=pool_recycle,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+    )
+
+
+# Async engine for the request path: DB waits yield the event loop instead of holding a
+# worker thread. Sized by the same DB_POOL_SIZE / DB_MAX_OVERFLOW as the sync engine,
+# which remains for background work (write-behind flushes, scripts, Alembic).
+async_engine = _create_async_engine(database_url)
+tracing.instrument_engine(async_engine)
+instrumentation.instrument_engine(async_engine, "async")
+
+async_read_engine = _create_async_engine(read_database_url) if read_database_url else None
+if async_read_engine is not None:
+    tracing.instrument_engine(async_read_engine)
+    instrumentation.instrument_engine(async_read_engine, "async_read")
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    read_bind=async_read_engine.sync_engine if async_read_engine is not None else None,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+async def get_async_db():
+    """FastAPI dependency yielding an AsyncSession."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _pool_stats() -> dict[tuple[str, ...], float]:
+    """Snapshot of the connection pools for the DB pool gauge (QueuePool only)."""
+    stats = {}
+    engines = {"sync": engine, "async": async_engine, "sync_read": read_engine, "async_read": async_read_engine}
+    for name, bound in engines.items():
+        pool = bound.pool if bound is not None else None
+        if not hasattr(pool, "checkedout"):
+            continue
+        stats.update({
+            (name, "size"): pool.size(),
+            (name, "checked_out"): pool.checkedout(),
+            (name, "checked_in"): pool.checkedin(),
+            (name, "overflow"): pool.overflow(),
+        })
+    return stats
+
+
+metrics.DB_POOL.set_function(_pool_stats)
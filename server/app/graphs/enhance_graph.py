@@ -1,16 +1,26 @@
+import asyncio
+import datetime
+import logging
+import threading
+import time
 import uuid
 from typing import TypedDict
-from langgraph.graph import StateGraph, END
-from app.crud import prompt_cache as crud
+from langgraph.constants import END
+from app.crud import prompt_cache_async as crud
 from app.schemas import prompt as schemas
-from sqlalchemy.orm import Session
-from app.services import llm_service, ml_inference_service
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services import latency_tiers, llm_service, ml_inference_service, prompt_classifier
+from app.services.recent_history import recent_history
+from app.services.write_behind import write_buffer
+from app.core import deadline, metrics, tracing
+
+logger = logging.getLogger(__name__)
 
 class GraphState(TypedDict):
     original_prompt: str
     enhanced_prompt: str | None
     from_cache: bool
-    db: Session
+    db: AsyncSession
     user_id: uuid.UUID
     session_id: uuid.UUID
     prompt_id: int | None
@@ -21,17 +31,28 @@ class GraphState(TypedDict):
     project_id: str | None
     recent_prompts: list[tuple[str, str]] | None  # (original, enhanced) for continuity
     project_context: str | None
+    model_version: str | None  # preference model that produced quality_score
+    deadline_at: float | None  # time.monotonic() by which the response must be ready (app/core/deadline.py)
+    deadline_exceeded: bool | None
+    classification: prompt_classifier.PromptClassification | None  # set once by check_cache
+    latency_tier: str | None  # app/services/latency_tiers.py; None means DEFAULT_LATENCY_TIER
+    started_at: float | None  # time.monotonic() when the request arrived, for usage_analytics.latency_ms
 
-def check_cache(state: GraphState):
-    print("---NODE: CHECK CACHE---")
-    if llm_service.is_code(state["original_prompt"]):
-        print("Input is raw code. Bypassing enhancement.")
-        return {"from_cache": False, "enhanced_prompt": state["original_prompt"]}
+@metrics.instrument_node("check_cache")
+@tracing.traced("graph.check_cache")
+async def check_cache(state: GraphState):
+    logger.debug("node check_cache")
+    classification = prompt_classifier.classify(state["original_prompt"])
+    if classification.is_code:
+        logger.info("Input is raw code. Bypassing enhancement.")
+        metrics.CACHE_LOOKUPS.inc(result="bypass")
+        return {"from_cache": False, "enhanced_prompt": state["original_prompt"], "classification": classification}
     
     # TEMPORARILY DISABLED FOR DATA COLLECTION
     # Always return cache miss to force new enhancements
-    print("---CACHE DISABLED FOR DATA COLLECTION (forcing cache miss)---")
-    return {"from_cache": False}
+    logger.debug("Cache disabled for data collection (forcing cache miss)")
+    metrics.CACHE_LOOKUPS.inc(result="disabled")
+    return {"from_cache": False, "classification": classification}
     
     # Original cache logic (commented out temporarily)
     # cached = crud.get_prompt_by_original_text(state["db"], state["original_prompt"])
@@ -51,121 +72,142 @@ def check_cache(state: GraphState):
     #     print("---CACHE MISS---")
     #     return {"from_cache": False}
 
-def enhance_prompt(state: GraphState):
-    print("---NODE: ENHANCE PROMPT---")
+@metrics.instrument_node("enhance_prompt")
+@tracing.traced("graph.enhance_prompt")
+async def enhance_prompt(state: GraphState):
+    logger.debug("node enhance_prompt")
     retry_count = (state.get("retry_count", 0) or 0) + 1
     recent = state.get("recent_prompts") or []
     project_ctx = state.get("project_context") or ""
+    deadline_at = state.get("deadline_at")
+    if not deadline.can_afford(deadline_at, 0):
+        deadline.shortcut("enhance_prompt", "stopped")
+        logger.warning("Request deadline passed before the LLM call; stopping")
+        return {"deadline_exceeded": True, "retry_count": retry_count}
+
+    is_reroll = state.get("is_reroll", False)
+    if is_reroll:
+        logger.info("Reroll mode: requesting a different enhancement")
+    policy = latency_tiers.policy(state.get("latency_tier"))
 
-    if state.get("is_reroll", False):
-        print("---REROLL MODE: Requesting different enhancement---")
-        enhanced = llm_service.get_enhanced_prompt(
+    def attempt():
+        return llm_service.get_enhanced_prompt(
             state["original_prompt"],
-            is_reroll=True,
-            previous_enhancement=state.get("previous_enhancement"),
+            is_reroll=is_reroll,
+            previous_enhancement=state.get("previous_enhancement") if is_reroll else None,
             recent_prompts=recent if recent else None,
             project_context=project_ctx if project_ctx else None,
+            deadline_at=deadline_at,
+            classification=state.get("classification"),
+            latency_tier=state.get("latency_tier"),
         )
+
+    if policy.best_of > 1 and retry_count == 1:
+        # Concurrent candidates cost one attempt's latency; the preference model picks one.
+        # A quality retry asks for a single candidate, so a request makes at most best_of + 1 calls.
+        enhanced = _best_candidate(state["original_prompt"], await asyncio.gather(*(attempt() for _ in range(policy.best_of))))
     else:
-        enhanced = llm_service.get_enhanced_prompt(
-            state["original_prompt"],
-            recent_prompts=recent if recent else None,
-            project_context=project_ctx if project_ctx else None,
-        )
+        enhanced = await attempt()
+    if enhanced is None:
+        # Out of time: the attempt hit the deadline, or the fallback was skipped because it
+        # could not finish before it. Keep the previous attempt's enhancement, if any.
+        deadline.shortcut("enhance_prompt", "timed_out")
+        return {"deadline_exceeded": True, "retry_count": retry_count}
     return {"enhanced_prompt": enhanced, "retry_count": retry_count}
 
-def save_results(state: GraphState):
-    print("---NODE: SAVE RESULTS---")
+def _best_candidate(original: str, candidates: list[str | None]) -> str | None:
+    """The candidate the preference model most expects to be accepted (error messages only if nothing else came back)."""
+    usable = [c for c in candidates if not llm_service.is_error_output(c)]
+    if not usable:
+        return next((c for c in candidates if c is not None), None)
+    if len(usable) == 1:
+        return usable[0]
+    scores = ml_inference_service.predict_acceptance_probabilities(original, usable)
+    return usable[max(range(len(usable)), key=scores.__getitem__)]
+
+@metrics.instrument_node("save_results")
+@tracing.traced("graph.save_results")
+async def save_results(state: GraphState):
+    logger.debug("node save_results")
     db = state["db"]
     enhanced_prompt = state["enhanced_prompt"]
 
-    if llm_service.is_code(state["original_prompt"]):
-        print("Skipping DB save for raw code.")
+    classification = state.get("classification") or prompt_classifier.classify(state["original_prompt"])
+    if classification.is_code:
+        logger.debug("Skipping DB save for raw code.")
         return {}
 
     if enhanced_prompt is None:
-        print("---WARNING: Enhancement failed. Skipping DB save.---")
+        logger.warning("Enhancement failed. Skipping DB save.")
         return {}
 
-    project_id = state.get("project_id")
-    existing_prompt = crud.get_prompt_by_original_text(db, state["original_prompt"], project_id=project_id)
-
-    if existing_prompt:
-        print(f"---Prompt already in cache (ID: {existing_prompt.id}). Using existing cache entry.---")
-        if existing_prompt.enhanced_prompt != enhanced_prompt:
-            print(f"---Updating cache with new enhancement (reroll detected)---")
-            existing_prompt.enhanced_prompt = enhanced_prompt
-            db.commit()
-            db.refresh(existing_prompt)
-        prompt_id = existing_prompt.id
-    else:
-        print(f"---Creating new cache entry---")
-        prompt_to_cache = schemas.PromptCacheCreate(
-            original_prompt=state["original_prompt"],
-            enhanced_prompt=enhanced_prompt,
-            project_id=project_id,
-        )
-        try:
-            created_prompt_obj = crud.create_cached_prompt(db, prompt=prompt_to_cache)
-            prompt_id = created_prompt_obj.id
-        except Exception as e:
-            if "unique constraint" in str(e).lower() or "duplicate key" in str(e).lower():
-                print(f"---Cache entry already exists (race condition). Retrieving existing entry.---")
-                existing_prompt = crud.get_prompt_by_original_text(db, state["original_prompt"], project_id=project_id)
-                if existing_prompt:
-                    prompt_id = existing_prompt.id
-                else:
-                    print(f"---ERROR: Could not find or create cache entry.---")
-                    return {}
-            else:
-                raise
+    if not deadline.can_afford(state.get("deadline_at"), 0):
+        # The client has stopped waiting: an "accepted" analytics row for an enhancement
+        # nobody received would skew acceptance stats.
+        deadline.shortcut("save_results", "skipped")
+        logger.warning("Request deadline passed before saving; skipping DB writes")
+        return {"deadline_exceeded": True}
 
+    project_id = state.get("project_id")
+    history = None
     if project_id:
-        crud.create_prompt_history_entry(
-            db,
-            schemas.PromptHistoryCreate(
-                project_id=project_id,
-                user_id=state["user_id"],
-                session_id=state["session_id"],
-                original_prompt=state["original_prompt"],
-                enhanced_prompt=enhanced_prompt,
-            ),
-        )
-
-    if prompt_id:
-        analytics_to_save = schemas.UsageAnalyticsCreate(
-            prompt_id=prompt_id,
+        history = schemas.PromptHistoryCreate(
+            project_id=project_id,
             user_id=state["user_id"],
             session_id=state["session_id"],
-            enhancement_strategy="engineer_v3_groq_primary",
-            user_action="accepted"
+            original_prompt=state["original_prompt"],
+            enhanced_prompt=enhanced_prompt,
         )
-        crud.create_usage_analytics_entry(db, analytics_data=analytics_to_save)
+    prompt = schemas.PromptCacheCreate(
+        original_prompt=state["original_prompt"],
+        enhanced_prompt=enhanced_prompt,
+        project_id=project_id,
+    )
+    analytics = schemas.UsageAnalyticsBase(
+        user_id=state["user_id"],
+        session_id=state["session_id"],
+        enhancement_strategy="engineer_v3_groq_primary",
+        user_action="accepted",
+        model_version=state.get("model_version") or ml_inference_service.loaded_model_version(),
+        latency_tier=latency_tiers.resolve(state.get("latency_tier")),
+        latency_ms=round((time.monotonic() - state["started_at"]) * 1000) if state.get("started_at") else None,
+    )
+    if write_buffer.enabled:
+        # Only the cache upsert is on the response path; history/analytics are flushed in bulk.
+        prompt_id, created = await crud.upsert_cached_prompt(db, prompt)
+        now = datetime.datetime.utcnow()
+        history_row = {**history.model_dump(), "created_at": now} if history is not None else None
+        analytics_row = {**analytics.model_dump(), "prompt_id": prompt_id, "created_at": now}
+        if not write_buffer.submit(history=history_row, analytics=analytics_row):
+            # Buffer full (or not running): write synchronously rather than drop the rows
+            await crud.bulk_insert_enhancement_rows(db, [history_row] if history_row else [], [analytics_row])
+    else:
+        prompt_id, created = await crud.save_enhancement_results(db, prompt=prompt, analytics=analytics, history=history)
+    if history is not None:
+        recent_history.record(project_id, history.user_id, history.original_prompt, history.enhanced_prompt)
+    metrics.CACHE_WRITES.inc(result="inserted" if created else "updated")
+    logger.debug("Saved enhancement results", extra={"prompt_id": prompt_id, "cache_row_created": created})
     return {"prompt_id": prompt_id}
 
-def quality_filter(state: GraphState):
+@metrics.instrument_node("quality_filter")
+@tracing.traced("graph.quality_filter")
+async def quality_filter(state: GraphState):
     """Use ML model to predict if enhancement will be accepted. Loop back if quality is low."""
-    print("---NODE: QUALITY FILTER---")
+    logger.debug("node quality_filter")
     enhanced = state.get("enhanced_prompt")
     original = state.get("original_prompt")
     
     if not enhanced or not original:
-        print("---WARNING: Missing prompts for quality check. Proceeding anyway.---")
+        logger.warning("Missing prompts for quality check. Proceeding anyway.")
         return {"quality_score": 1.0, "retry_count": state.get("retry_count", 0)}
     
     # Predict acceptance probability
+    model_version = ml_inference_service.loaded_model_version()
     probability = ml_inference_service.predict_acceptance_probability(original, enhanced)
     
-    print(f"---Quality Score: {probability:.4f} (threshold: 0.40)---")
+    logger.info("Quality score computed", extra={"quality_score": round(probability, 4), "threshold": 0.40})
     
-    return {"quality_score": probability, "retry_count": state.get("retry_count", 0)}
-
-workflow = StateGraph(GraphState)
-
-workflow.add_node("check_cache", check_cache)
-workflow.add_node("enhance_prompt", enhance_prompt)
-workflow.add_node("quality_filter", quality_filter)
-workflow.add_node("save_results", save_results)
+    return {"quality_score": probability, "retry_count": state.get("retry_count", 0), "model_version": model_version}
 
 def decide_next_step(state: GraphState):
     if state.get("enhanced_prompt") == state.get("original_prompt"): # is_code check returned original
@@ -177,21 +219,62 @@ def decide_next_step(state: GraphState):
 def after_quality_check(state: GraphState):
     """After quality check, either save (if good) or retry (if bad)."""
     quality = state.get("quality_score", 1.0)
-    # Limit retries to prevent infinite loops (max 3 attempts)
+    # retry_count is the number of attempts so far (enhance_prompt increments it); the
+    # tier allows quality_retries attempts after the first (none for "fast" and "balanced")
     retry_count = state.get("retry_count", 0) or 0
+    retries_left = retry_count <= latency_tiers.policy(state.get("latency_tier")).quality_retries
     
-    if quality < 0.40 and retry_count < 1:
-        print(f"---RETRY #{retry_count + 1}: Quality too low, trying again---")
+    if quality < 0.40 and retries_left and not deadline.can_afford(
+        state.get("deadline_at"), deadline.expected_llm_seconds("groq")
+    ):
+        deadline.shortcut("quality_retry", "skipped")
+        metrics.QUALITY_DECISIONS.inc(decision="deadline")
+        logger.info("Quality too low, but no time left for a retry before the deadline")
+        return "save_results"
+    if quality < 0.40 and retries_left:
+        logger.info("Quality too low, retrying", extra={"retry": retry_count})
+        metrics.QUALITY_RETRIES.inc()
+        metrics.QUALITY_DECISIONS.inc(decision="retry")
         return "enhance_prompt"  # Loop back to enhance (will increment retry_count)
     else:
-        if retry_count >= 1:
-            print("---MAX RETRIES REACHED: Saving anyway---")
+        if quality < 0.40:
+            logger.debug("Max retries reached: saving anyway")
+        metrics.QUALITY_DECISIONS.inc(decision="save" if quality >= 0.40 else "max_retries")
         return "save_results"  # Proceed to save
 
-workflow.set_entry_point("check_cache")
-workflow.add_conditional_edges("check_cache", decide_next_step)
-workflow.add_edge("enhance_prompt", "quality_filter")
-workflow.add_conditional_edges("quality_filter", after_quality_check)
-workflow.add_edge("save_results", END)
+def after_enhance(state: GraphState):
+    """Out of time: return whatever we have instead of scoring and saving it."""
+    if state.get("deadline_exceeded"):
+        return END
+    return "quality_filter"
+
+def _build_graph():
+    # langgraph.graph costs ~0.7s to import, so it is only loaded when the graph is compiled
+    from langgraph.graph import StateGraph
+
+    workflow = StateGraph(GraphState)
+
+    workflow.add_node("check_cache", check_cache)
+    workflow.add_node("enhance_prompt", enhance_prompt)
+    workflow.add_node("quality_filter", quality_filter)
+    workflow.add_node("save_results", save_results)
+
+    workflow.set_entry_point("check_cache")
+    workflow.add_conditional_edges("check_cache", decide_next_step)
+    workflow.add_conditional_edges("enhance_prompt", after_enhance)
+    workflow.add_conditional_edges("quality_filter", after_quality_check)
+    workflow.add_edge("save_results", END)
+
+    return workflow.compile()
+
+_enhancement_graph = None
+_graph_lock = threading.Lock()
 
-enhancement_graph = workflow.compile()
\ No newline at end of file
+def get_enhancement_graph():
+    """The compiled enhancement graph, built on first use (normally by the startup warm-up)."""
+    global _enhancement_graph
+    if _enhancement_graph is None:
+        with _graph_lock:
+            if _enhancement_graph is None:
+                _enhancement_graph = _build_graph()
+    return _enhancement_graph
\ No newline at end of file
@@ -4,10 +4,13 @@ import enum
 from sqlalchemy import (
     Column,
     Integer,
+    BigInteger,
     String,
     Text,
+    Date,
     DateTime,
     ForeignKey,
+    Index,
     Enum as SQLAlchemyEnum,
 )
 from sqlalchemy.dialects.postgresql import UUID
@@ -39,11 +42,27 @@ class PromptCache(Base):
     # Relationship to usage_analytics
     analytics = relationship("UsageAnalytics", back_populates="prompt")
 
+    # Partial unique indexes (see migration b1c2d3e4f5a6); these are the ON CONFLICT targets for upserts.
+    __table_args__ = (
+        Index(
+            "ix_prompt_cache_global_original", original_prompt, unique=True,
+            postgresql_where=project_id.is_(None), sqlite_where=project_id.is_(None),
+        ),
+        Index(
+            "ix_prompt_cache_project_original", project_id, original_prompt, unique=True,
+            postgresql_where=project_id.isnot(None), sqlite_where=project_id.isnot(None),
+        ),
+    )
+
 
 class PromptHistory(Base):
     """
     Per-project prompt history for continuity: recent (original, enhanced) pairs
     so the LLM can maintain context across enhancements in the same project.
+
+    On Postgres the table is partitioned by month on created_at and its primary key
+    is (id, created_at) (migration e4f5a6b7c8d9); id alone stays unique in practice
+    and remains the ORM identity.
     """
     __tablename__ = "prompt_history"
 
@@ -55,10 +74,16 @@ class PromptHistory(Base):
     enhanced_prompt = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
+    # Recent prompts per project/user, newest first (see migration d3e4f5a6b7c8)
+    __table_args__ = (
+        Index("ix_prompt_history_project_user_created", project_id, user_id, created_at.desc()),
+    )
+
 class UsageAnalytics(Base):
     """
     SQLAlchemy model for the usage_analytics table.
     Tracks metrics related to prompt enhancements and A/B tests.
+    Partitioned by month on Postgres, like PromptHistory.
     """
     __tablename__ = "usage_analytics"
 
@@ -72,6 +97,39 @@ class UsageAnalytics(Base):
     experiment_group = Column(String(50), nullable=True)  # e.g., 'A', 'B'
     enhancement_strategy = Column(String(100), nullable=True)  # e.g., 'basic_v1'
     user_action = Column(SQLAlchemyEnum(UserAction), nullable=True)  # 'accepted', 'rejected'
+    model_version = Column(String(64), nullable=True)  # preference model that scored the enhancement
+    latency_tier = Column(String(20), nullable=True)  # 'fast', 'balanced', 'quality'
+    latency_ms = Column(Integer, nullable=True)  # request arrival to the enhancement being saved
 
     # Relationship to prompt_cache
-    prompt = relationship("PromptCache", back_populates="analytics")
\ No newline at end of file
+    prompt = relationship("PromptCache", back_populates="analytics")
+
+    # Feedback looks up the latest row per session, and per user for the fallback (see migration c2d3e4f5a6b7)
+    __table_args__ = (
+        Index("ix_usage_analytics_session_created", session_id, created_at.desc()),
+        Index("ix_usage_analytics_user_created", user_id, created_at.desc()),
+    )
+
+
+class AnalyticsDailyRollup(Base):
+    """
+    usage_analytics row counts per (day, enhancement_strategy, experiment_group, latency_tier,
+    user_action), kept in step with the write path (inserts add 1, feedback moves 1 between
+    actions; the request path applies these in batches, see services/rollup_buffer.py) so
+    dashboards never scan usage_analytics. NULL strategy/group/tier are stored
+    as "" and a NULL user_action as "none". Rows outlive the retention policy on the raw table.
+
+    latency_ms_total and latency_count sum usage_analytics.latency_ms (and count the rows
+    that have one) on insert and stay where they were added when feedback moves the row,
+    so only their sums over all actions of a bucket are meaningful.
+    """
+    __tablename__ = "analytics_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    enhancement_strategy = Column(String(100), primary_key=True)
+    experiment_group = Column(String(50), primary_key=True)
+    latency_tier = Column(String(20), primary_key=True)
+    user_action = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    latency_ms_total = Column(BigInteger, nullable=False, default=0)
+    latency_count = Column(Integer, nullable=False, default=0)
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 import datetime
 import uuid
+from typing import Literal
 from app.models.prompt import UserAction
 
 class PromptBase(BaseModel):
@@ -18,11 +19,14 @@ class PromptEnhanceRequest(PromptBase):
     project_id: str | None = None
     # Optional project context (e.g. README, package.json) for enhancement
     project_context: str | None = None
+    # Latency/quality trade-off (app/services/latency_tiers.py); None uses DEFAULT_LATENCY_TIER
+    latency_tier: Literal["fast", "balanced", "quality"] | None = None
 
 class PromptEnhanceResponse(BaseModel):
     original_prompt: str
     enhanced_prompt: str
     from_cache: bool
+    latency_tier: str | None = None  # The tier the request ran in
 
 class PromptCacheCreate(BaseModel):
     original_prompt: str
@@ -43,13 +47,18 @@ class PromptCacheDB(PromptCacheCreate):
     class Config:
         from_attributes = True
 
-class UsageAnalyticsCreate(BaseModel):
-    prompt_id: int
+class UsageAnalyticsBase(BaseModel):
     user_id: uuid.UUID
     session_id: uuid.UUID
     experiment_group: str | None = None
     enhancement_strategy: str | None = None
     user_action: UserAction | None = None
+    model_version: str | None = None
+    latency_tier: str | None = None
+    latency_ms: int | None = None  # Request arrival to the enhancement being saved
+
+class UsageAnalyticsCreate(UsageAnalyticsBase):
+    prompt_id: int
 
 class UsageAnalyticsDB(UsageAnalyticsCreate):
     id: int
@@ -60,7 +69,51 @@ class UsageAnalyticsDB(UsageAnalyticsCreate):
 class FeedbackRequest(BaseModel):
     session_id: uuid.UUID
     user_action: UserAction # Will be 'accepted' or 'rejected'
+    user_id: uuid.UUID | None = None  # Scopes the fallback lookup when session_id is unknown
 
 class FeedbackResponse(BaseModel):
     status: str
-    message: str
\ No newline at end of file
+    message: str
+
+class FeedbackEvent(BaseModel):
+    session_id: uuid.UUID
+    user_action: UserAction
+    timestamp: datetime.datetime | None = None  # When the user acted; the newest event per session wins
+    user_id: uuid.UUID | None = None
+
+    @field_validator("timestamp")
+    @classmethod
+    def _as_utc(cls, value: datetime.datetime | None) -> datetime.datetime | None:
+        """Naive timestamps are taken as UTC, so events with and without an offset compare."""
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            return value.replace(tzinfo=datetime.timezone.utc)
+        return value.astimezone(datetime.timezone.utc)
+
+class FeedbackBatchRequest(BaseModel):
+    events: list[FeedbackEvent] = Field(..., max_length=1000)
+
+class FeedbackBatchResponse(BaseModel):
+    status: str
+    received: int
+    applied: int
+    unknown_session_ids: list[uuid.UUID] = []
+
+class StatsBucket(BaseModel):
+    enhancement_strategy: str | None
+    experiment_group: str | None
+    day: datetime.date | None = None  # Only set when by_day=true
+    latency_tier: str | None = None  # Only set when by_tier=true
+    accepted: int = 0
+    rejected: int = 0
+    modified: int = 0
+    unrated: int = 0  # Rows without a user_action (written before feedback existed)
+    total: int = 0
+    acceptance_rate: float | None = None  # accepted / (accepted + rejected + modified)
+    mean_latency_ms: float | None = None  # Over the rows that recorded a latency
+
+class StatsResponse(BaseModel):
+    start: datetime.date
+    end: datetime.date
+    buckets: list[StatsBucket]
@@ -0,0 +1,184 @@
+"""
+Array-backed scorer for the preference model: no scikit-learn, no pickles.
+
+A TF-IDF + logistic regression is a vocabulary, an IDF vector, a coefficient vector
+and an intercept. `export_compiled` writes those next to the joblib artifacts:
+
+    compiled/scorer.json       analyzer settings (lowercase, token pattern, stop words,
+                               n-gram range, binary/sublinear tf, norm) and the intercept
+    compiled/vocabulary.json   terms, in feature-column order
+    compiled/idf.npy           float64 IDF weights
+    compiled/coef.npy          float64 coefficients for the "accepted" class
+
+`CompiledScorer.load` memory-maps the .npy files, so workers share the pages and
+loading costs a JSON parse. Scoring re-implements the word analyzer and
+TfidfTransformer steps and applies the logistic function to the dot product;
+export checks the result against the estimator's predict_proba before writing.
+
+Only TF-IDF word analyzers without custom callables and binary linear models with
+predict_proba (LogisticRegression, SGDClassifier with log_loss) can be compiled;
+the incremental HashingVectorizer model cannot (its murmurhash lives in sklearn).
+"""
+import json
+import re
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+FORMAT_VERSION = 1
+_TOLERANCE = 1e-9
+
+_PROBE_TEXTS = (
+    "write a python api",
+    "Act as a senior engineer. Build a FastAPI service with tests, docs and step-by-step reasoning.",
+    "refactor the database layer, add caching and explain the trade-offs",
+    "",
+)
+
+
+class CompiledScorer:
+    def __init__(self, spec: dict, vocabulary: list[str], idf: np.ndarray, coef: np.ndarray):
+        self.lowercase = spec["lowercase"]
+        self.token_pattern = re.compile(spec["token_pattern"])
+        self.stop_words = frozenset(spec["stop_words"] or ())
+        self.ngram_range = tuple(spec["ngram_range"])
+        self.binary = spec["binary"]
+        self.sublinear_tf = spec["sublinear_tf"]
+        self.norm = spec["norm"]
+        self.intercept = spec["intercept"]
+        self.index = {term: i for i, term in enumerate(vocabulary)}
+        self.idf = idf
+        self.coef = coef
+
+    @classmethod
+    def load(cls, directory: Path) -> "CompiledScorer":
+        spec = json.loads((directory / "scorer.json").read_text())
+        if spec.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled scorer format: {spec.get('format')!r}")
+        vocabulary = json.loads((directory / "vocabulary.json").read_text())
+        idf = np.load(directory / "idf.npy", mmap_mode="r")
+        coef = np.load(directory / "coef.npy", mmap_mode="r")
+        return cls(spec, vocabulary, idf, coef)
+
+    def _terms(self, text: str) -> list[str]:
+        if self.lowercase:
+            text = text.lower()
+        tokens = [t for t in self.token_pattern.findall(text) if t not in self.stop_words]
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        terms = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def _counts(self, text: str) -> dict[int, int]:
+        counts: dict[int, int] = {}
+        index = self.index
+        for term in self._terms(text):
+            column = index.get(term)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        return counts
+
+    def _decision(self, counts: dict[int, int]) -> float:
+        if not counts:
+            return self.intercept
+        columns = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        if self.binary:
+            tf[:] = 1.0
+        if self.sublinear_tf:
+            tf = np.log(tf) + 1.0
+        weights = tf * self.idf[columns]
+        if self.norm == "l2":
+            length = np.sqrt(weights @ weights)
+        elif self.norm == "l1":
+            length = np.abs(weights).sum()
+        else:
+            length = 0.0
+        if length:
+            weights /= length
+        return float(weights @ self.coef[columns]) + self.intercept
+
+    def predict(self, original_prompt: str, enhanced_prompts: Sequence[str]) -> list[float]:
+        """P(accepted) for each candidate, scored as the text "original enhanced"."""
+        if self.ngram_range == (1, 1):
+            # Unigram counts of the joined text are the sum of both parts' counts
+            base = self._counts(original_prompt)
+            decisions = []
+            for enhanced in enhanced_prompts:
+                counts = dict(base)
+                for column, count in self._counts(enhanced).items():
+                    counts[column] = counts.get(column, 0) + count
+                decisions.append(self._decision(counts))
+        else:
+            decisions = [self._decision(self._counts(original_prompt + " " + e)) for e in enhanced_prompts]
+        return _sigmoid(np.array(decisions)).tolist()
+
+    def predict_pairs(self, pairs: Sequence[tuple[str, str]]) -> list[float]:
+        decisions = [self._decision(self._counts(original + " " + enhanced)) for original, enhanced in pairs]
+        return _sigmoid(np.array(decisions)).tolist()
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    with np.errstate(over="ignore"):
+        return 1.0 / (1.0 + np.exp(-z))
+
+
+def compile_unsupported_reason(model, vectorizer) -> str | None:
+    """Why (model, vectorizer) can't be compiled, or None if it can."""
+    if not hasattr(vectorizer, "vocabulary_") or not hasattr(vectorizer, "transform"):
+        return f"{type(vectorizer).__name__} has no fitted vocabulary"
+    if getattr(vectorizer, "analyzer", None) != "word":
+        return "only word analyzers are supported"
+    for attribute in ("preprocessor", "tokenizer", "strip_accents"):
+        if getattr(vectorizer, attribute, None) is not None:
+            return f"custom {attribute} is not supported"
+    if getattr(vectorizer, "use_idf", False) and not hasattr(vectorizer, "idf_"):
+        return "vectorizer has no idf_"
+    coef = getattr(model, "coef_", None)
+    if coef is None or coef.shape[0] != 1 or list(getattr(model, "classes_", [])) != [0, 1]:
+        return f"{type(model).__name__} is not a binary linear model over classes [0, 1]"
+    if not hasattr(model, "predict_proba"):
+        return f"{type(model).__name__} has no predict_proba"
+    return None
+
+
+def export_compiled(model, vectorizer, directory: Path) -> bool:
+    """
+    Write the compiled scorer for (model, vectorizer) into `directory`. Returns False
+    (and writes nothing) when the pair isn't supported or doesn't reproduce predict_proba.
+    """
+    if compile_unsupported_reason(model, vectorizer) is not None:
+        return False
+    vocabulary = [None] * len(vectorizer.vocabulary_)
+    for term, column in vectorizer.vocabulary_.items():
+        vocabulary[column] = term
+    stop_words = vectorizer.get_stop_words()
+    spec = {
+        "format": FORMAT_VERSION,
+        "lowercase": bool(vectorizer.lowercase),
+        "token_pattern": vectorizer.token_pattern,
+        "stop_words": sorted(stop_words) if stop_words else None,
+        "ngram_range": list(vectorizer.ngram_range),
+        "binary": bool(vectorizer.binary),
+        "sublinear_tf": bool(getattr(vectorizer, "sublinear_tf", False)),
+        "norm": getattr(vectorizer, "norm", None),
+        "intercept": float(np.ravel(model.intercept_)[0]),
+    }
+    idf = np.asarray(vectorizer.idf_ if getattr(vectorizer, "use_idf", False) else np.ones(len(vocabulary)), dtype=np.float64)
+    coef = np.ascontiguousarray(model.coef_[0], dtype=np.float64)
+
+    scorer = CompiledScorer(spec, vocabulary, idf, coef)
+    expected = model.predict_proba(vectorizer.transform([_PROBE_TEXTS[0] + " " + t for t in _PROBE_TEXTS]))[:, 1]
+    if not np.allclose(scorer.predict(_PROBE_TEXTS[0], _PROBE_TEXTS), expected, rtol=0, atol=_TOLERANCE):
+        return False
+
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / "scorer.json").write_text(json.dumps(spec))
+    (directory / "vocabulary.json").write_text(json.dumps(vocabulary))
+    np.save(directory / "idf.npy", idf)
+    np.save(directory / "coef.npy", coef)
+    return True
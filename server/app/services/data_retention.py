@@ -0,0 +1,232 @@
+"""
+Partition upkeep and retention for prompt_history and usage_analytics.
+
+Postgres (after migration e4f5a6b7c8d9) stores both tables as monthly RANGE
+partitions on created_at. Each run calls promptboost_ensure_monthly_partitions() to
+keep PARTITION_PREMAKE_MONTHS partitions ahead, so inserts never fall through to the
+DEFAULT partition, and retires every partition that ends before the retention
+cutoff: DETACH + move into DATA_ARCHIVE_SCHEMA ("archive") or DETACH + DROP ("drop").
+Retiring a partition is a catalog operation, not a bulk DELETE.
+
+SQLite has no partitions, so old rows are deleted in DATA_PRUNE_BATCH_SIZE batches,
+after being copied into the attached DATA_ARCHIVE_SQLITE_PATH database in archive mode.
+
+The cutoff is the first day of the month DATA_RETENTION_MONTHS before the current
+one, so at least that many full months are always kept. DATA_RETENTION_MONTHS=0 only
+maintains partitions. The lifespan runs this every DATA_MAINTENANCE_INTERVAL_HOURS;
+scripts/manage_data_retention.py runs it once (e.g. from cron).
+"""
+import datetime
+import logging
+import re
+import threading
+
+from sqlalchemy import Connection, Engine, delete, func, insert, select, text
+from sqlalchemy import column as sa_column, table as sa_table
+
+from app.core import metrics
+from app.core.config import settings
+from app.database.session import engine
+from app.models import prompt as models
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = {
+    "prompt_history": models.PromptHistory.__table__,
+    "usage_analytics": models.UsageAnalytics.__table__,
+}
+RETENTION_MODES = ("archive", "drop")
+
+
+def _month_start(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+
+def _add_months(month: datetime.date, months: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def retention_cutoff(retention_months: int, today: datetime.date | None = None) -> datetime.date | None:
+    """First day kept by the retention policy, or None when retention is off."""
+    if retention_months <= 0:
+        return None
+    today = today or datetime.datetime.utcnow().date()
+    return _add_months(_month_start(today), -retention_months)
+
+
+# --- Postgres (partitioned) ---
+
+def _is_partitioned(conn: Connection, table: str) -> bool:
+    return bool(conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}
+    ).scalar())
+
+
+def monthly_partitions(conn: Connection, table: str) -> list[tuple[str, datetime.date]]:
+    """(partition name, month) for the monthly partitions of `table`, oldest first."""
+    names = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:t)
+    """), {"t": table}).scalars()
+    pattern = re.compile(rf"^{table}_p(\d{{4}})_(\d{{2}})$")
+    partitions = []
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            partitions.append((name, datetime.date(int(match[1]), int(match[2]), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def ensure_future_partitions(conn: Connection, table: str, months_ahead: int, today: datetime.date | None = None) -> int:
+    """Create any missing partition from this month to `months_ahead` months out. Returns how many were created."""
+    first = _month_start(today or datetime.datetime.utcnow().date())
+    return conn.execute(
+        text("SELECT promptboost_ensure_monthly_partitions(:t, :first, :last)"),
+        {"t": table, "first": first, "last": _add_months(first, months_ahead)},
+    ).scalar()
+
+
+def retire_partitions(conn: Connection, table: str, cutoff: datetime.date, mode: str, dry_run: bool = False) -> list[str]:
+    """Detach every partition that ends on or before `cutoff`, then archive or drop it."""
+    expired = [name for name, month in monthly_partitions(conn, table) if _add_months(month, 1) <= cutoff]
+    if dry_run or not expired:
+        return expired
+    quote = conn.dialect.identifier_preparer.quote
+    schema = quote(settings.DATA_ARCHIVE_SCHEMA)
+    if mode == "archive":
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+    for name in expired:
+        conn.execute(text(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}"))
+        if mode == "archive":
+            conn.execute(text(f"ALTER TABLE {quote(name)} SET SCHEMA {schema}"))
+        else:
+            conn.execute(text(f"DROP TABLE {quote(name)}"))
+        logger.info(f"Retired partition {name} ({mode})")
+    return expired
+
+
+# --- SQLite (row pruning) ---
+
+def prune_rows(conn: Connection, table: str, cutoff: datetime.date, mode: str, dry_run: bool = False) -> int:
+    """Delete rows created before `cutoff` in batches, copying them to the archive database first in archive mode."""
+    source = PARTITIONED_TABLES[table]
+    cutoff_at = datetime.datetime.combine(cutoff, datetime.time.min)
+    if dry_run:
+        return conn.execute(select(func.count()).select_from(source).where(source.c.created_at < cutoff_at)).scalar()
+
+    archived = None
+    if mode == "archive":
+        conn.execute(text("CREATE TABLE IF NOT EXISTS archive.{0} AS SELECT * FROM main.{0} WHERE 0".format(table)))
+        _add_missing_archive_columns(conn, table)
+        archived = sa_table(table, *(sa_column(c.name) for c in source.columns), schema="archive")
+
+    pruned = 0
+    while True:
+        ids = conn.scalars(
+            select(source.c.id).where(source.c.created_at < cutoff_at).order_by(source.c.id).limit(settings.DATA_PRUNE_BATCH_SIZE)
+        ).all()
+        if not ids:
+            return pruned
+        if archived is not None:
+            conn.execute(insert(archived).from_select([c.name for c in source.columns], select(source).where(source.c.id.in_(ids))))
+        conn.execute(delete(source).where(source.c.id.in_(ids)))
+        conn.commit()
+        pruned += len(ids)
+
+
+def _add_missing_archive_columns(conn: Connection, table: str) -> None:
+    """Columns added to the live table since the archive copy was created (e.g. model_version)."""
+    archived = {row[1] for row in conn.execute(text(f"PRAGMA archive.table_info({table})"))}
+    for row in conn.execute(text(f"PRAGMA main.table_info({table})")):
+        if row[1] not in archived:
+            conn.execute(text(f"ALTER TABLE archive.{table} ADD COLUMN {row[1]} {row[2]}"))
+
+
+def _attach_archive(conn: Connection) -> None:
+    attached = {row[1] for row in conn.execute(text("PRAGMA database_list"))}
+    if "archive" not in attached:
+        conn.execute(text("ATTACH DATABASE :path AS archive"), {"path": settings.DATA_ARCHIVE_SQLITE_PATH})
+
+
+def run_maintenance(
+    bind: Engine = engine,
+    retention_months: int | None = None,
+    mode: str | None = None,
+    months_ahead: int | None = None,
+    dry_run: bool = False,
+) -> dict[str, dict]:
+    """
+    One maintenance pass over both tables. Arguments default to the DATA_* / PARTITION_*
+    settings. Returns {"partitions_created": {table: n}, "partitions_retired": {table: [names]}, "rows_pruned": {table: n}}.
+    """
+    retention_months = settings.DATA_RETENTION_MONTHS if retention_months is None else retention_months
+    mode = mode or settings.DATA_RETENTION_MODE
+    months_ahead = settings.PARTITION_PREMAKE_MONTHS if months_ahead is None else months_ahead
+    if mode not in RETENTION_MODES:
+        raise ValueError(f"DATA_RETENTION_MODE must be one of {RETENTION_MODES}, got {mode!r}")
+    cutoff = retention_cutoff(retention_months)
+    report: dict[str, dict] = {"partitions_created": {}, "partitions_retired": {}, "rows_pruned": {}}
+
+    for table in PARTITIONED_TABLES:
+        # One transaction per table keeps the parent's lock short
+        with bind.connect() as conn:
+            if bind.dialect.name == "postgresql":
+                if not _is_partitioned(conn, table):
+                    logger.warning(f"{table} is not partitioned (run `alembic upgrade head`); skipping")
+                    continue
+                # Several app instances may run this at once; serialise per table
+                conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:t))"), {"t": table})
+                if not dry_run:
+                    report["partitions_created"][table] = ensure_future_partitions(conn, table, months_ahead)
+                if cutoff is not None:
+                    report["partitions_retired"][table] = retire_partitions(conn, table, cutoff, mode, dry_run=dry_run)
+                    if not dry_run:
+                        metrics.DATA_RETIRED.inc(len(report["partitions_retired"][table]), table=table, mode=mode)
+            elif cutoff is not None:
+                if mode == "archive" and not dry_run:
+                    _attach_archive(conn)
+                report["rows_pruned"][table] = prune_rows(conn, table, cutoff, mode, dry_run=dry_run)
+                if not dry_run:
+                    metrics.DATA_RETIRED.inc(report["rows_pruned"][table], table=table, mode=mode)
+            conn.commit()
+
+    logger.info("Data maintenance finished", extra={"cutoff": str(cutoff), "mode": mode, "dry_run": dry_run, **report})
+    return report
+
+
+class MaintenanceJob:
+    """Runs `run_maintenance` on a daemon thread at startup and then every `interval_hours`."""
+
+    def __init__(self, interval_hours: float):
+        self.interval = interval_hours * 3600
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                run_maintenance()
+                metrics.DATA_MAINTENANCE_RUNS.inc(result="ok")
+            except Exception as e:
+                metrics.DATA_MAINTENANCE_RUNS.inc(result="error")
+                logger.error(f"Data maintenance failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="data-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        # A pass in progress finishes on its own; don't hold shutdown hostage to it
+        self._thread.join(timeout=5)
+        self._thread = None
+
+
+maintenance_job = MaintenanceJob(settings.DATA_MAINTENANCE_INTERVAL_HOURS)
@@ -0,0 +1,122 @@
+"""
+Gemini embeddings for the project vector store (app/services/vector_db.py), and the
+offline MockEmbeddingFunction used when EMBEDDING_BACKEND=mock.
+
+Kept out of vector_db so that chromadb and google.genai are imported only when the
+store is initialized, not when the API modules are.
+"""
+import logging
+import time
+
+import chromadb
+import google.genai as genai
+
+from app.core import metrics, tracing
+from app.core.config import settings
+from app.services import mock_backends
+
+logger = logging.getLogger(__name__)
+
+
+class GeminiEmbeddingFunction(chromadb.EmbeddingFunction):
+    """
+    Custom embedding function for ChromaDB that uses Google's Gemini text-embedding-004.
+    """
+    def __init__(self, api_key: str):
+        if not api_key:
+            logger.warning("GOOGLE_API_KEY is not set. Vector sync/retrieval will fail.")
+        self._api_key = api_key
+        self._client = genai.Client(api_key=api_key) if api_key else None
+
+    def __call__(self, input: chromadb.Documents) -> chromadb.Embeddings:
+        """
+        Embed a list of text documents into vector representations using Gemini.
+        Uses batch embedding for efficiency, with exponential backoff on rate limits.
+        """
+        if not self._client:
+            raise ValueError("Google API key is missing. Cannot generate embeddings.")
+
+        all_embeddings = []
+        BATCH_SIZE = 20  # Conservative batch size for rate limiting
+        BATCH_DELAY = 6  # seconds between batches (respects 10 RPM free tier)
+        MAX_RETRIES = 5
+
+        for i, batch_start in enumerate(range(0, len(input), BATCH_SIZE)):
+            batch = input[batch_start:batch_start + BATCH_SIZE]
+            
+            # Add a polite delay between batches (except before the first one)
+            if i > 0:
+                time.sleep(BATCH_DELAY)
+            
+            for attempt in range(MAX_RETRIES):
+                started = time.perf_counter()
+                try:
+                    with tracing.start_span("embedding.batch", batch_size=len(batch), attempt=attempt + 1):
+                        response = self._client.models.embed_content(
+                            model="gemini-embedding-001",
+                            contents=list(batch),
+                            config={"task_type": "RETRIEVAL_DOCUMENT"}
+                        )
+                    metrics.EMBEDDING_LATENCY.observe(time.perf_counter() - started, outcome="success")
+                    for emb in response.embeddings:
+                        all_embeddings.append(emb.values)
+                    break  # success, move to next batch
+                except Exception as e:
+                    metrics.EMBEDDING_LATENCY.observe(time.perf_counter() - started, outcome="error")
+                    err_str = str(e)
+                    if "429" in err_str or "RESOURCE_EXHAUSTED" in err_str:
+                        wait_time = (2 ** attempt) * 10  # 10s, 20s, 40s, 80s, 160s
+                        logger.warning(f"Rate limit hit. Retrying in {wait_time}s (attempt {attempt+1}/{MAX_RETRIES})...")
+                        time.sleep(wait_time)
+                    else:
+                        raise
+            else:
+                raise RuntimeError(f"Embedding failed after {MAX_RETRIES} retries due to rate limiting.")
+
+        return all_embeddings
+
+
+class MockEmbeddingFunction(chromadb.EmbeddingFunction):
+    """
+    Deterministic, offline embeddings (EMBEDDING_BACKEND=mock, see mock_backends): each
+    word is hashed into one of MOCK_EMBEDDING_DIMENSIONS signed buckets and the vector
+    normalized, so texts sharing words are close. Each batch of 20 waits a sampled
+    MOCK_EMBEDDING_LATENCY_MS and may fail like the Gemini API (429s are retried with
+    the same backoff).
+    """
+    BATCH_SIZE = 20
+    MAX_RETRIES = 5
+
+    def __init__(self, dimensions: int | None = None):
+        self._dimensions = dimensions or settings.MOCK_EMBEDDING_DIMENSIONS
+        self._latency_ms = settings.MOCK_EMBEDDING_LATENCY_MS
+
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self._dimensions
+        for word in text.lower().split():
+            h = mock_backends.stable_hash(word)
+            vector[h % self._dimensions] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def __call__(self, input: chromadb.Documents) -> chromadb.Embeddings:
+        all_embeddings = []
+        for batch_start in range(0, len(input), self.BATCH_SIZE):
+            batch = input[batch_start:batch_start + self.BATCH_SIZE]
+            for attempt in range(self.MAX_RETRIES):
+                started = time.perf_counter()
+                time.sleep(mock_backends.sample_latency(self._latency_ms))
+                failure = mock_backends.injected_failure()
+                if failure is None:
+                    metrics.EMBEDDING_LATENCY.observe(time.perf_counter() - started, outcome="success")
+                    all_embeddings.extend(self._embed(text) for text in batch)
+                    break
+                metrics.EMBEDDING_LATENCY.observe(time.perf_counter() - started, outcome="error")
+                if failure.status_code != 429:
+                    raise failure
+                wait_time = (2 ** attempt) * 10
+                logger.warning(f"Rate limit hit (mock). Retrying in {wait_time}s (attempt {attempt+1}/{self.MAX_RETRIES})...")
+                time.sleep(wait_time)
+            else:
+                raise RuntimeError(f"Embedding failed after {self.MAX_RETRIES} retries due to rate limiting.")
+        return all_embeddings
@@ -0,0 +1,67 @@
+"""
+Latency tiers for /enhance: how much time and model a request may spend.
+
+A request picks a tier with `latency_tier` in the body (the desktop client sends the
+user's default or the one its trigger selected); without one DEFAULT_LATENCY_TIER
+applies. `policy(tier)` says what the request may do:
+
+    fast      trimmed template (no few-shot examples), at most FAST_TIER_MAX_TOKENS
+              output tokens, no retrieval, no quality retry
+    balanced  the full template on the primary client, no quality retry (the behavior
+              before tiers)
+    quality   QUALITY_TIER_MODEL, more retrieved snippets and recent prompts,
+              QUALITY_TIER_BEST_OF candidates of which the preference model keeps the best,
+              and one single-candidate retry when it scores low
+
+The tier is recorded on each usage_analytics row along with the request's latency,
+and analytics_daily_rollup / GET /stats report acceptance and mean latency per tier.
+"""
+from typing import NamedTuple
+
+from app.core.config import settings
+
+TIERS = ("fast", "balanced", "quality")
+
+
+class TierPolicy(NamedTuple):
+    model: str | None  # Groq model; None uses the primary client
+    max_tokens: int | None  # output-token cap; None leaves the provider default
+    trimmed_template: bool  # drop the few-shot examples from the prompt template
+    rag_results: int  # snippets retrieved from the project's vector store; 0 skips retrieval
+    recent_prompts: int  # recent prompts from this project included for continuity
+    quality_retries: int  # new attempts when the preference model scores below the threshold
+    best_of: int  # candidates generated concurrently on the first attempt (retries make one)
+
+
+def resolve(requested: str | None) -> str:
+    """The tier a request runs in: `requested` when it names one, else DEFAULT_LATENCY_TIER."""
+    if requested in TIERS:
+        return requested
+    return settings.DEFAULT_LATENCY_TIER if settings.DEFAULT_LATENCY_TIER in TIERS else "balanced"
+
+
+def policy(tier: str | None) -> TierPolicy:
+    tier = resolve(tier)
+    if tier == "fast":
+        return TierPolicy(
+            model=settings.FAST_TIER_MODEL,
+            max_tokens=settings.FAST_TIER_MAX_TOKENS,
+            trimmed_template=True,
+            rag_results=0,
+            recent_prompts=5,
+            quality_retries=0,
+            best_of=1,
+        )
+    if tier == "quality":
+        return TierPolicy(
+            model=settings.QUALITY_TIER_MODEL,
+            max_tokens=None,
+            trimmed_template=False,
+            rag_results=settings.QUALITY_TIER_RAG_RESULTS,
+            recent_prompts=10,
+            quality_retries=1,
+            best_of=max(settings.QUALITY_TIER_BEST_OF, 1),
+        )
+    return TierPolicy(
+        model=None, max_tokens=None, trimmed_template=False, rag_results=5, recent_prompts=5, quality_retries=0, best_of=1
+    )
@@ -1,62 +1,33 @@
 import os
-from langchain_groq import ChatGroq
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from typing import TYPE_CHECKING
 from app.core.config import settings
+from app.core import deadline, metrics, tracing
+from app.services import latency_tiers, prompt_classifier
+import asyncio
+import functools
 import logging
 import re
+import threading
+import time
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# The langchain provider packages take about a second to import, so they are loaded by
+# init_llms() (startup warm-up or first use) rather than when this module is imported.
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
 
-IMAGE_KEYWORDS = [
-    "image", "photo", "photograph", "picture", "render", "midjourney",
-    "stable diffusion", "dall", "ideogram", "illustration", "concept art",
-    "digital art", "artwork", "portrait", "landscape", "cinematic still",
-    "poster", "cover art", "oil painting", "watercolor", "3d render",
-    "anime", "pixel art", "sculpture", "studio shot", "macro shot",
-    "ultra realistic", "hdr", "4k", "8k"
-]
+logger = logging.getLogger(__name__)
 
 def is_image_prompt(user_prompt: str) -> bool:
     """Heuristically determine if the user is asking for an image-generation prompt."""
-    if not user_prompt:
-        return False
-    lowered = user_prompt.lower()
-    return any(keyword in lowered for keyword in IMAGE_KEYWORDS)
+    return prompt_classifier.classify(user_prompt).is_image
 
 def is_code(user_prompt):
     """Detects if the user input is likely raw code and should not be enhanced."""
-    code_indicators = [
-        r'^import\s+', r'^from\s+\w+\s+import', r'^def\s+\w+\s*\(', r'^class\s+\w+',
-        r'^\s*assert\s', r'^\s*@', r'^\s*if\s+.*:', r'^\s*return\s', r'^\s*async\s+def',
-    ]
-    lines = user_prompt.strip().split('\n')
-    if len(lines) > 3 and any(line.startswith(('    ', '\t')) for line in lines[1:]):
-        return True
-    code_line_count = 0
-    for line in lines[:10]:
-        for pattern in code_indicators:
-            if re.search(pattern, line.strip()):
-                code_line_count += 1
-                break
-    return code_line_count >= 2
+    return prompt_classifier.is_code(user_prompt)
 
 def detect_context(user_prompt):
     """Detects programming or creative context to assign a persona."""
-    if is_image_prompt(user_prompt):
-        return (
-            "Act as an award-winning visual prompt designer for Midjourney, "
-            "Stable Diffusion, DALL·E, Ideogram, and other generative image models."
-        )
-    if re.search(r'\b(python|pytest|fastapi|py)\b', user_prompt, re.IGNORECASE):
-        return "Act as a Senior Python Developer specializing in Test-Driven Development and FastAPI."
-    if re.search(r'\b(javascript|react|js|node|typescript|ts)\b', user_prompt, re.IGNORECASE):
-        return "Act as a Full-Stack JavaScript Developer experienced with the MERN stack and TypeScript."
-    if re.search(r'\b(stripe|payment|charge|checkout)\b', user_prompt, re.IGNORECASE):
-        return "Act as a Senior Backend Engineer experienced with e-commerce payment gateways."
-    return "Act as a Senior Software Engineer and AI expert."
+    return prompt_classifier.classify(user_prompt).persona
 
 ENHANCEMENT_PROMPT_TEMPLATE = """
 <INSTRUCTIONS>
@@ -160,29 +131,148 @@ Produce a DISTINCTLY DIFFERENT enhancement that:
 </CRITICAL_REROLL_INSTRUCTION>
 """
 
-try:
-    # Groq is now primary LLM
-    primary_llm = ChatGroq(
-        temperature=0.7,
-        groq_api_key=settings.GROQ_API_KEY,
-        model_name="llama-3.1-8b-instant"
+GROQ_MODEL = "llama-3.1-8b-instant"
+GEMINI_MODEL = "gemini-1.5-flash-latest"
+
+# Set by init_llms(); a model assigned here beforehand (e.g. a fake in tests) is kept
+primary_llm = None
+fallback_llm = None
+_llms_initialized = False
+_llms_lock = threading.Lock()
+
+
+def init_llms() -> None:
+    """
+    Create the Groq (primary) and Gemini (fallback) clients once, or their offline mocks
+    when LLM_BACKEND=mock; safe to call from any thread.
+    """
+    global primary_llm, fallback_llm, _llms_initialized
+    if _llms_initialized:
+        return
+    with _llms_lock:
+        if _llms_initialized:
+            return
+        if settings.LLM_BACKEND == "mock":
+            from app.services.mock_backends import MockChatModel
+
+            if primary_llm is None:
+                primary_llm = MockChatModel(provider="groq", model_name=GROQ_MODEL)
+            if fallback_llm is None:
+                fallback_llm = MockChatModel(provider="gemini", model_name=GEMINI_MODEL)
+            logger.info("Using mock LLM backends (LLM_BACKEND=mock).")
+            _llms_initialized = True
+            return
+        try:
+            from langchain_groq import ChatGroq
+
+            # Groq is now primary LLM
+            if primary_llm is None:
+                primary_llm = ChatGroq(
+                    temperature=0.7,
+                    groq_api_key=settings.GROQ_API_KEY,
+                    model_name=GROQ_MODEL
+                )
+            # Gemini as optional fallback (will be None if API key is invalid)
+            try:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+
+                if fallback_llm is None:
+                    fallback_llm = ChatGoogleGenerativeAI(
+                        model=GEMINI_MODEL,
+                        google_api_key=settings.GOOGLE_API_KEY,
+                        temperature=0.7
+                    )
+                logger.info("Successfully initialized Groq (Primary) and Gemini (Fallback) models.")
+            except Exception as gemini_error:
+                logger.warning(f"Gemini fallback initialization failed (will use Groq only): {gemini_error}")
+                fallback_llm = None
+                logger.info("Successfully initialized Groq (Primary) - Gemini fallback unavailable.")
+        except Exception as e:
+            logger.error(f"CRITICAL: Failed to initialize primary LLM (Groq): {e}")
+        _llms_initialized = True
+
+
+def _without_examples(body: str) -> str:
+    """The template minus its few-shot examples (the fast tier's trimmed template)."""
+    body = re.sub(r"<EXAMPLES>.*?</EXAMPLES>\n*|<EXAMPLE>.*?</EXAMPLE>\n*", "", body, flags=re.DOTALL)
+    return body.replace(" and imitate the examples perfectly", "")
+
+
+@functools.lru_cache(maxsize=None)
+def _prompt_template(is_image: bool, is_reroll: bool, trimmed: bool = False) -> "ChatPromptTemplate":
+    """Parsed ChatPromptTemplate for each of the prompt bodies, built once."""
+    from langchain_core.prompts import ChatPromptTemplate
+
+    body = IMAGE_PROMPT_TEMPLATE if is_image else ENHANCEMENT_PROMPT_TEMPLATE
+    if trimmed:
+        body = _without_examples(body)
+    if is_reroll:
+        body = body + REROLL_INSTRUCTION
+    return ChatPromptTemplate.from_template(body)
+
+
+def prepare_templates() -> None:
+    for is_image in (False, True):
+        for is_reroll in (False, True):
+            for trimmed in (False, True):
+                _prompt_template(is_image, is_reroll, trimmed)
+
+
+def _with_options(llm, **options):
+    """
+    A copy of `llm` with some fields changed (model, temperature, token cap). The copy
+    shares the original's HTTP client, so tiers and rerolls reuse its pooled connections.
+    """
+    options = {name: value for name, value in options.items() if value is not None}
+    if llm is None or not options:
+        return llm
+    return llm.model_copy(update=options)
+
+
+def _clients_for(policy: latency_tiers.TierPolicy, is_reroll: bool) -> tuple:
+    """(Groq, Gemini) clients for a request in this tier; rerolls run hotter for variety."""
+    groq = _with_options(
+        primary_llm, model_name=policy.model, max_tokens=policy.max_tokens, temperature=1.0 if is_reroll else None
     )
-    # Gemini as optional fallback (will be None if API key is invalid)
-    try:
-        fallback_llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash-latest",
-            google_api_key=settings.GOOGLE_API_KEY,
-            temperature=0.7
-        )
-        logger.info("Successfully initialized Groq (Primary) and Gemini (Fallback) models.")
-    except Exception as gemini_error:
-        logger.warning(f"Gemini fallback initialization failed (will use Groq only): {gemini_error}")
-        fallback_llm = None
-        logger.info("Successfully initialized Groq (Primary) - Gemini fallback unavailable.")
-except Exception as e:
-    logger.error(f"CRITICAL: Failed to initialize primary LLM (Groq): {e}")
-    primary_llm = None
-    fallback_llm = None
+    gemini = _with_options(
+        fallback_llm, max_output_tokens=policy.max_tokens, temperature=0.9 if is_reroll else None
+    )
+    return groq, gemini
+
+
+def is_error_output(text: str | None) -> bool:
+    """True for the messages get_enhanced_prompt returns instead of an enhancement."""
+    return text is None or text.startswith(("Error:", "Server configuration error:"))
+
+
+async def prime_connections() -> dict[str, str]:
+    """
+    Open an HTTP connection to each configured provider by listing its models (no
+    tokens are spent), so the first enhancement doesn't pay for DNS and TLS. Uses the
+    async clients that ainvoke uses, so must run on the server's event loop.
+    Returns {provider: "ok" | "skipped" | error message}.
+    """
+    init_llms()
+    groq_client = getattr(getattr(primary_llm, "async_client", None), "_client", None)
+    gemini_client = getattr(fallback_llm, "client", None)
+    probes = {
+        "groq": groq_client.models.list if groq_client is not None else None,
+        "gemini": (lambda: gemini_client.aio.models.list(config={"page_size": 1})) if gemini_client is not None else None,
+    }
+
+    async def _probe(provider, probe):
+        if probe is None:
+            return "skipped"
+        try:
+            await asyncio.wait_for(probe(), timeout=settings.WARMUP_PROBE_TIMEOUT_SECONDS)
+            return "ok"
+        except Exception as e:
+            # An auth error still leaves a pooled, TLS-established connection behind
+            logger.warning(f"Warm-up connection to {provider} failed: {e!r}")
+            return f"{type(e).__name__}: {e}"[:200]
+
+    outcomes = await asyncio.gather(*(_probe(provider, probe) for provider, probe in probes.items()))
+    return dict(zip(probes, outcomes))
 
 def clean_llm_output(raw_output: str) -> str:
     """Extract and clean the enhanced prompt from LLM output, removing XML tags and extra formatting."""
@@ -253,22 +343,81 @@ def _format_project_context_section(project_context: str | None) -> str:
     return "<PROJECT_CONTEXT>\n" + project_context.strip() + "\n</PROJECT_CONTEXT>\n\n"
 
 
-def get_enhanced_prompt(
+async def _invoke_with_metrics(
+    prompt_template: "ChatPromptTemplate", llm, template_vars: dict, provider: str, deadline_at: float | None = None
+) -> str:
+    """
+    Run one LLM attempt, recording per-provider latency/errors and a tracing span
+    with the model, temperature and token usage. The attempt is cancelled (TimeoutError)
+    when `deadline_at` passes.
+    """
+    model_name = getattr(llm, "model_name", None) or getattr(llm, "model", None)
+    with tracing.start_span(
+        "llm.attempt",
+        **{"llm.provider": provider, "llm.model": model_name, "llm.temperature": getattr(llm, "temperature", None)},
+    ) as span:
+        start = time.perf_counter()
+        try:
+            message = await asyncio.wait_for((prompt_template | llm).ainvoke(template_vars), timeout=deadline.timeout(deadline_at))
+        except asyncio.CancelledError:
+            # Request cancelled (client disconnect): the call is abandoned, not failed
+            metrics.LLM_REQUEST_LATENCY.observe(time.perf_counter() - start, provider=provider, outcome="cancelled")
+            metrics.LLM_CANCELLED.inc(provider=provider)
+            raise
+        except Exception:
+            metrics.LLM_REQUEST_LATENCY.observe(time.perf_counter() - start, provider=provider, outcome="error")
+            metrics.LLM_ERRORS.inc(provider=provider)
+            raise
+        elapsed = time.perf_counter() - start
+        metrics.LLM_REQUEST_LATENCY.observe(elapsed, provider=provider, outcome="success")
+        deadline.record_llm_latency(provider, elapsed)
+        usage = getattr(message, "usage_metadata", None) or {}
+        tracing.set_attributes(
+            span,
+            **{
+                "llm.input_tokens": usage.get("input_tokens"),
+                "llm.output_tokens": usage.get("output_tokens"),
+                "llm.total_tokens": usage.get("total_tokens"),
+            },
+        )
+        from langchain_core.output_parsers import StrOutputParser
+
+        return StrOutputParser().invoke(message)
+
+
+def _out_of_time(error: Exception, deadline_at: float | None) -> bool:
+    """An attempt that timed out because the request deadline passed (not a provider error)."""
+    return isinstance(error, asyncio.TimeoutError) and deadline.remaining(deadline_at) <= 0
+
+
+async def get_enhanced_prompt(
     user_prompt: str,
     is_reroll: bool = False,
     previous_enhancement: str | None = None,
     recent_prompts: list[tuple[str, str]] | None = None,
     project_context: str | None = None,
+    deadline_at: float | None = None,
+    classification: prompt_classifier.PromptClassification | None = None,
+    latency_tier: str | None = None,
 ) -> str | None:
+    """
+    Enhance with Groq, falling back to Gemini. Each attempt is bounded by `deadline_at`
+    (time.monotonic()); the fallback is skipped when the time left is below its expected
+    latency. None is returned only when an attempt timed out at the deadline or the
+    fallback was skipped (out of time), never on errors. `classification` is the request's
+    prompt_classifier result (computed here when not given). `latency_tier` selects the
+    model, output cap and template (latency_tiers.policy).
+    """
+    init_llms()
     if not primary_llm:
         return "Server configuration error: Primary LLM (Groq) not initialized."
 
-    persona = detect_context(user_prompt)
-    prompt_is_image = is_image_prompt(user_prompt)
-    logger.info(f"Detected persona: {persona}")
-    logger.info("Detected image prompt" if prompt_is_image else "Detected text/code prompt")
+    classification = classification or prompt_classifier.classify(user_prompt)
+    persona = classification.persona
+    prompt_is_image = classification.is_image
+    logger.debug(f"Detected persona: {persona}")
+    logger.debug("Detected image prompt" if prompt_is_image else "Detected text/code prompt")
 
-    prompt_body = IMAGE_PROMPT_TEMPLATE if prompt_is_image else ENHANCEMENT_PROMPT_TEMPLATE
     recent_prompts_section = _format_recent_prompts_section(recent_prompts)
     project_context_section = _format_project_context_section(project_context)
 
@@ -279,52 +428,50 @@ def get_enhanced_prompt(
         "project_context_section": project_context_section,
     }
 
+    policy = latency_tiers.policy(latency_tier)
     if is_reroll and previous_enhancement:
-        prompt_body = prompt_body + REROLL_INSTRUCTION
-        prompt_template = ChatPromptTemplate.from_template(prompt_body)
+        prompt_template = _prompt_template(prompt_is_image, True, policy.trimmed_template)
         template_vars = {**base_vars, "previous_enhancement": previous_enhancement}
     else:
-        prompt_template = ChatPromptTemplate.from_template(prompt_body)
+        prompt_template = _prompt_template(prompt_is_image, False, policy.trimmed_template)
         template_vars = base_vars
+    llm_to_use, fallback_llm_to_use = _clients_for(policy, is_reroll)
 
     try:
         logger.info(
             f"Attempting enhancement with Primary LLM (Groq)... {'(REROLL)' if is_reroll else ''} "
-            f"(recent_prompts={len(recent_prompts or [])}, project_context={bool(project_context)})"
+            f"(recent_prompts={len(recent_prompts or [])}, project_context={bool(project_context)}, "
+            f"tier={latency_tiers.resolve(latency_tier)})"
         )
-        llm_to_use = primary_llm
-        if is_reroll:
-            llm_to_use = ChatGroq(
-                temperature=1.0,
-                groq_api_key=settings.GROQ_API_KEY,
-                model_name="llama-3.1-8b-instant"
-            )
-        chain = prompt_template | llm_to_use | StrOutputParser()
-        raw_output = chain.invoke(template_vars)
+        raw_output = await _invoke_with_metrics(prompt_template, llm_to_use, template_vars, provider="groq", deadline_at=deadline_at)
         cleaned = clean_llm_output(raw_output)
-        logger.info(f"Raw output length: {len(raw_output)}, Cleaned length: {len(cleaned)}")
+        logger.debug(f"Raw output length: {len(raw_output)}, Cleaned length: {len(cleaned)}")
         return cleaned
     except Exception as e:
-        logger.warning(f"Primary LLM (Groq) failed: {e}.")
+        logger.warning(f"Primary LLM (Groq) failed: {e!r}.")
+        if _out_of_time(e, deadline_at):
+            # The deadline cancelled the attempt: out of time, whether or not Gemini is configured
+            deadline.shortcut("llm_primary", "timed_out")
+            return None
+        if fallback_llm and not deadline.can_afford(deadline_at, deadline.expected_llm_seconds("gemini")):
+            deadline.shortcut("llm_fallback", "skipped")
+            logger.warning("Not enough time left before the request deadline for the Gemini fallback.")
+            return None
         # Try fallback if available
         if fallback_llm:
             try:
                 logger.info(f"Attempting fallback with Gemini... {'(REROLL)' if is_reroll else ''}")
-                # Use higher temperature for rerolls
-                fallback_llm_to_use = fallback_llm
-                if is_reroll:
-                    fallback_llm_to_use = ChatGoogleGenerativeAI(
-                        model="gemini-1.5-flash-latest",
-                        google_api_key=settings.GOOGLE_API_KEY,
-                        temperature=0.9  # Higher temperature for rerolls
-                    )
-                chain = prompt_template | fallback_llm_to_use | StrOutputParser()
-                raw_output = chain.invoke(template_vars)
+                raw_output = await _invoke_with_metrics(
+                    prompt_template, fallback_llm_to_use, template_vars, provider="gemini", deadline_at=deadline_at
+                )
                 cleaned = clean_llm_output(raw_output)
-                logger.info(f"Raw output length: {len(raw_output)}, Cleaned length: {len(cleaned)}")
+                logger.debug(f"Raw output length: {len(raw_output)}, Cleaned length: {len(cleaned)}")
                 return cleaned
             except Exception as e2:
-                logger.error(f"Fallback LLM (Gemini) also failed: {e2}")
+                logger.error(f"Fallback LLM (Gemini) also failed: {e2!r}")
+                if _out_of_time(e2, deadline_at):
+                    deadline.shortcut("llm_fallback", "timed_out")
+                    return None
                 return "Error: All LLM services failed. Please check API keys and model availability."
         else:
             logger.error(f"No fallback LLM available. Groq error: {e}")
@@ -1,68 +1,370 @@
-import joblib
+"""
+Preference-model scoring for the quality filter.
+
+Artifacts are versioned: each training run writes ml_models/versions/<version>/ with the
+model, the vectorizer and metadata.json, then points ml_models/CURRENT at it. A version
+directory is complete before it is published (written under a temporary name, then
+renamed), and CURRENT is replaced atomically, so a reader never sees a half-written pair.
+The flat ml_models/*.joblib files from before versioning are loaded when CURRENT is missing.
+
+reload_ml_models() loads the new pair off the request path and rebinds `ml_artifacts`
+in one assignment; scoring that already holds the previous dict finishes with it.
+ModelWatcher polls CURRENT every ML_MODEL_WATCH_SECONDS, and POST /api/v1/admin/model/reload
+reloads (or rolls back to a given version) on demand.
+
+Each version may also carry compiled/ (see compiled_scorer.py): the same model as plain
+arrays, scored with NumPy. ML_SCORER_BACKEND picks "compiled", "joblib", or "auto"
+(compiled when present). scikit-learn and joblib are imported only on the joblib path,
+so a worker serving a compiled model never loads them.
+"""
+import datetime
+import json
 import os
 import logging
+import re
+import threading
 from pathlib import Path
+from typing import Sequence
+
+from app.core import metrics
+from app.core.config import settings
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 # Define where the trained model artifacts are located
 # This path is relative to the 'server' directory
 ARTIFACTS_DIR = Path(__file__).resolve().parent.parent / "ml_models"
-MODEL_PATH = ARTIFACTS_DIR / "preference_model.joblib"
-VECTORIZER_PATH = ARTIFACTS_DIR / "tfidf_vectorizer.joblib"
+VERSIONS_DIR = ARTIFACTS_DIR / "versions"
+CURRENT_POINTER = ARTIFACTS_DIR / "CURRENT"
+MODEL_FILENAME = "preference_model.joblib"
+VECTORIZER_FILENAME = "tfidf_vectorizer.joblib"
+METADATA_FILENAME = "metadata.json"
+COMPILED_DIRNAME = "compiled"
+SCORER_BACKENDS = ("auto", "compiled", "joblib")
+# Unversioned layout, used until the first versioned training run
+MODEL_PATH = ARTIFACTS_DIR / MODEL_FILENAME
+VECTORIZER_PATH = ARTIFACTS_DIR / VECTORIZER_FILENAME
+UNVERSIONED = "unversioned"
 
-# A dictionary to hold our loaded models in memory
+_VERSION_NAME = re.compile(r"^[\w.-]+$")
+
+# The loaded model and vectorizer (joblib backend) or scorer (compiled backend) with
+# their version. Never mutated in place: a reload builds a new dict and rebinds the
+# name, so read it once per scoring call.
 ml_artifacts = {
     "model": None,
-    "vectorizer": None
+    "vectorizer": None,
+    "scorer": None,
+    "version": None,
+    "metadata": {},
 }
+_reload_lock = threading.Lock()
+
+
+def current_version() -> str | None:
+    """The version CURRENT points at, or None when nothing has been published yet."""
+    try:
+        version = CURRENT_POINTER.read_text().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def loaded_model_version() -> str | None:
+    """Version of the model currently used for scoring (None if no model is loaded)."""
+    return ml_artifacts["version"]
+
+
+def _version_dir(version: str) -> Path:
+    if not _VERSION_NAME.match(version) or version.startswith("."):
+        raise ValueError(f"Invalid model version: {version!r}")
+    return VERSIONS_DIR / version
+
+
+def _artifact_dir(version: str | None) -> Path:
+    return ARTIFACTS_DIR if version is None else _version_dir(version)
+
+
+def _load_artifacts(version: str | None) -> dict:
+    directory = _artifact_dir(version)
+    model_path, vectorizer_path = directory / MODEL_FILENAME, directory / VECTORIZER_FILENAME
+    compiled_dir = directory / COMPILED_DIRNAME
+    metadata_path = directory / METADATA_FILENAME
+    metadata = json.loads(metadata_path.read_text()) if version is not None and metadata_path.exists() else {}
+    version = version or UNVERSIONED
+
+    backend = settings.ML_SCORER_BACKEND
+    if backend not in SCORER_BACKENDS:
+        raise ValueError(f"ML_SCORER_BACKEND must be one of {SCORER_BACKENDS}, got {backend!r}")
+    if backend == "compiled" or (backend == "auto" and compiled_dir.exists()):
+        if not compiled_dir.exists():
+            raise FileNotFoundError(f"No compiled scorer for version {version!r}")
+        from app.services.compiled_scorer import CompiledScorer  # numpy: loaded with the model, not at import
+
+        return {
+            "model": None,
+            "vectorizer": None,
+            "scorer": CompiledScorer.load(compiled_dir),
+            "version": version,
+            "metadata": metadata,
+        }
+
+    if not model_path.exists() or not vectorizer_path.exists():
+        raise FileNotFoundError(f"Model artifacts for version {version!r} not found")
+    import joblib
+
+    return {
+        "model": joblib.load(model_path),
+        "vectorizer": joblib.load(vectorizer_path),
+        "scorer": None,
+        "version": version,
+        "metadata": metadata,
+    }
+
 
 def load_ml_models():
     """
     Loads the ML model and vectorizer from disk into memory.
     This function is called once at server startup.
     """
-    logging.info("Attempting to load ML preference model...")
-    if not os.path.exists(MODEL_PATH) or not os.path.exists(VECTORIZER_PATH):
-        logging.warning("ML model or vectorizer file not found. The quality filter will be disabled. Run the training script to generate these files.")
+    global ml_artifacts
+    logger.info("Attempting to load ML preference model...")
+    version = current_version()
+    if version is None and not (ARTIFACTS_DIR / COMPILED_DIRNAME).exists() and (
+        not os.path.exists(MODEL_PATH) or not os.path.exists(VECTORIZER_PATH)
+    ):
+        logger.warning("ML model or vectorizer file not found. The quality filter will be disabled. Run the training script to generate these files.")
         return
 
     try:
-        ml_artifacts["model"] = joblib.load(MODEL_PATH)
-        ml_artifacts["vectorizer"] = joblib.load(VECTORIZER_PATH)
-        logging.info("Successfully loaded ML preference model and vectorizer.")
+        ml_artifacts = _load_artifacts(version)
+        backend = "compiled" if ml_artifacts["scorer"] is not None else "joblib"
+        logger.info(f"Successfully loaded ML preference model and vectorizer (version {ml_artifacts['version']}, {backend}).")
     except Exception as e:
-        logging.error(f"Failed to load ML artifacts: {e}")
+        logger.error(f"Failed to load ML artifacts: {e}")
         # Ensure they are reset on failure
-        ml_artifacts["model"] = None
-        ml_artifacts["vectorizer"] = None
+        ml_artifacts = {"model": None, "vectorizer": None, "scorer": None, "version": None, "metadata": {}}
+
+
+def reload_ml_models(version: str | None = None) -> dict:
+    """
+    Load `version` (default: whatever CURRENT points at) and swap it in. Passing a
+    version also repoints CURRENT at it, which is how a rollback is done. Scoring is
+    not blocked while the artifacts load; on failure the previous model stays active
+    and the error is raised.
+    """
+    global ml_artifacts
+    with _reload_lock:
+        previous = ml_artifacts["version"]
+        target = version or current_version()
+        if target is None and not MODEL_PATH.exists():
+            raise FileNotFoundError("No published model version to load")
+        if version is None and target == previous and (ml_artifacts["model"] is not None or ml_artifacts["scorer"] is not None):
+            return {"version": previous, "previous_version": previous, "reloaded": False}
+        try:
+            loaded = _load_artifacts(target)
+        except Exception:
+            metrics.ML_MODEL_RELOADS.inc(result="error")
+            raise
+        if version is not None:
+            activate_version(version)
+        ml_artifacts = loaded
+        metrics.ML_MODEL_RELOADS.inc(result="ok")
+        logger.info("Preference model swapped", extra={"model_version": loaded["version"], "previous_version": previous})
+        return {"version": loaded["version"], "previous_version": previous, "reloaded": True}
+
+
+def activate_version(version: str) -> None:
+    """Point CURRENT at `version` (atomic replace of the pointer file)."""
+    if not (_version_dir(version) / MODEL_FILENAME).exists():
+        raise FileNotFoundError(f"Model artifacts for version {version!r} not found")
+    tmp = CURRENT_POINTER.with_name(f".{CURRENT_POINTER.name}.{os.getpid()}.tmp")
+    tmp.write_text(version + "\n")
+    os.replace(tmp, CURRENT_POINTER)
+
+
+def save_model_version(model, vectorizer, metadata: dict, activate: bool = True) -> str:
+    """
+    Write a new artifact version, with its compiled scorer when the model supports one,
+    and (by default) make it CURRENT. Returns the version, a UTC timestamp such as
+    20261019T153000Z.
+    """
+    import joblib
+    from app.services.compiled_scorer import export_compiled
+
+    version = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    VERSIONS_DIR.mkdir(parents=True, exist_ok=True)
+    suffix = 1
+    while _version_dir(version).exists():  # two runs within the same second
+        suffix += 1
+        version = f"{version.split('.')[0]}.{suffix}"
+    staging = VERSIONS_DIR / f".{version}.tmp"
+    staging.mkdir()
+    joblib.dump(model, staging / MODEL_FILENAME)
+    joblib.dump(vectorizer, staging / VECTORIZER_FILENAME)
+    compiled = export_compiled(model, vectorizer, staging / COMPILED_DIRNAME)
+    metadata = {"version": version, **metadata, "compiled": compiled}
+    (staging / METADATA_FILENAME).write_text(json.dumps(metadata, indent=2, default=str))
+    staging.rename(_version_dir(version))
+    if activate:
+        activate_version(version)
+    return version
+
+
+def compile_version(version: str | None) -> bool:
+    """(Re)write compiled/ for an existing version (None: the unversioned files) from its joblib artifacts."""
+    import joblib
+    from app.services.compiled_scorer import export_compiled
+
+    directory = _artifact_dir(version)
+    model_path, vectorizer_path = directory / MODEL_FILENAME, directory / VECTORIZER_FILENAME
+    if not model_path.exists() or not vectorizer_path.exists():
+        raise FileNotFoundError(f"Model artifacts for version {version or UNVERSIONED!r} not found")
+    return export_compiled(joblib.load(model_path), joblib.load(vectorizer_path), directory / COMPILED_DIRNAME)
+
+
+def list_model_versions() -> list[dict]:
+    """Published versions, oldest first, with their metadata."""
+    if not VERSIONS_DIR.exists():
+        return []
+    versions = []
+    for directory in sorted(VERSIONS_DIR.iterdir()):
+        if directory.name.startswith(".") or not directory.is_dir():
+            continue
+        metadata_path = directory / METADATA_FILENAME
+        metadata = json.loads(metadata_path.read_text()) if metadata_path.exists() else {}
+        versions.append({**metadata, "version": directory.name})
+    return versions
+
+
+class ModelWatcher:
+    """Reloads the model on a daemon thread whenever CURRENT changes (polled every `interval` seconds)."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            version = current_version()
+            if version is None or version == ml_artifacts["version"]:
+                continue
+            try:
+                reload_ml_models()
+            except Exception as e:
+                logger.error(f"Failed to reload ML artifacts for version {version}: {e}")
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ml-model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+
+model_watcher = ModelWatcher(settings.ML_MODEL_WATCH_SECONDS)
+metrics.ML_MODEL_INFO.set_function(lambda: {(ml_artifacts["version"],): 1} if ml_artifacts["version"] else {})
 
 def predict_acceptance_probability(original_prompt: str, enhanced_prompt: str) -> float:
     """
     Predicts the probability that a user will 'accept' an enhancement.
     Returns a probability between 0.0 and 1.0.
     """
-    model = ml_artifacts.get("model")
-    vectorizer = ml_artifacts.get("vectorizer")
+    return predict_acceptance_probabilities(original_prompt, [enhanced_prompt])[0]
 
+
+def predict_acceptance_probabilities(original_prompt: str, enhanced_prompts: Sequence[str]) -> list[float]:
+    """
+    Score several candidate enhancements of one prompt with a single sparse transform
+    and a single predict_proba call (retries, best-of-N). The original prompt is
+    tokenized once and its term counts are added to every candidate's.
+    Returns one probability per candidate, in order.
+    """
+    artifacts = ml_artifacts  # one read: a concurrent reload can't mix model and vectorizer
+    model, vectorizer, scorer = artifacts["model"], artifacts["vectorizer"], artifacts["scorer"]
+    if not enhanced_prompts:
+        return []
     # If the model isn't loaded, default to a high probability (graceful degradation)
-    if model is None or vectorizer is None:
-        return 1.0
+    if scorer is None and (model is None or vectorizer is None):
+        return [1.0] * len(enhanced_prompts)
 
     try:
-        # Combine prompts to create the feature
-        text_feature = original_prompt + " " + enhanced_prompt
-        
-        # Transform the feature using the loaded vectorizer
-        vectorized_text = vectorizer.transform([text_feature])
-        
-        # Predict the probability. predict_proba returns [[P(reject), P(accept)]]
-        probability_of_acceptance = model.predict_proba(vectorized_text)[0][1]
-        
-        logging.info(f"Predicted acceptance probability: {probability_of_acceptance:.4f}")
-        return probability_of_acceptance
+        if scorer is not None:
+            return scorer.predict(original_prompt, enhanced_prompts)
+        if len(enhanced_prompts) > 1 and _counts_are_additive(vectorizer):
+            import numpy as np
+            import scipy.sparse as sp
+            from sklearn.feature_extraction.text import CountVectorizer
+
+            counts = CountVectorizer.transform(vectorizer, [original_prompt, *enhanced_prompts])
+            original_counts, candidate_counts = counts[0], counts[1:]
+            repeat = sp.csr_matrix(np.ones((candidate_counts.shape[0], 1)))
+            features = _tfidf_weight(vectorizer, candidate_counts + repeat @ original_counts)
+        else:
+            features = vectorizer.transform([original_prompt + " " + enhanced for enhanced in enhanced_prompts])
+        # predict_proba returns [[P(reject), P(accept)], ...]
+        return model.predict_proba(features)[:, 1].tolist()
     except Exception as e:
-        logging.error(f"Error during ML model prediction: {e}")
+        logger.error(f"Error during ML model prediction: {e}")
         # Default to a safe, high probability on failure
-        return 1.0
\ No newline at end of file
+        return [1.0] * len(enhanced_prompts)
+
+
+def predict_pair_probabilities(pairs: Sequence[tuple[str, str]]) -> list[float]:
+    """Score many (original, enhanced) pairs at once, e.g. offline re-scoring jobs."""
+    artifacts = ml_artifacts
+    model, vectorizer, scorer = artifacts["model"], artifacts["vectorizer"], artifacts["scorer"]
+    if not pairs:
+        return []
+    if scorer is None and (model is None or vectorizer is None):
+        return [1.0] * len(pairs)
+
+    try:
+        if scorer is not None:
+            return scorer.predict_pairs(pairs)
+        features = vectorizer.transform([original + " " + enhanced for original, enhanced in pairs])
+        return model.predict_proba(features)[:, 1].tolist()
+    except Exception as e:
+        logger.error(f"Error during ML model prediction: {e}")
+        return [1.0] * len(pairs)
+
+
+def _counts_are_additive(vectorizer) -> bool:
+    """
+    The model's feature is tfidf(original + " " + enhanced). With word unigrams the
+    counts of the joined text are the sum of the two texts' counts, so the original
+    can be counted once; n-grams would span the join, char analyzers the space.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    return (
+        isinstance(vectorizer, TfidfVectorizer)
+        and vectorizer.analyzer == "word"
+        and vectorizer.ngram_range == (1, 1)
+        and not vectorizer.binary
+    )
+
+
+def _tfidf_weight(vectorizer, counts):
+    """The TfidfTransformer step of vectorizer.transform, applied to precomputed counts."""
+    import numpy as np
+    import scipy.sparse as sp
+    from sklearn.preprocessing import normalize
+
+    features = counts.astype(np.float64)
+    if vectorizer.sublinear_tf:
+        np.log(features.data, features.data)
+        features.data += 1
+    if vectorizer.use_idf:
+        features = features @ sp.diags(vectorizer.idf_)
+    if vectorizer.norm:
+        features = normalize(features, norm=vectorizer.norm, copy=False)
+    return features
@@ -0,0 +1,161 @@
+"""
+Offline stand-ins for the LLM providers and the embedding API, for load tests and
+local profiling without Groq/Gemini keys or quota.
+
+LLM_BACKEND=mock makes llm_service.init_llms() use MockChatModel for both the primary
+and the fallback client; EMBEDDING_BACKEND=mock makes the vector store use
+embeddings.MockEmbeddingFunction. Both are deterministic in their output (the same
+prompt or text always gives the same enhancement or vector) and simulate the cost of a
+provider call:
+
+  - latency per call from MOCK_*_LATENCY_MS with MOCK_LATENCY_DISTRIBUTION: "lognormal"
+    (median, spread MOCK_LATENCY_SIGMA), "exponential" (mean), "uniform" (0 to twice
+    the value) or "constant";
+  - MOCK_RATE_LIMIT_RATE of calls fail with a 429 and MOCK_ERROR_RATE with a 500,
+    after the sampled latency, like a provider that answers with an error.
+
+Latency and failures are drawn from one random.Random seeded with MOCK_SEED, so a
+single-threaded run is reproducible.
+"""
+import asyncio
+import hashlib
+import random
+import re
+import threading
+import time
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.core.config import settings
+
+DISTRIBUTIONS = ("lognormal", "exponential", "uniform", "constant")
+
+_rng = random.Random(settings.MOCK_SEED)
+_rng_lock = threading.Lock()
+
+
+class MockProviderError(Exception):
+    """A simulated provider failure; `status_code` is 429 (rate limited) or 500."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Error code: {status_code} - {message}")
+        self.status_code = status_code
+
+
+def sample_latency(median_ms: float) -> float:
+    """Seconds for one simulated call, per MOCK_LATENCY_DISTRIBUTION."""
+    distribution = settings.MOCK_LATENCY_DISTRIBUTION
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"MOCK_LATENCY_DISTRIBUTION must be one of {DISTRIBUTIONS}")
+    with _rng_lock:
+        if distribution == "lognormal":
+            ms = median_ms * _rng.lognormvariate(0.0, settings.MOCK_LATENCY_SIGMA)
+        elif distribution == "exponential":
+            ms = _rng.expovariate(1.0 / median_ms) if median_ms > 0 else 0.0
+        elif distribution == "uniform":
+            ms = _rng.uniform(0.0, 2 * median_ms)
+        else:
+            ms = median_ms
+    return max(ms, 0.0) / 1000
+
+
+def injected_failure() -> MockProviderError | None:
+    """The failure to raise for this call, if the configured rates pick one."""
+    with _rng_lock:
+        roll = _rng.random()
+    if roll < settings.MOCK_RATE_LIMIT_RATE:
+        return MockProviderError(429, "rate limit exceeded (mock, RESOURCE_EXHAUSTED)")
+    if roll < settings.MOCK_RATE_LIMIT_RATE + settings.MOCK_ERROR_RATE:
+        return MockProviderError(500, "internal server error (mock)")
+    return None
+
+
+def stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+# The rendered template's final <TASK> block; the RULE text and few-shot examples before it
+# also mention <persona>/<user_prompt>, so the fields are only read inside this block
+_TASK_BLOCK = re.compile(r"<TASK>\s*<persona>(.*?)</persona>\s*<user_prompt>(.*?)</user_prompt>", re.DOTALL)
+_REQUIREMENTS = [
+    "State the inputs, outputs and edge cases explicitly.",
+    "Include error handling and input validation.",
+    "Add unit tests covering the main paths and one failure case.",
+    "Explain the design choices in a short summary at the end.",
+    "Keep the solution dependency-free unless a library is clearly better.",
+    "Use type hints and docstrings throughout.",
+    "Return the result as a single, complete, runnable file.",
+    "List any assumptions before the solution.",
+]
+
+
+def mock_enhancement(prompt_text: str, max_chars: int | None = None) -> str:
+    """
+    A plausible enhanced prompt for the rendered template `prompt_text`, built from the
+    <persona> and <user_prompt> of its final <TASK> block. Which requirements are listed
+    depends on a hash of the whole text, so a reroll (whose template includes the
+    rejected enhancement) gets a different answer.
+    """
+    fields = {}
+    tasks = _TASK_BLOCK.findall(prompt_text)
+    if tasks:
+        fields["persona"], fields["user_prompt"] = (value.strip() for value in tasks[-1])
+    digest = stable_hash(prompt_text)
+    count = 3 + digest % 3
+    picks = [_REQUIREMENTS[(digest >> (4 * i)) % len(_REQUIREMENTS)] for i in range(count)]
+    requirements = "\n".join(f"{i}. {line}" for i, line in enumerate(dict.fromkeys(picks), start=1))
+    text = (
+        f"{fields.get('persona', 'Act as a Senior Software Engineer.')} "
+        f"I need help with the following task: {fields.get('user_prompt', '')}\n\n"
+        f"**Requirements:**\n{requirements}"
+    )
+    if max_chars is not None:
+        text = text[:max_chars]
+    return f"<ENHANCED_PROMPT>\n{text}\n</ENHANCED_PROMPT>"
+
+
+class MockChatModel(BaseChatModel):
+    """
+    Chat model with the fields llm_service copies per tier/reroll (model_name,
+    temperature, max_tokens, max_output_tokens) and no network access.
+    """
+
+    provider: str = "groq"
+    model_name: str = "mock"
+    temperature: float = 0.7
+    max_tokens: int | None = None
+    max_output_tokens: int | None = None
+    latency_ms: float | None = None  # None uses MOCK_LLM_LATENCY_MS
+
+    @property
+    def _llm_type(self) -> str:
+        return "promptboost-mock"
+
+    def _result(self, messages: list[BaseMessage]) -> ChatResult:
+        prompt_text = "\n".join(str(m.content) for m in messages)
+        token_cap = self.max_tokens or self.max_output_tokens
+        content = mock_enhancement(prompt_text, max_chars=token_cap * 4 if token_cap else None)
+        usage = {"input_tokens": len(prompt_text) // 4, "output_tokens": len(content) // 4}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        message = AIMessage(content=content, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _delay(self) -> float:
+        return sample_latency(settings.MOCK_LLM_LATENCY_MS if self.latency_ms is None else self.latency_ms)
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay())
+        failure = injected_failure()
+        if failure is not None:
+            raise failure
+        return self._result(messages)
+
+    async def _agenerate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        failure = injected_failure()
+        if failure is not None:
+            raise failure
+        return self._result(messages)
@@ -0,0 +1,145 @@
+"""
+One-pass prompt classification: raw code or not, image prompt or not, and persona.
+
+Runs once per request (check_cache stores the result in GraphState["classification"])
+instead of is_code / is_image_prompt / detect_context each rescanning the prompt.
+
+Personas come from a JSON registry (personas.json next to this module, or
+PERSONA_REGISTRY_PATH), checked in order; the first one with a matching keyword wins,
+otherwise "default" applies:
+
+    {"default": "Act as ...",
+     "personas": [{"name": "python", "match": "word", "keywords": ["python", "py"],
+                   "persona": "Act as ...", "template": "image"?}, ...]}
+
+  - match "substring": the keyword occurs anywhere in the lower-cased prompt.
+  - match "word": the keyword occurs as a whole word (regex \\b...\\b, case-insensitive).
+    For ASCII prompts single-word keywords are looked up in the prompt's token set,
+    built once per prompt; multi-word keywords and non-ASCII prompts use one
+    precompiled alternation per persona.
+  - "template": "image" selects the image-generation prompt template.
+
+Code detection keeps the previous heuristic (indented continuation lines, or two of
+the first ten lines starting like Python code) with the indicators as one pattern.
+"""
+import functools
+import json
+import re
+import string
+from pathlib import Path
+from typing import NamedTuple
+
+from app.core.config import settings
+
+DEFAULT_REGISTRY_PATH = Path(__file__).with_name("personas.json")
+MATCH_MODES = ("substring", "word")
+
+_CODE_LINE = re.compile(
+    r"import\s+|from\s+\w+\s+import|def\s+\w+\s*\(|class\s+\w+|assert\s|@|if\s+.*:|return\s|async\s+def"
+)
+_WORD_CHARS = frozenset(string.ascii_letters + string.digits + "_")
+# ASCII non-word characters -> space, so str.split() yields the same tokens as \w+
+_TO_SPACES = str.maketrans({chr(i): " " for i in range(128) if chr(i) not in _WORD_CHARS})
+
+
+class PromptClassification(NamedTuple):
+    is_code: bool
+    is_image: bool
+    persona_name: str  # registry name, "default" when nothing matched
+    persona: str
+
+
+class _Persona:
+    def __init__(self, entry: dict):
+        for key in ("name", "match", "keywords", "persona"):
+            if key not in entry:
+                raise ValueError(f"Persona entry is missing {key!r}: {entry}")
+        if entry["match"] not in MATCH_MODES:
+            raise ValueError(f"Persona {entry['name']!r}: match must be one of {MATCH_MODES}")
+        self.name = entry["name"]
+        self.persona = entry["persona"]
+        self.is_image = entry.get("template") == "image"
+        self.substring = entry["match"] == "substring"
+        keywords = sorted({k.lower() for k in entry["keywords"] if k}, key=len)
+        if self.substring:
+            # A keyword containing a shorter one can never decide the outcome
+            self.keywords = [k for i, k in enumerate(keywords) if not any(s in k for s in keywords[:i])]
+        else:
+            self.words = frozenset(k for k in keywords if set(k) <= _WORD_CHARS)
+            phrases = [k for k in keywords if k not in self.words]
+            self.phrases = _word_pattern(phrases) if phrases else None
+            self.pattern = _word_pattern(keywords)
+
+    def matches(self, prompt: str, lowered: str, tokens: "_Tokens") -> bool:
+        if self.substring:
+            return any(keyword in lowered for keyword in self.keywords)
+        if not prompt.isascii():
+            return self.pattern.search(prompt) is not None
+        if not self.words.isdisjoint(tokens.get(lowered)):
+            return True
+        return self.phrases is not None and self.phrases.search(lowered) is not None
+
+
+def _word_pattern(keywords: list[str]) -> re.Pattern:
+    alternation = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternation})\b", re.IGNORECASE)
+
+
+class _Tokens:
+    """The prompt's set of ASCII words, built on first use (substring personas don't need it)."""
+
+    def __init__(self):
+        self._tokens: set[str] | None = None
+
+    def get(self, lowered: str) -> set[str]:
+        if self._tokens is None:
+            self._tokens = set(lowered.translate(_TO_SPACES).split())
+        return self._tokens
+
+
+class PromptClassifier:
+    def __init__(self, registry: dict):
+        self.default = registry["default"]
+        self.personas = [_Persona(entry) for entry in registry["personas"]]
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> "PromptClassifier":
+        return cls(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def persona_for(self, prompt: str) -> tuple[str, str, bool]:
+        """(name, persona text, is_image) of the first registry entry matching `prompt`."""
+        lowered = prompt.lower()
+        tokens = _Tokens()
+        for persona in self.personas:
+            if persona.matches(prompt, lowered, tokens):
+                return persona.name, persona.persona, persona.is_image
+        return "default", self.default, False
+
+    def classify(self, prompt: str) -> PromptClassification:
+        name, persona, is_image = self.persona_for(prompt or "")
+        return PromptClassification(is_code(prompt or ""), is_image, name, persona)
+
+
+def is_code(prompt: str) -> bool:
+    """Detects if the user input is likely raw code and should not be enhanced."""
+    text = prompt.strip()
+    # More than three lines with an indented line after the first
+    if text.count("\n") >= 3 and ("\n    " in text or "\n\t" in text):
+        return True
+    code_lines = 0
+    for line in text.split("\n", 10)[:10]:
+        if _CODE_LINE.match(line.strip()):
+            code_lines += 1
+            if code_lines >= 2:
+                return True
+    return False
+
+
+@functools.lru_cache(maxsize=None)
+def get_classifier() -> PromptClassifier:
+    """The classifier for PERSONA_REGISTRY_PATH (default: personas.json), loaded once."""
+    return PromptClassifier.from_file(settings.PERSONA_REGISTRY_PATH or DEFAULT_REGISTRY_PATH)
+
+
+def classify(prompt: str) -> PromptClassification:
+    return get_classifier().classify(prompt)
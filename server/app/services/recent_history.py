@@ -0,0 +1,102 @@
+"""
+In-process ring buffer of recent (original, enhanced) prompt pairs per (project, user).
+
+/enhance reads the last few pairs for continuity on every project-scoped request.
+This keeps them in memory: a miss loads them once from prompt_history (served by
+ix_prompt_history_project_user_created, bodies truncated in SQL), and save_results
+pushes each new pair into any buffer already cached for that key.
+
+Entries expire after RECENT_HISTORY_TTL_SECONDS so writes made by other instances
+show up; RECENT_HISTORY_CACHE_SIZE bounds the number of keys (LRU), 0 disables it.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.config import settings
+from app.crud import prompt_cache as crud
+from app.crud import prompt_cache_async as crud_async
+
+_Key = tuple[str, uuid.UUID | None]
+
+
+class RecentHistoryCache:
+    def __init__(self, max_keys: int, depth: int, ttl_seconds: float):
+        self.max_keys = max_keys
+        self.depth = depth
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[_Key, tuple[float, deque]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_keys > 0
+
+    def get(self, project_id: str, user_id: uuid.UUID | None) -> list[tuple[str, str]] | None:
+        """Cached pairs, newest first, or None on a miss/expired entry."""
+        key = (project_id, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            loaded_at, pairs = entry
+            if time.monotonic() - loaded_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return list(pairs)
+
+    def put(self, project_id: str, user_id: uuid.UUID | None, pairs: list[tuple[str, str]]) -> None:
+        key = (project_id, user_id)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), deque(pairs[: self.depth], maxlen=self.depth))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def record(self, project_id: str, user_id: uuid.UUID, original: str, enhanced: str) -> None:
+        """Push a newly saved pair into the buffers for this user and for the whole project, if cached."""
+        pair = (_preview(original), _preview(enhanced))
+        with self._lock:
+            for key in ((project_id, user_id), (project_id, None)):
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry[1].appendleft(pair)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def _preview(text: str) -> str:
+    # Same shape as the SQL-side truncation: one character past the limit marks "was truncated"
+    return text[: crud.RECENT_PROMPT_PREVIEW_CHARS + 1]
+
+
+recent_history = RecentHistoryCache(
+    max_keys=settings.RECENT_HISTORY_CACHE_SIZE,
+    depth=5,
+    ttl_seconds=settings.RECENT_HISTORY_TTL_SECONDS,
+)
+
+
+async def get_recent_prompts(
+    db: AsyncSession, project_id: str, user_id: uuid.UUID | None = None, limit: int = 5
+) -> list[tuple[str, str]]:
+    """Recent (original, enhanced) previews for the project, from memory when possible."""
+    if not recent_history.enabled or limit > recent_history.depth:
+        return await crud_async.get_recent_prompts_for_project(db, project_id=project_id, user_id=user_id, limit=limit)
+
+    cached = recent_history.get(project_id, user_id)
+    if cached is not None:
+        metrics.RECENT_HISTORY_LOOKUPS.inc(result="hit")
+        return cached[:limit]
+
+    metrics.RECENT_HISTORY_LOOKUPS.inc(result="miss")
+    pairs = await crud_async.get_recent_prompts_for_project(db, project_id=project_id, user_id=user_id, limit=recent_history.depth)
+    recent_history.put(project_id, user_id, pairs)
+    return pairs[:limit]
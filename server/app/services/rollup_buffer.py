@@ -0,0 +1,102 @@
+"""
+In-memory buffer for analytics_daily_rollup deltas from the request path.
+
+Every /enhance save and every feedback update moves a count in the same few rollup
+rows (today, strategy, group, tier, action). Upserting them inside each request's
+transaction makes concurrent writers queue on one row lock until commit, so the async
+CRUD layer hands its deltas to this buffer after committing, and they are applied in
+one upsert per flush:
+
+- with WRITE_BEHIND_ENABLED, by the write-behind thread after each of its flushes;
+- otherwise by a background thread here every ROLLUP_FLUSH_INTERVAL_MS.
+
+A failed flush keeps its deltas for the next one. Deltas still buffered when the
+process dies are lost; scripts/rebuild_analytics_rollup.py recomputes the rollup from
+usage_analytics. GET /stats flushes first so it reads this process's writes.
+"""
+import logging
+import threading
+from collections import Counter
+
+from app.core import metrics
+from app.core.config import settings
+from app.crud import prompt_cache as crud
+from app.crud.statements import RollupKey
+from app.database.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class RollupBuffer:
+    def __init__(self, flush_interval_ms: int, background: bool):
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.background = background
+        self._deltas: Counter = Counter()
+        self._latency: dict[RollupKey, tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        # Serialises flushes so deltas put back by a failed flush are not applied twice
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add(self, deltas: Counter, latency: dict[RollupKey, tuple[int, int]] | None = None) -> None:
+        with self._lock:
+            self._merge(deltas, latency or {})
+
+    def _merge(self, deltas: Counter, latency: dict[RollupKey, tuple[int, int]]) -> None:
+        self._deltas.update(deltas)
+        for key, (total, count) in latency.items():
+            previous_total, previous_count = self._latency.get(key, (0, 0))
+            self._latency[key] = (previous_total + total, previous_count + count)
+
+    def _take(self) -> tuple[Counter, dict[RollupKey, tuple[int, int]]]:
+        with self._lock:
+            deltas, latency = self._deltas, self._latency
+            self._deltas, self._latency = Counter(), {}
+        return deltas, latency
+
+    def flush(self) -> bool:
+        """Apply everything buffered in one transaction. Returns False if the write failed."""
+        with self._flush_lock:
+            deltas, latency = self._take()
+            if not any(deltas.values()) and not latency:
+                return True
+            db = SessionLocal()
+            try:
+                crud.apply_rollup_deltas(db, deltas, latency)
+                metrics.ROLLUP_FLUSHES.inc(result="ok")
+                return True
+            except Exception as e:
+                with self._lock:
+                    self._merge(deltas, latency)
+                metrics.ROLLUP_FLUSHES.inc(result="error")
+                logger.error(f"Rollup flush of {len(deltas)} buckets failed; retrying on the next flush: {e}")
+                return False
+            finally:
+                db.close()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self) -> None:
+        if not self.background or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rollup-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread (if any) and apply what is left."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+rollup_buffer = RollupBuffer(
+    flush_interval_ms=settings.ROLLUP_FLUSH_INTERVAL_MS,
+    # The write-behind thread flushes the buffer when it runs
+    background=not settings.WRITE_BEHIND_ENABLED,
+)
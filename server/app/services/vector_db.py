@@ -1,95 +1,76 @@
+import logging
 import os
-import chromadb
-from chromadb.config import Settings
-import google.genai as genai
+import threading
 from typing import List, Dict
 
+from app.core import metrics, tracing
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
 from dotenv import load_dotenv
 load_dotenv()
 
 # Make sure GOOGLE_API_KEY is available in the environment
 API_KEY = os.environ.get("GOOGLE_API_KEY")
 
-class GeminiEmbeddingFunction(chromadb.EmbeddingFunction):
-    """
-    Custom embedding function for ChromaDB that uses Google's Gemini text-embedding-004.
-    """
-    def __init__(self, api_key: str):
-        if not api_key:
-            print("WARNING: GOOGLE_API_KEY is not set. Vector sync/retrieval will fail.")
-        self._api_key = api_key
-        self._client = genai.Client(api_key=api_key) if api_key else None
-
-    def __call__(self, input: chromadb.Documents) -> chromadb.Embeddings:
-        """
-        Embed a list of text documents into vector representations using Gemini.
-        Uses batch embedding for efficiency, with exponential backoff on rate limits.
-        """
-        if not self._client:
-            raise ValueError("Google API key is missing. Cannot generate embeddings.")
-
-        import time
-        all_embeddings = []
-        BATCH_SIZE = 20  # Conservative batch size for rate limiting
-        BATCH_DELAY = 6  # seconds between batches (respects 10 RPM free tier)
-        MAX_RETRIES = 5
-
-        for i, batch_start in enumerate(range(0, len(input), BATCH_SIZE)):
-            batch = input[batch_start:batch_start + BATCH_SIZE]
-            
-            # Add a polite delay between batches (except before the first one)
-            if i > 0:
-                time.sleep(BATCH_DELAY)
-            
-            for attempt in range(MAX_RETRIES):
-                try:
-                    response = self._client.models.embed_content(
-                        model="gemini-embedding-001",
-                        contents=list(batch),
-                        config={"task_type": "RETRIEVAL_DOCUMENT"}
-                    )
-                    for emb in response.embeddings:
-                        all_embeddings.append(emb.values)
-                    break  # success, move to next batch
-                except Exception as e:
-                    err_str = str(e)
-                    if "429" in err_str or "RESOURCE_EXHAUSTED" in err_str:
-                        wait_time = (2 ** attempt) * 10  # 10s, 20s, 40s, 80s, 160s
-                        print(f"Rate limit hit. Retrying in {wait_time}s (attempt {attempt+1}/{MAX_RETRIES})...")
-                        time.sleep(wait_time)
-                    else:
-                        raise
-            else:
-                raise RuntimeError(f"Embedding failed after {MAX_RETRIES} retries due to rate limiting.")
-
-        return all_embeddings
-
 class VectorDBService:
     def __init__(self):
         self.client = None
         self.embedding_function = None
         self.collection_name = "promptboost_projects"
-        self._initialize()
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def initialize(self):
+        """
+        Initialize local ChromaDB client and the embedding function (Gemini, or the offline
+        mock with EMBEDDING_BACKEND=mock). Runs once, from the startup warm-up or on first
+        use; chromadb and google.genai are only imported here.
+        """
+        if self._initialized:
+            return
+        with self._init_lock:
+            if not self._initialized:
+                self._initialize()
+                self._initialized = True
 
     def _initialize(self):
-        """Initialize local ChromaDB client and Gemini embedding function."""
         try:
-            # Persistent storage in the server directory
-            persist_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chroma_data")
+            import chromadb
+            from app.services.embeddings import GeminiEmbeddingFunction, MockEmbeddingFunction
+
+            # Persistent storage in the server directory unless CHROMA_PERSIST_DIRECTORY says otherwise
+            persist_directory = settings.CHROMA_PERSIST_DIRECTORY or os.path.join(
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chroma_data"
+            )
             os.makedirs(persist_directory, exist_ok=True)
             
             self.client = chromadb.PersistentClient(path=persist_directory)
-            if API_KEY:
+            if settings.EMBEDDING_BACKEND == "mock":
+                self.embedding_function = MockEmbeddingFunction()
+            elif API_KEY:
                 self.embedding_function = GeminiEmbeddingFunction(api_key=API_KEY)
-            print("✅ Vector DB Service initialized successfully.")
+            logger.info("Vector DB Service initialized successfully.")
         except Exception as e:
-            import traceback
-            print(f"❌ Failed to initialize Vector DB: {e}")
-            traceback.print_exc()
+            logger.exception(f"Failed to initialize Vector DB: {e}")
 
     def is_ready(self) -> bool:
+        self.initialize()
         return self.client is not None and self.embedding_function is not None
 
+    def warm_up(self) -> str:
+        """Open the collection and embed one short text, so the first query pays for neither."""
+        if not self.is_ready():
+            return "skipped"
+        collection = self.client.get_or_create_collection(
+            name=self.collection_name,
+            embedding_function=self.embedding_function
+        )
+        collection.count()
+        self.embedding_function(["warm up"])
+        return "ok"
+
     def upsert_project_documents(self, project_id: str, documents: List[str], metadatas: List[Dict], ids: List[str]):
         """
         Wipes existing project vectors and replaces them with a fresh sync.
@@ -120,14 +101,14 @@ class VectorDBService:
             metadatas=metadatas,
             ids=ids
         )
-        print(f"Successfully synced {len(documents)} chunks for project {project_id}.")
+        logger.info(f"Successfully synced {len(documents)} chunks for project {project_id}.")
 
     def query_project_context(self, project_id: str, query_text: str, n_results: int = 5) -> str:
         """
         Retrieve the top N most relevant code chunks for a specific prompt.
         """
         if not self.is_ready():
-            print("Vector DB missing or API key absent. Skipping RAG.")
+            logger.debug("Vector DB missing or API key absent. Skipping RAG.")
             return ""
             
         try:
@@ -136,11 +117,12 @@ class VectorDBService:
                 embedding_function=self.embedding_function
             )
             
-            results = collection.query(
-                query_texts=[query_text],
-                n_results=n_results,
-                where={"project_id": project_id} # Critical: only search within this project
-            )
+            with metrics.VECTOR_QUERY_LATENCY.time(), tracing.start_span("chroma.query", project_id=project_id, n_results=n_results):
+                results = collection.query(
+                    query_texts=[query_text],
+                    n_results=n_results,
+                    where={"project_id": project_id} # Critical: only search within this project
+                )
             
             if not results['documents'] or not results['documents'][0]:
                 return ""
@@ -154,7 +136,7 @@ class VectorDBService:
             return "\n\n".join(context_parts)
             
         except Exception as e:
-            print(f"Error querying Vector DB: {e}")
+            logger.error(f"Error querying Vector DB: {e}")
             return ""
 
 # Global singleton instance to be imported by endpoints
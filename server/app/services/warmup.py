@@ -0,0 +1,165 @@
+"""
+Deferred initialization and cache priming for the server.
+
+The API modules don't build anything expensive at import time: the LLM clients
+(llm_service.init_llms), the compiled LangGraph (enhance_graph.get_enhancement_graph),
+the Chroma client (vector_db.initialize) and the preference model are each created on
+first use. The lifespan starts `warmup` instead, a task that runs STEPS in order after
+startup returns, so uvicorn binds the port (and GET / answers) within about a second
+while the imports, loads and the first network round-trips happen in the background:
+
+    ml_models          load the preference model, start the watcher, score a dummy pair
+    llm_clients        create the clients, parse the prompt templates, load the persona registry
+    enhancement_graph  compile the graph
+    vector_db          open Chroma, touch the collection, embed one short text
+    llm_connections    open a pooled connection to each provider (a models listing)
+
+Blocking steps run in a worker thread; the network probes are bounded by
+WARMUP_PROBE_TIMEOUT_SECONDS. A failed step is reported in `status()` and logged, and
+only a missing primary LLM keeps the server from being ready.
+Each step is idempotent. A request that arrives before a step has run initializes the
+LLM clients, graph or Chroma client itself; until the preference model is loaded,
+quality scoring degrades to its "accept" default.
+
+GET /ready (liveness stays on GET /) is 200 once every step has run and the primary
+LLM is available, 503 with the per-step `status()` before that.
+"""
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Any, Callable, NamedTuple
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _load_ml_models() -> str:
+    from app.services import ml_inference_service
+
+    ml_inference_service.load_ml_models()
+    # Started after the first load so the watcher doesn't race it with a reload
+    ml_inference_service.model_watcher.start()
+    # Pages in the model (or the memory-mapped compiled arrays) and the scoring code path
+    ml_inference_service.predict_acceptance_probability("warm up", "warm up the scorer")
+    return ml_inference_service.loaded_model_version() or "no model"
+
+
+def _init_llms() -> str:
+    from app.services import llm_service, prompt_classifier
+
+    llm_service.init_llms()
+    llm_service.prepare_templates()
+    prompt_classifier.get_classifier()
+    return "ok" if llm_service.primary_llm is not None else "primary LLM unavailable"
+
+
+def _compile_graph() -> None:
+    from app.graphs.enhance_graph import get_enhancement_graph
+
+    get_enhancement_graph()
+
+
+def _init_vector_db() -> str:
+    from app.services.vector_db import vector_db
+
+    vector_db.initialize()
+    return vector_db.warm_up()
+
+
+async def _prime_llm_connections() -> dict[str, str]:
+    from app.services import llm_service
+
+    return await llm_service.prime_connections()
+
+
+class Step(NamedTuple):
+    run: Callable[[], Any]  # sync (run in a thread) or async
+    probe: bool = False  # network probe, bounded by WARMUP_PROBE_TIMEOUT_SECONDS
+
+
+STEPS: dict[str, Step] = {
+    "ml_models": Step(_load_ml_models),
+    "llm_clients": Step(_init_llms),
+    "enhancement_graph": Step(_compile_graph),
+    "vector_db": Step(_init_vector_db, probe=True),
+    "llm_connections": Step(_prime_llm_connections, probe=True),
+}
+
+
+class Warmup:
+    """Runs STEPS once, in order, as a task on the server's event loop."""
+
+    def __init__(self, steps: dict[str, Step]):
+        self.steps = steps
+        self._status: dict[str, dict] = {name: {"state": "pending"} for name in steps}
+        self._finished = False
+        self._task: asyncio.Task | None = None
+
+    async def _run_step(self, step: Step):
+        if asyncio.iscoroutinefunction(step.run):
+            work = step.run()
+        else:
+            work = asyncio.to_thread(step.run)
+        if step.probe:
+            # On timeout a thread-based probe finishes in the background; we stop waiting
+            return await asyncio.wait_for(work, timeout=settings.WARMUP_PROBE_TIMEOUT_SECONDS)
+        return await work
+
+    async def run(self) -> None:
+        # numpy's first import is not thread-safe: two threads importing it at once (a step
+        # loading chromadb while a request loads the scorer) fail with "partially initialized
+        # module". Import it here, on the loop thread, before any worker thread can.
+        import numpy  # noqa: F401
+
+        for name, step in self.steps.items():
+            self._status[name] = {"state": "running"}
+            started = time.perf_counter()
+            detail = None
+            try:
+                detail = await self._run_step(step)
+                state = "ok"
+            except asyncio.TimeoutError:
+                state = "timeout"
+                logger.warning(f"Warm-up step {name} timed out")
+            except Exception as e:
+                state = "error"
+                detail = f"{type(e).__name__}: {e}"[:200]
+                logger.error(f"Warm-up step {name} failed: {e}")
+            seconds = time.perf_counter() - started
+            metrics.STARTUP_WARMUP_SECONDS.set(seconds, step=name, result=state)
+            self._status[name] = {"state": state, "seconds": round(seconds, 3)}
+            if detail is not None:
+                self._status[name]["detail"] = detail
+        self._finished = True
+        logger.info("Warm-up finished", extra={"steps": self.status()})
+
+    def start(self) -> None:
+        """Schedule the warm-up on the running loop (call from the lifespan)."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run(), name="startup-warmup")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    def finished(self) -> bool:
+        return self._finished
+
+    def ready(self) -> bool:
+        """Every step has run and the primary LLM exists, i.e. /enhance can do real work."""
+        from app.services import llm_service
+
+        return self.finished() and llm_service.primary_llm is not None
+
+    def status(self) -> dict[str, dict]:
+        return {name: dict(step) for name, step in self._status.items()}
+
+
+warmup = Warmup(STEPS)
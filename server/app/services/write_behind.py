@@ -0,0 +1,172 @@
+"""
+Write-behind buffer for non-critical inserts (prompt_history, usage_analytics).
+
+When WRITE_BEHIND_ENABLED is set, save_results commits only the prompt_cache upsert
+on the response path and hands the history/analytics rows to this buffer. A
+background thread flushes them in bulk (executemany) every
+WRITE_BEHIND_FLUSH_INTERVAL_MS or as soon as WRITE_BEHIND_BATCH_SIZE rows are
+waiting. The queue is bounded: when it is full `submit` returns False and the
+caller writes synchronously instead, so nothing is dropped under load.
+
+Read-your-writes: /feedback calls `flush_if_pending(session_id)` before looking
+up the analytics row, which forces a synchronous flush when that session's row is
+still buffered in this process. The FastAPI lifespan drains the buffer on shutdown.
+
+The same thread applies the rollup deltas buffered by services.rollup_buffer after
+each flush, so the rollup rows have a single writer.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+from app.core import metrics
+from app.core.config import settings
+from app.crud import prompt_cache as crud
+from app.database.session import SessionLocal
+from app.services.rollup_buffer import rollup_buffer
+
+logger = logging.getLogger(__name__)
+
+# (table, row values) where table is "history" or "analytics"
+_Item = tuple[str, dict]
+
+
+class WriteBehindBuffer:
+    def __init__(self, max_queue: int, batch_size: int, flush_interval_ms: int, enabled: bool):
+        self.enabled = enabled
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._items: deque[_Item] = deque()
+        self._pending_sessions: dict[uuid.UUID, int] = {}
+        self._cond = threading.Condition()
+        # Serialises flushes so a forced flush waits for an in-flight background one.
+        self._flush_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+
+    # --- producer side ---
+
+    def submit(self, history: dict | None, analytics: dict) -> bool:
+        """Queue the rows for one enhancement. Returns False if the buffer is off or full."""
+        if not self.enabled or self._thread is None:
+            return False
+        items = [("analytics", analytics)]
+        if history is not None:
+            items.append(("history", history))
+        with self._cond:
+            if len(self._items) + len(items) > self.max_queue:
+                metrics.WRITE_BEHIND_OVERFLOWS.inc()
+                return False
+            self._items.extend(items)
+            session_id = analytics.get("session_id")
+            if session_id is not None:
+                self._pending_sessions[session_id] = self._pending_sessions.get(session_id, 0) + 1
+            if len(self._items) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def has_pending_session(self, *session_ids: uuid.UUID) -> bool:
+        with self._cond:
+            return any(session_id in self._pending_sessions for session_id in session_ids)
+
+    def flush_if_pending(self, *session_ids: uuid.UUID) -> None:
+        """Make buffered analytics rows for any of `session_ids` visible in the database."""
+        if self.enabled and self.has_pending_session(*session_ids):
+            self.flush()
+
+    # --- flushing ---
+
+    def _take_batch(self) -> list[_Item]:
+        with self._cond:
+            count = min(len(self._items), self.batch_size)
+            return [self._items.popleft() for _ in range(count)]
+
+    def _release_sessions(self, batch: list[_Item]) -> None:
+        with self._cond:
+            for table, row in batch:
+                session_id = row.get("session_id")
+                if table != "analytics" or session_id not in self._pending_sessions:
+                    continue
+                self._pending_sessions[session_id] -= 1
+                if self._pending_sessions[session_id] <= 0:
+                    del self._pending_sessions[session_id]
+
+    def flush(self) -> int:
+        """Write everything currently queued. Returns the number of rows written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                self._write_batch(batch)
+                self._release_sessions(batch)
+                written += len(batch)
+        return written
+
+    def _write_batch(self, batch: list[_Item]) -> None:
+        history_rows = [row for table, row in batch if table == "history"]
+        analytics_rows = [row for table, row in batch if table == "analytics"]
+        start = time.perf_counter()
+        db = SessionLocal()
+        try:
+            crud.bulk_insert_enhancement_rows(db, history_rows, analytics_rows)
+            metrics.WRITE_BEHIND_FLUSHED_ROWS.inc(len(batch))
+        except Exception as e:
+            # The rows are lost for analytics purposes, but the response path already succeeded.
+            metrics.WRITE_BEHIND_FAILED_ROWS.inc(len(batch))
+            logger.error(f"Write-behind flush of {len(batch)} rows failed: {e}")
+        finally:
+            db.close()
+            metrics.WRITE_BEHIND_FLUSH_LATENCY.observe(time.perf_counter() - start)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._items) < self.batch_size:
+                    self._cond.wait(timeout=self.flush_interval)
+                stopping = self._stopping
+            self.flush()
+            rollup_buffer.flush()
+            if stopping:
+                return
+
+    # --- lifecycle ---
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Write-behind buffer started (batch_size={self.batch_size}, "
+            f"flush_interval_ms={int(self.flush_interval * 1000)}, max_queue={self.max_queue})"
+        )
+
+    def stop(self) -> None:
+        """Stop accepting rows and drain everything queued."""
+        if self._thread is None:
+            return
+        thread, self._thread = self._thread, None
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        thread.join()
+        self.flush()
+        logger.info("Write-behind buffer drained and stopped.")
+
+    def depth(self) -> int:
+        return len(self._items)
+
+
+write_buffer = WriteBehindBuffer(
+    max_queue=settings.WRITE_BEHIND_MAX_QUEUE,
+    batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+    flush_interval_ms=settings.WRITE_BEHIND_FLUSH_INTERVAL_MS,
+    enabled=settings.WRITE_BEHIND_ENABLED,
+)
+metrics.WRITE_BEHIND_QUEUE_DEPTH.set_function(lambda: {(): write_buffer.depth()})
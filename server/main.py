@@ -1,19 +1,50 @@
-from fastapi import FastAPI
+import logging
+import uuid
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
-from app.api.v1 import enhance as enhance_api, feedback as feedback_api, project as project_api
+from app.core.logging_config import setup_logging, shutdown_logging, request_id_var
+
+# Install the queue-based JSON logger before any app module logs at import time
+setup_logging()
+logger = logging.getLogger(__name__)
+
+from app.api.v1 import enhance as enhance_api, feedback as feedback_api, project as project_api, stats as stats_api, admin as admin_api
 from app.core.config import settings
+from app.core import metrics, tracing
 from app.services import ml_inference_service # <-- Import our new service
+from app.services.warmup import warmup
+from app.services.rollup_buffer import rollup_buffer
+from app.services.write_behind import write_buffer
+from app.services.data_retention import maintenance_job
+from app.database.session import async_engine, async_read_engine
 
 # --- NEW: Use FastAPI's modern lifespan event handler ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # This code runs on startup
-    print("--- Server Starting Up ---")
-    ml_inference_service.load_ml_models()
+    setup_logging()
+    logger.info("Server starting up")
+    tracing.setup_tracing()
+    write_buffer.start()
+    rollup_buffer.start()
+    maintenance_job.start()
+    # ML models, LLM clients, the graph and Chroma load in the background once the port is bound
+    warmup.start()
     yield
     # This code runs on shutdown
-    print("--- Server Shutting Down ---")
+    logger.info("Server shutting down")
+    await warmup.stop()
+    maintenance_job.stop()
+    ml_inference_service.model_watcher.stop()
+    write_buffer.stop()
+    rollup_buffer.stop()
+    await async_engine.dispose()
+    if async_read_engine is not None:
+        await async_read_engine.dispose()
+    tracing.shutdown_tracing()
+    shutdown_logging()
 
 
 # Pass the lifespan manager to the FastAPI app
@@ -34,12 +65,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Correlation id for every request: honour an incoming X-Request-ID, otherwise mint one.
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
 # Routers (unchanged)
 app.include_router(enhance_api.router, prefix="/api/v1", tags=["enhancement"])
 app.include_router(feedback_api.router, prefix="/api/v1", tags=["feedback"])
 app.include_router(project_api.router, prefix="/api/v1", tags=["project"])
+app.include_router(stats_api.router, prefix="/api/v1", tags=["stats"])
+app.include_router(admin_api.router, prefix="/api/v1", tags=["admin"])
 
 # Health Check (unchanged)
 @app.get("/", tags=["Health Check"])
 def read_root():
-    return {"status": "ok", "message": f"Welcome to {settings.PROJECT_NAME}"}
\ No newline at end of file
+    return {"status": "ok", "message": f"Welcome to {settings.PROJECT_NAME}"}
+
+
+# Readiness: 503 until the startup warm-up has loaded and primed everything (see app/services/warmup.py)
+@app.get("/ready", tags=["Health Check"])
+def read_ready():
+    ready = warmup.ready()
+    body = {"status": "ready" if ready else "warming_up", "steps": warmup.status()}
+    if ready:
+        return body
+    return JSONResponse(body, status_code=503, headers={"Retry-After": "2"})
+
+
+# Prometheus scrape target (in-process registry, no external service)
+@app.get("/metrics", tags=["Monitoring"], response_class=PlainTextResponse)
+def read_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
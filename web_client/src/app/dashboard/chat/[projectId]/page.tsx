@@ -13,6 +13,14 @@ interface Message {
     isReroll?: boolean
 }
 
+type LatencyTier = 'fast' | 'balanced' | 'quality'
+
+const LATENCY_TIERS: { value: LatencyTier; label: string; hint: string }[] = [
+    { value: 'fast', label: 'Fast', hint: 'Short template, capped output, no repository context' },
+    { value: 'balanced', label: 'Balanced', hint: 'Default' },
+    { value: 'quality', label: 'Quality', hint: 'Larger model and context, best of several drafts' },
+]
+
 export default function ChatPage() {
     const params = useParams()
     const projectId = params.projectId as string
@@ -21,6 +29,7 @@ export default function ChatPage() {
     const [loading, setLoading] = useState(false)
     const [sessionId] = useState(() => uuidv4())
     const [userId, setUserId] = useState<string | null>(null)
+    const [latencyTier, setLatencyTier] = useState<LatencyTier>('balanced')
     const messagesEndRef = useRef<HTMLDivElement>(null)
 
     useEffect(() => {
@@ -63,6 +72,7 @@ export default function ChatPage() {
                 session_id: sessionId,
                 project_id: projectId,
                 is_reroll: isReroll,
+                latency_tier: latencyTier,
             }
 
             const response = await fetch(`${apiBaseURL}/enhance`, {
@@ -111,7 +121,7 @@ export default function ChatPage() {
     return (
         <div className="flex flex-col h-[calc(100vh-4rem)] md:h-[calc(100vh-4rem)] lg:h-screen w-full bg-white relative">
             {/* Chat Header */}
-            <div className="h-14 border-b border-gray-200 flex items-center px-6 shrink-0 bg-white/80 backdrop-blur-sm z-10 sticky top-0">
+            <div className="h-14 border-b border-gray-200 flex items-center justify-between px-6 shrink-0 bg-white/80 backdrop-blur-sm z-10 sticky top-0">
                 <div className="flex items-center gap-3">
                     <div className="h-8 w-8 rounded bg-[#F4EBFF] flex items-center justify-center">
                         <MessageChatCircle className="w-4 h-4 text-[#7f56d9]" />
@@ -121,6 +131,21 @@ export default function ChatPage() {
                         <p className="text-xs text-gray-500">ID: {projectId} • Vector RAG Active</p>
                     </div>
                 </div>
+                <div className="flex items-center gap-1 rounded-lg border border-gray-200 bg-gray-50 p-0.5">
+                    {LATENCY_TIERS.map((tier) => (
+                        <button
+                            key={tier.value}
+                            title={tier.hint}
+                            onClick={() => setLatencyTier(tier.value)}
+                            className={`text-xs font-medium px-2.5 py-1 rounded-md transition-colors ${latencyTier === tier.value
+                                    ? 'bg-white text-[#7f56d9] shadow-sm'
+                                    : 'text-gray-500 hover:text-gray-700'
+                                }`}
+                        >
+                            {tier.label}
+                        </button>
+                    ))}
+                </div>
             </div>
 
             {/* Messages Area */}